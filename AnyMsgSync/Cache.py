@@ -0,0 +1,139 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """带过期时间与容量上限的 LRU 缓存"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RotatingSeenSet:
+    """时间与容量双重受限的“见过”集合
+
+    由新旧两代集合组成：每经过 window 秒或当前代写满 capacity 条就轮换一次，
+    最旧的一代整体丢弃。判断与写入都是 O(1)，内存上限为 2 * capacity 个整数，
+    一个键至少被记住 window 秒（容量未满时），最多 2 * window 秒。
+    """
+
+    def __init__(self, capacity: int = 100000, window: float = 600):
+        self.capacity = capacity
+        self.window = window
+        self._current: set = set()
+        self._previous: set = set()
+        self._rotated = time.monotonic()
+
+    def _maybe_rotate(self):
+        now = time.monotonic()
+        elapsed = now - self._rotated
+        if elapsed >= self.window or len(self._current) >= self.capacity:
+            # 空闲超过两个窗口时，旧的一代同样已经过期
+            self._previous = self._current if elapsed < 2 * self.window else set()
+            self._current = set()
+            self._rotated = now
+
+    def add(self, key: Hashable) -> bool:
+        """记录一个键；首次出现返回 True，窗口内重复出现返回 False"""
+        self._maybe_rotate()
+        # 只保存哈希值，避免长期持有键对象本身
+        digest = hash(key)
+        if digest in self._current or digest in self._previous:
+            return False
+        self._current.add(digest)
+        return True
+
+    def __contains__(self, key: Hashable) -> bool:
+        digest = hash(key)
+        return digest in self._current or digest in self._previous
+
+    def __len__(self) -> int:
+        return len(self._current) + len(self._previous)
+
+
+class AsyncLoaderCache:
+    """异步加载缓存
+
+    在 TTLCache 之上增加：失败结果按较短的 TTL 负缓存；同一个键的并发加载
+    合并为一次进行中的请求（single-flight），其余调用者等待同一结果。
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 600, negative_ttl: float = 60,
+                 is_success: Callable[[Any], bool] = lambda value: True):
+        self.cache = TTLCache(maxsize, ttl)
+        self.negative_ttl = negative_ttl
+        self.is_success = is_success
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = self.cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except Exception as e:
+            future.set_exception(e)
+            # 避免无人等待时出现 "exception was never retrieved"
+            future.exception()
+            raise
+        else:
+            ttl = None if self.is_success(value) else self.negative_ttl
+            self.cache.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            # 加载被取消时同样需要唤醒等待者
+            if not future.done():
+                future.cancel()
+            self._inflight.pop(key, None)
+
+    def invalidate(self, key: Hashable):
+        self.cache.pop(key)
+
+    def clear(self):
+        self.cache.clear()
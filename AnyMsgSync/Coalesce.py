@@ -0,0 +1,72 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+
+from .Message import ParsedMessage, merge_messages
+
+# 单批最多合并的消息数，以及自第一条消息起的最长等待倍数（相对合并窗口）
+DEFAULT_MAX_MESSAGES = 20
+MAX_DELAY_FACTOR = 3
+
+
+class _Burst:
+    __slots__ = ("sender_id", "messages", "callback", "timer", "deadline")
+
+    def __init__(self, sender_id, callback, deadline):
+        self.sender_id = sender_id
+        self.messages: List[ParsedMessage] = []
+        self.callback = callback
+        self.timer = None
+        self.deadline = deadline
+
+
+class BurstCoalescer:
+    """连发合并器
+
+    按路由（来源群 → 目标群）缓存：同一发送者连续发送、且间隔不超过窗口的消息，
+    会被合并为一条后再交给回调发送；其他人插话会立即结束当前批次，保证消息顺序。
+    每来一条新消息就顺延窗口，但自第一条起最多等待 MAX_DELAY_FACTOR 倍窗口，
+    且单批不超过 max_messages 条，保证延迟有上限。
+    """
+
+    def __init__(self, main):
+        self.main = main
+        self.logger = main.logger
+        self.max_messages = main.config.get("coalesce", {}).get("max_messages", DEFAULT_MAX_MESSAGES)
+        self._bursts: Dict[Hashable, _Burst] = {}
+
+    def add(self, key: Hashable, message: ParsedMessage, window: float,
+            callback: Callable[[ParsedMessage], Awaitable]):
+        loop = asyncio.get_running_loop()
+        burst = self._bursts.get(key)
+        if burst is not None and burst.sender_id != message.sender_id:
+            self._flush(key)
+            burst = None
+        if burst is None:
+            burst = self._bursts[key] = _Burst(
+                message.sender_id, callback, loop.time() + window * MAX_DELAY_FACTOR
+            )
+        burst.messages.append(message)
+
+        if burst.timer is not None:
+            burst.timer.cancel()
+        if len(burst.messages) >= self.max_messages:
+            self._flush(key)
+            return
+        delay = min(window, max(burst.deadline - loop.time(), 0))
+        burst.timer = loop.call_later(delay, self._flush, key)
+
+    def _flush(self, key: Hashable) -> Optional[asyncio.Future]:
+        burst = self._bursts.pop(key, None)
+        if burst is None:
+            return None
+        if burst.timer is not None:
+            burst.timer.cancel()
+        merged = merge_messages(burst.messages)
+        if len(burst.messages) > 1:
+            self.logger.debug(f"[Coalesce] 已合并 {len(burst.messages)} 条连续消息: {merged.all_ids}")
+        return asyncio.ensure_future(burst.callback(merged))
+
+    async def close(self):
+        # 停止时立即发送所有尚未到期的合并批次
+        pending = [self._flush(key) for key in list(self._bursts)]
+        await asyncio.gather(*(task for task in pending if task is not None), return_exceptions=True)
@@ -1,16 +1,45 @@
 import asyncio
+import functools
+import hashlib
 import json
 from ErisPulse import sdk
-from typing import Dict, List, Optional, Tuple, Any, Callable
-
-# 格式映射表：将用户配置的 format 字段标准化为统一名称
-FORMAT_MAP = {
-    "text": "Text",
-    "txt": "Text",
-    "plain": "Text",
-    "markdown": "Markdown",
-    "md": "Markdown",
-    "html": "Html",
+from typing import Dict, List, Optional, Set, Tuple, Any, Callable
+from .MessageStore import MessageIdStore
+from .Outbound import OutboundScheduler
+from .HttpClient import HttpClient
+from .Message import DECODERS, ParsedMessage, replace_merged_part
+from .Recall import RECALL_ACTIONS, RecallBatcher
+from .Cache import RotatingSeenSet, TTLCache
+from .Coalesce import BurstCoalescer
+from .Metrics import Metrics, route_labels
+from .Tracing import Tracer
+from .Retry import OutboundCall, ReliableSender
+from .Outbox import Outbox
+from .LoopGuard import LoopGuard
+from .Routing import SOURCE_PLATFORMS, Route, RoutingTable
+from .Reload import ConfigWatcher
+from .Media import MediaFile, MediaRelay
+from .Transcode import Transcoder
+
+# 编辑同步默认配置
+DEFAULT_EDIT_CONFIG = {
+    "debounce": 1.5,          # 编辑防抖窗口（秒）
+    "cache_size": 4096,       # 记录最近送达内容的消息数
+    "cache_ttl": 48 * 3600,   # 送达内容记录的保留时长（秒）
+}
+
+# 并发转发默认配置
+DEFAULT_FANOUT_CONFIG = {
+    "concurrent": True,     # 是否并发发送到各转发目标
+    "max_parallel": 8,      # 单条消息同时进行的发送数
+    "global_limit": 32,     # 全局同时进行的适配器调用数
+}
+
+# 入站去重默认配置
+DEFAULT_DEDUPE_CONFIG = {
+    "enabled": True,
+    "window": 600,          # 重复投递的识别窗口（秒）
+    "capacity": 100000,     # 每个窗口最多记录的事件数
 }
 
 class MessageSyncManager:
@@ -19,78 +48,84 @@ class MessageSyncManager:
         self.main = main_instance
         self.logger = main_instance.logger
         self.sdk = main_instance.sdk
-        
-    async def handle_message_recall(self, from_platform: str, message_id: str, group_id: Optional[str] = None):
-        mapping_table = self.sdk.env.get("message_id_map", {})
-        mapped_targets = []
-
-        # 查找所有目标平台映射
-        for target_platform in ["yunhu", "qq", "telegram"]:
-            if mapping_table.get(from_platform, {}).get(target_platform, {}).get(str(message_id)):
-                mapped_data = mapping_table[from_platform][target_platform][str(message_id)]
-                other_msg_id, other_group_id = mapped_data
-                mapped_targets.append({
-                    "target_platform": target_platform,
-                    "other_msg_id": other_msg_id,
-                    "other_group_id": other_group_id
-                })
-                self.logger.debug(f"[{from_platform.upper()}→{target_platform.upper()}] 找到映射: 消息ID={other_msg_id}, 群ID={other_group_id}")
+        self.store = MessageIdStore(main_instance)
+        self.recall_batcher = RecallBatcher(main_instance)
+        self._migrate_legacy_map()
+
+    def _migrate_legacy_map(self):
+        """将旧版保存在 sdk.env 中的 message_id_map 一次性迁移到映射存储"""
+        legacy = self.sdk.env.get("message_id_map", None)
+        if not legacy:
+            return
+        count = self.store.import_legacy(legacy)
+        self.sdk.env.delete("message_id_map")
+        self.logger.info(f"[Mapping] 已从 sdk.env 迁移 {count} 条旧映射至 {self.store.path}")
+
+    async def handle_message_recall(self, from_platform: str, message_id: str, group_id: Optional[str]):
+        """撤回某条源消息在所有目标群中的副本；消息ID只在来源群内唯一，因此必须给出来源群"""
+        if group_id is None:
+            self.logger.warning(f"[{from_platform.upper()}] 撤回通知中缺少群ID，无法定位消息 {message_id}")
+            return
+        with self.main.tracer.trace("recall", from_platform):
+            await self._recall_all(from_platform, message_id, group_id)
 
+    async def _recall_all(self, from_platform: str, message_id: str, group_id: str):
+        # 按 (来源群, 消息ID) 一次索引查询取得所有目标平台的映射，不会命中其他群的同号消息
+        with self.main.tracer.span("lookup"):
+            mapped_targets = self.store.get_all(from_platform, group_id, message_id)
         if not mapped_targets:
             self.logger.warning(f"[{from_platform.upper()}] 无法找到对应的目标消息 ID: {message_id}")
             return
 
-        for item in mapped_targets:
-            target_platform = item["target_platform"]
-            other_msg_id = item["other_msg_id"]
-            other_group_id = item["other_group_id"]
+        # 各目标并发撤回，整体耗时取决于最慢的目标而不是所有目标之和
+        await asyncio.gather(*(
+            self._recall_target(from_platform, group_id, target_platform, other_msg_id, other_group_id)
+            for target_platform, other_msg_id, other_group_id in mapped_targets
+        ))
 
-            if not hasattr(self.sdk.adapter, target_platform.capitalize()):
-                self.logger.warning(f"[{target_platform.upper()}] 适配器不存在，跳过撤回")
-                continue
+    async def _recall_target(self, from_platform: str, group_id: Optional[str], target_platform: str,
+                             other_msg_id: str, other_group_id: str):
+        labels = route_labels(from_platform, group_id, target_platform, other_group_id)
+        self.logger.debug(f"[{from_platform.upper()}→{target_platform.upper()}] 找到映射: 消息ID={other_msg_id}, 群ID={other_group_id}")
 
-            try:
-                self.logger.info(f"[{target_platform.upper()}] 即将撤回消息 {other_msg_id}（群 {other_group_id}）")
-
-                platform_actions = {
-                    "yunhu": lambda: self.sdk.adapter.Yunhu.Send.To("group", other_group_id).Recall(other_msg_id),
-                    "qq": lambda: self.sdk.adapter.QQ.Send.To("group", other_group_id).Recall(other_msg_id),
-                    "telegram": lambda: self.sdk.adapter.Telegram.Send.To("group", other_group_id).DeleteMessage(other_msg_id)
-                }
-                res = await platform_actions[target_platform]()
-                self.logger.info(f"[{target_platform.upper()}] 已同步撤回消息 {other_msg_id} | 响应: {res}")
-            except Exception as e:
-                self.logger.error(f"[{target_platform.upper()}] 撤回失败: {e}", exc_info=True)
-
-    def add_message_id_mapping(self, *, msg_id: str, target_msg_id: str, from_platform: str, to_platform: str, group_id: str, target_group_id: str):
-        """添加消息ID映射关系"""
-        mapping = self.sdk.env.get("message_id_map", {})
-
-        # 初始化平台层级结构
-        mapping.setdefault(from_platform, {})
-        mapping[from_platform].setdefault(to_platform, {})
-
-        # 存储映射信息
-        mapping[from_platform][to_platform][str(msg_id)] = (str(target_msg_id), str(target_group_id))
-
-        # 反向映射
-        mapping.setdefault(to_platform, {})
-        mapping[to_platform].setdefault(from_platform, {})
-        mapping[to_platform][from_platform][str(target_msg_id)] = (str(msg_id), str(group_id))
-
-        self.sdk.env.set("message_id_map", mapping)
+        if target_platform not in RECALL_ACTIONS or not hasattr(self.sdk.adapter, target_platform.capitalize()):
+            self.logger.warning(f"[{target_platform.upper()}] 适配器不存在，跳过撤回")
+            return
+
+        try:
+            self.logger.info(f"[{target_platform.upper()}] 即将撤回消息 {other_msg_id}（群 {other_group_id}）")
+            with self.main.tracer.span("send", labels):
+                res = await self.recall_batcher.recall(target_platform, other_group_id, other_msg_id)
+            self.main.metrics.inc("anymsgsync_recalled_total", labels)
+            self.logger.info(f"[{target_platform.upper()}] 已同步撤回消息 {other_msg_id} | 响应: {res}")
+        except asyncio.TimeoutError:
+            self.main.metrics.inc("anymsgsync_failed_total", labels + ("recall",))
+            self.logger.error(f"[{target_platform.upper()}] 撤回超时（{self.recall_batcher.timeout}s）: 消息 {other_msg_id}")
+        except Exception as e:
+            self.main.metrics.inc("anymsgsync_failed_total", labels + ("recall",))
+            self.logger.error(f"[{target_platform.upper()}] 撤回失败: {e}", exc_info=True)
+
+    def add_message_id_mapping(self, *, msg_id: str, target_msg_id: str, from_platform: str, to_platform: str, group_id: str, target_group_id: str,
+                               coalesced: bool = False):
+        """添加消息ID映射关系（同时写入反向映射）；coalesced 表示目标消息由多条源消息合并而成"""
+        self.store.add_pair(
+            msg_id=msg_id,
+            target_msg_id=target_msg_id,
+            from_platform=from_platform,
+            to_platform=to_platform,
+            group_id=group_id,
+            target_group_id=target_group_id,
+            coalesced=coalesced
+        )
         self.logger.debug(f"[Mapping] 新增映射: {from_platform}({msg_id}) → {to_platform}({target_msg_id}, {target_group_id})")
 
-    def get_mapped_message_id(self, from_platform: str, msg_id: str, to_platform: str, 
-                            group_id: Optional[str] = None) -> Optional[Tuple[str, str]]:
-        mapping_table = self.sdk.env.get("message_id_map", {})
-        mappings = mapping_table.get(from_platform, {}).get(to_platform, {})
-        msg_id = str(msg_id)
-        if msg_id in mappings:
-            stored_group_id = mappings[msg_id][1]
-            if group_id is None or str(group_id) == stored_group_id:
-                return mappings[msg_id]
-        return None
+    def get_mapped_message_id(self, from_platform: str, group_id: str, msg_id: str, to_platform: str,
+                              target_group_id: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        return self.store.get(from_platform, group_id, msg_id, to_platform, target_group_id)
+
+    def is_coalesced(self, from_platform: str, group_id: str, msg_id: str, to_platform: str,
+                     target_group_id: str) -> bool:
+        return self.store.is_coalesced(from_platform, group_id, msg_id, to_platform, target_group_id)
 
 class MessageParser:
     """消息解析工具类"""
@@ -112,34 +147,14 @@ class MessageParser:
             self.logger.warning(f"未知消息类型: {type(message)}")
             return {}
 
-    def get_message_id(self, message: Any) -> Optional[str]:
-        message = self.parse_message_to_dict(message)
-
-        # 尝试直接获取 message_id
-        if "message_id" in message:
-            return str(message["message_id"])
-
-        # Telegram: message/message_id
-        if "message" in message:
-            msg = message["message"]
-            if isinstance(msg, dict) and "message_id" in msg:
-                return str(msg["message_id"])
-
-        # Telegram: edited_message/message_id
-        if "edited_message" in message:
-            msg = message["edited_message"]
-            if isinstance(msg, dict) and "message_id" in msg:
-                return str(msg["message_id"])
-
-        # Yunhu: event/message/msgId
-        if "event" in message and "message" in message["event"]:
-            return str(message["event"]["message"].get("msgId"))
-
-        # Yunhu: 直接 msgId
-        if "msgId" in message:
-            return str(message["msgId"])
-
-        return None
+    def decode(self, platform: str, message: Any) -> Optional[ParsedMessage]:
+        """将平台原始事件解析为统一消息模型，每个入站事件只解析一次"""
+        decoder = DECODERS.get(platform)
+        if not decoder:
+            self.logger.warning(f"未知平台 {platform}，无法解析消息")
+            return None
+        with self.main.tracer.span("parse"):
+            return decoder(self.parse_message_to_dict(message))
 
     def get_adapter_message_id(self, platform: str, res: Dict) -> Optional[str]:
         if not isinstance(res, dict):
@@ -163,7 +178,6 @@ class PlatformHandler:
         self.logger = main_instance.logger
         self.sdk = main_instance.sdk
         self.platform_name = platform_name
-        self.forward_config = main_instance.forward_config.get(platform_name.lower(), {})
 
     async def handle_message(self, message: Any):
         """处理平台消息"""
@@ -174,66 +188,157 @@ class PlatformHandler:
     async def handle_edit(self, message: Any):
         """处理平台编辑事件"""
         raise NotImplementedError
-    async def forward_message(self, message: Dict, group_id: str):
-        mappings = self.forward_config.get(str(group_id))
-        if not mappings:
-            self.logger.warning(f"未配置对应的转发目标 | {self.platform_name}群ID: {group_id}")
+    async def close(self):
+        """停止处理器，释放挂起的后台任务"""
+    async def _render(self, route: Route, message: ParsedMessage, rendered: Dict) -> Optional[str]:
+        """渲染消息，结果按格式缓存在 rendered 中，仅在单次分发内有效
+
+        缓存的是渲染任务本身，并发的多个目标等待同一个任务，保证每种格式只渲染一次。
+        """
+        # 媒体中转可能为不同目标生成不同的待渲染消息，缓存键同时区分消息对象
+        key = (route.format, id(message))
+        if key not in rendered:
+            rendered[key] = asyncio.ensure_future(route.build(message))
+        return await rendered[key]
+
+    async def _fan_out(self, jobs: List[Callable]):
+        """执行一组发送任务；并发模式下受单次分发的并发上限约束（全局上限在出站调度器中施加）"""
+        fanout = self.main.fanout_config
+        if not fanout["concurrent"] or len(jobs) <= 1:
+            for job in jobs:
+                await job()
             return
 
-        for mapping in mappings:
-            target_type = mapping["type"]
-            target_group_id = mapping["group_id"]
-            msg_format = mapping.get("format", "text").lower()
-            standard_format = FORMAT_MAP.get(msg_format, None)
+        local_limit = asyncio.Semaphore(fanout["max_parallel"])
 
-            if not standard_format:
-                self.logger.warning(f"[{self.platform_name}] 不支持的消息格式: {msg_format}")
-                continue
+        async def run(job):
+            async with local_limit:
+                await job()
 
-            builder = self.main.message_builders.get(self.platform_name)
-            if not builder:
-                self.logger.warning(f"{self.platform_name} 消息构建器未加载")
-                continue
+        await asyncio.gather(*(run(job) for job in jobs))
+
+    async def forward_message(self, message: ParsedMessage, targets: Optional[Set[Tuple[str, str]]] = None):
+        """转发消息到该群配置的所有目标；targets 仅在重放发件箱时传入，限定只发送尚未完成的目标"""
+        group_id = message.group_id
+        routes = self.main.routing.get(message.platform, group_id)
+        if not routes:
+            self.logger.warning(f"未配置对应的转发目标 | {self.platform_name}群ID: {group_id}")
+            return
 
-            handler_method = getattr(builder, f"build_{standard_format.lower()}", None)
-            if not handler_method:
-                self.logger.warning(f"[{self.platform_name}] 不支持的消息格式: {standard_format}")
+        if targets is not None:
+            routes = [route for route in routes if route.target in targets]
+        else:
+            # 先写入发件箱再开始发送，进程中途退出时可在重启后补发
+            self.main.outbox.append(message, [route.target for route in routes])
+
+        # 同一条消息的每种格式只渲染一次，由所有相同格式的目标共享
+        rendered = {}
+        jobs = []
+        for route in routes:
+            if route.coalesce and message.sender_id is not None and targets is None:
+                # 该路由开启了连发合并：交给合并器，窗口结束后以合并消息发送
+                self.main.coalescer.add(
+                    (message.platform, message.group_id) + route.target,
+                    message, route.coalesce,
+                    functools.partial(self._forward_coalesced, route)
+                )
                 continue
 
-            full_content = await handler_method(message)
+            jobs.append(functools.partial(self._forward_to_target, route, message, rendered))
 
-            if not hasattr(self.sdk.adapter, target_type.capitalize()):
-                self.logger.warning(f"[{target_type}] 适配器不存在，跳过转发")
-                continue
+        await self._fan_out(jobs)
 
-            try:
-                adapter = getattr(self.sdk.adapter, target_type.capitalize())
-                send_method = getattr(adapter.Send.To("group", target_group_id), standard_format)
-                res = await send_method(full_content)
-                self.logger.info(f"[{self.platform_name}→{target_type.capitalize()}] 已发送至群 {target_group_id} | 响应: {res}")
-
-                # 记录消息ID映射
-                msg_id = self.main.parser.get_message_id(message)
-                other_msg_id = self.main.parser.get_adapter_message_id(target_type.lower(), res)
-                if msg_id and other_msg_id:
+    async def _forward_coalesced(self, route: Route, message: ParsedMessage):
+        # 合并批次在窗口结束后发送，单独开启一次追踪
+        with self.main.tracer.trace("coalesced", message.platform):
+            await self._forward_to_target(route, message, {})
+
+    async def _forward_to_target(self, route: Route, message: ParsedMessage, rendered: Dict):
+        await self._send_to_target(route, message, rendered)
+        # 发送成功或已写入死信队列后才标记完成；任务被取消（进程退出）时保留记录，重启后补发
+        self.main.outbox.mark_done(message, route.target_type, route.target_group_id)
+
+    async def _send_to_target(self, route: Route, message: ParsedMessage, rendered: Dict):
+        metrics = self.main.metrics
+        tracer = self.main.tracer
+        target_type, target_group_id, labels = route.target_type, route.target_group_id, route.labels
+        try:
+            render_message, attachments = await self.main.media.prepare(message, route, rendered)
+            with tracer.span("build", labels):
+                full_content = await self._render(route, render_message, rendered)
+            if full_content is None:
+                self.logger.warning(f"[{self.platform_name}] 消息渲染结果为空，跳过转发至 {target_type}:{target_group_id}")
+                return
+
+            call = OutboundCall(target_type, target_group_id, route.format, (full_content,))
+            with tracer.span("send", labels):
+                res = await self.main.sender.send(call, "forward", context={
+                    "from_platform": message.platform,
+                    "group_id": message.group_id,
+                    "msg_ids": message.all_ids,
+                })
+            self.main.remember_delivered(message, target_type, target_group_id, full_content)
+            coalesced = len(message.all_ids) > 1
+            if coalesced:
+                self.main.remember_coalesced(message, target_type, target_group_id)
+            metrics.inc("anymsgsync_forwarded_total", labels)
+            self.logger.info(f"[{self.platform_name}→{target_type.capitalize()}] 已发送至群 {target_group_id} | 响应: {res}")
+
+            # 记录消息ID映射；合并消息的每条源消息都映射到同一条目标消息
+            other_msg_id = self.main.parser.get_adapter_message_id(target_type, res)
+            if other_msg_id:
+                with tracer.span("mapping", labels):
+                    for msg_id in message.all_ids:
+                        self.main.sync_manager.add_message_id_mapping(
+                            msg_id=msg_id,
+                            target_msg_id=other_msg_id,
+                            from_platform=message.platform,
+                            to_platform=target_type,
+                            group_id=message.group_id,
+                            target_group_id=target_group_id,
+                            coalesced=coalesced
+                        )
+        except Exception as e:
+            metrics.inc("anymsgsync_failed_total", labels + ("forward",))
+            self.logger.error(f"[{self.platform_name}→{target_type.capitalize()}] 发送失败: {e}", exc_info=True)
+            return
+
+        for seg_type, media in attachments:
+            await self._send_attachment(route, message, seg_type, media)
+
+    async def _send_attachment(self, route: Route, message: ParsedMessage, seg_type: str, media: MediaFile):
+        target_type, target_group_id, labels = route.target_type, route.target_group_id, route.labels
+        try:
+            with self.main.tracer.span("upload", labels):
+                res = await self.main.media.upload(target_type, target_group_id, seg_type, media)
+            self.logger.info(f"[{self.platform_name}→{target_type.capitalize()}] 已上传 {seg_type} 至群 {target_group_id} | {media}")
+            # 附件同样写入映射，撤回源消息时一并撤回
+            other_msg_id = self.main.parser.get_adapter_message_id(target_type, res)
+            if other_msg_id:
+                for msg_id in message.all_ids:
                     self.main.sync_manager.add_message_id_mapping(
                         msg_id=msg_id,
                         target_msg_id=other_msg_id,
-                        from_platform=self.platform_name.lower(),
-                        to_platform=target_type.lower(),
-                        group_id=group_id,
-                        target_group_id=target_group_id
+                        from_platform=message.platform,
+                        to_platform=target_type,
+                        group_id=message.group_id,
+                        target_group_id=target_group_id,
+                        coalesced=len(message.all_ids) > 1
                     )
-            except Exception as e:
-                self.logger.error(f"[{self.platform_name}→{target_type.capitalize()}] 发送失败: {e}", exc_info=True)
+        except Exception as e:
+            self.main.metrics.inc("anymsgsync_failed_total", labels + ("media",))
+            self.logger.error(f"[{self.platform_name}→{target_type.capitalize()}] 上传 {seg_type} 失败: {e}")
 
 class QQHandler(PlatformHandler):
     def __init__(self, main_instance):
         super().__init__(main_instance, "QQ")
 
     async def handle_message(self, message: Any):
-        group_id = message.get("group_id")
-        await self.forward_message(message, group_id)
+        with self.main.tracer.trace("forward", "qq"):
+            message = self.main.parser.decode("qq", message)
+            if self.main.is_duplicate(message) or self.main.loop_guard.is_echo(message):
+                return
+            await self.forward_message(message)
 
     async def handle_recall(self, notice: Dict):
         notice_type = notice.get("notice_type")
@@ -254,11 +359,11 @@ class YunhuHandler(PlatformHandler):
         super().__init__(main_instance, "Yunhu")
 
     async def handle_message(self, message: Any):
-        message = self.main.parser.parse_message_to_dict(message)
-        yunhu_event = message.get("event", {})
-        yunhu_msg = yunhu_event.get("message", {})
-        yunhu_group_id = yunhu_msg.get("chatId")
-        await self.forward_message(message, yunhu_group_id)
+        with self.main.tracer.trace("forward", "yunhu"):
+            message = self.main.parser.decode("yunhu", message)
+            if self.main.is_duplicate(message) or self.main.loop_guard.is_echo(message):
+                return
+            await self.forward_message(message)
 
     async def handle_recall(self, event: Dict):
         yunhu_msg = event.get("message", {})
@@ -272,113 +377,183 @@ class TelegramHandler(PlatformHandler):
     """Telegram平台处理器"""
     def __init__(self, main_instance):
         super().__init__(main_instance, "Telegram")
+        self._pending_edits: Dict[Tuple[str, str], ParsedMessage] = {}
+        self._edit_timers: Dict[Tuple[str, str], asyncio.Future] = {}
 
     async def handle_message(self, message: Any):
         """处理Telegram消息"""
-        message = self.main.parser.parse_message_to_dict(message)
-        msg_body = message.get("message", {})
-        chat = msg_body.get("chat", {})
-        chat_id = chat.get("id")
-        if not chat_id:
-            self.logger.warning("[Telegram] 消息中未找到群组ID，忽略转发")
-            return
-        await self.forward_message(message, str(chat_id))
+        with self.main.tracer.trace("forward", "telegram"):
+            message = self.main.parser.decode("telegram", message)
+            if not message.group_id:
+                self.logger.warning("[Telegram] 消息中未找到群组ID，忽略转发")
+                return
+            if self.main.is_duplicate(message) or self.main.loop_guard.is_echo(message):
+                return
+            await self.forward_message(message)
 
     async def handle_edit(self, data: Dict):
         self.logger.info("[Telegram] 收到消息编辑事件")
-        edited_message = data.get("edited_message", {})
-        chat = edited_message.get("chat", {})
-        chat_id = chat.get("id")
-        message_id = edited_message.get("message_id")
+        with self.main.tracer.trace("edit_received", "telegram"):
+            message = self.main.parser.decode("telegram", data)
+            if not message.group_id or not message.message_id:
+                self.logger.warning("[Telegram] 缺少必要的 chat_id 或 message_id，忽略处理")
+                return
 
-        if not chat_id or not message_id:
-            self.logger.warning("[Telegram] 缺少必要的 chat_id 或 message_id，忽略处理")
-            return
+            # 防抖：窗口内同一条消息的多次编辑只同步最后一次
+            key = (message.group_id, message.message_id)
+            self._pending_edits[key] = message
+            if key not in self._edit_timers:
+                self._edit_timers[key] = asyncio.ensure_future(self._debounced_edit(key))
+
+    async def close(self):
+        for timer in list(self._edit_timers.values()):
+            timer.cancel()
+        self._pending_edits.clear()
 
-        mappings = self.forward_config.get(str(chat_id))
-        if not mappings:
+    async def _debounced_edit(self, key: Tuple[str, str]):
+        try:
+            await asyncio.sleep(self.main.edit_config["debounce"])
+        finally:
+            self._edit_timers.pop(key, None)
+        message = self._pending_edits.pop(key, None)
+        if message is not None:
+            # 防抖任务创建于收到第一次编辑时的追踪上下文中，沿用其关联ID
+            with self.main.tracer.trace("edit", "telegram"):
+                await self._propagate_edit(message)
+
+    async def _propagate_edit(self, message: ParsedMessage):
+        chat_id = message.group_id
+        routes = self.main.routing.get("telegram", chat_id)
+        if not routes:
             self.logger.warning(f"[Telegram] 未配置对应的转发目标 | 群组ID: {chat_id}")
             return
 
-        for mapping in mappings:
-            target_type = mapping["type"]
-            target_group_id = mapping["group_id"]
-            msg_format = mapping.get("format", "text").lower()
-            standard_format = FORMAT_MAP.get(msg_format, None)
-
-            if not standard_format:
-                self.logger.warning(f"[Telegram] 不支持的消息格式: {msg_format}")
-                continue
-
-            builder = self.main.message_builders.get("Telegram")
-            if not builder:
-                self.logger.warning("[Telegram] 消息构建器未加载")
-                continue
-
-            handler_method = getattr(builder, f"build_{standard_format.lower()}", None)
-            if not handler_method:
-                self.logger.warning(f"[Telegram] 不支持的消息格式: {standard_format}")
-                continue
-
-            full_content = await handler_method({"message": edited_message})
+        rendered = {}
+        jobs = [functools.partial(self._edit_target, route, message, rendered) for route in routes]
+        await self._fan_out(jobs)
+
+    async def _edit_target(self, route: Route, message: ParsedMessage, rendered: Dict):
+        chat_id = message.group_id
+        message_id = message.message_id
+        metrics = self.main.metrics
+        tracer = self.main.tracer
+        target_type, target_group_id, labels = route.target_type, route.target_group_id, route.labels
+        standard_format = route.format
+        try:
+            batch = self.main.coalesced_batch(message, target_type, target_group_id)
+            if batch is not None:
+                # 目标消息由连发合并而成：替换被编辑的那一条后重新渲染整批，不覆盖或删除同批的其它消息
+                edited = replace_merged_part(batch, message)
+                if edited is None:
+                    self.logger.warning(f"[Telegram→{target_type.capitalize()}] 无法在合并消息中定位消息 {message_id}，跳过编辑同步")
+                    return
+                self.main.remember_coalesced(edited, target_type, target_group_id)
+                # 各目标的合并批次不同，不能共用按消息渲染的结果
+                rendered = {}
+            elif self.main.sync_manager.is_coalesced("telegram", chat_id, message_id, target_type, target_group_id):
+                self.logger.warning(f"[Telegram→{target_type.capitalize()}] 消息 {message_id} 已与其它消息合并发送且合并记录已过期，跳过编辑同步")
+                return
+            else:
+                edited = message
+
+            # 与转发时使用同样的媒体占位文本，保证内容未变化时能被识别；编辑不重新上传附件
+            render_message, _ = await self.main.media.prepare(edited, route, rendered)
+            with tracer.span("build", labels):
+                full_content = await self._render(route, render_message, rendered)
+            if full_content is None:
+                self.logger.warning(f"[Telegram] 消息渲染结果为空，跳过编辑同步至 {target_type}:{target_group_id}")
+                return
 
-            if not hasattr(self.sdk.adapter, target_type.lower()):
-                self.logger.warning(f"[Telegram] 适配器 {target_type} 不存在，跳过转发")
-                continue
+            if self.main.is_unchanged(edited, target_type, target_group_id, full_content):
+                self.logger.debug(f"[Telegram→{target_type.capitalize()}] 渲染内容未变化，跳过编辑同步")
+                return
 
-            try:
-                adapter = getattr(self.sdk.adapter, target_type.capitalize())
-                if target_type == "yunhu":
-                    yunhu_msg_id = self.main.sync_manager.get_mapped_message_id(
-                        "telegram", message_id, "yunhu", target_group_id
-                    )
-                    if yunhu_msg_id:
-                        res = await adapter.Send.To("group", target_group_id).Edit(
-                            yunhu_msg_id[0], full_content, standard_format.lower()
-                        )
-                        self.logger.info(f"[Telegram→Yunhu] 已编辑消息 {yunhu_msg_id[0]} 至群 {target_group_id} | 响应: {res}")
-                    else:
-                        self.logger.warning("[Telegram→Yunhu] 未找到对应 Yunhu 消息 ID，跳过编辑")
-                elif target_type == "qq":
-                    qq_msg_id = self.main.sync_manager.get_mapped_message_id(
-                        "telegram", message_id, "qq", target_group_id
-                    )
+            if target_type == "yunhu":
+                yunhu_msg_id = self.main.sync_manager.get_mapped_message_id(
+                    "telegram", chat_id, message_id, "yunhu", target_group_id
+                )
+                if yunhu_msg_id:
+                    call = OutboundCall("yunhu", target_group_id, "Edit",
+                                        (yunhu_msg_id[0], full_content, standard_format.lower()))
+                    with tracer.span("send", labels):
+                        res = await self.main.sender.send(call, "edit")
+                    self.main.remember_delivered(edited, target_type, target_group_id, full_content)
+                    metrics.inc("anymsgsync_edited_total", labels)
+                    self.logger.info(f"[Telegram→Yunhu] 已编辑消息 {yunhu_msg_id[0]} 至群 {target_group_id} | 响应: {res}")
+                else:
+                    self.logger.warning("[Telegram→Yunhu] 未找到对应 Yunhu 消息 ID，跳过编辑")
+            elif target_type == "qq":
+                qq_msg_id = self.main.sync_manager.get_mapped_message_id(
+                    "telegram", chat_id, message_id, "qq", target_group_id
+                )
+                with tracer.span("send", labels):
                     if qq_msg_id:
-                        await adapter.call_api(
-                            endpoint="delete_msg",
-                            message_id=qq_msg_id[0]
-                        )
-                    send_method = getattr(adapter.Send.To("group", target_group_id), standard_format)
-                    res = await send_method(full_content)
-                    self.logger.info(f"[Telegram→QQ] 已发送新消息至群 {target_group_id} | 响应: {res}")
-
-                    other_msg_id = self.main.parser.get_adapter_message_id(target_type.lower(), res)
-                    if other_msg_id:
-                        self.main.sync_manager.add_message_id_mapping(
-                            msg_id=message_id,
-                            target_msg_id=other_msg_id,
-                            from_platform="telegram",
-                            to_platform=target_type.lower(),
-                            group_id=chat_id,
-                            target_group_id=target_group_id
-                        )
-            except Exception as e:
-                self.logger.error(f"[Telegram→{target_type.capitalize()}] 处理失败: {e}", exc_info=True)
+                        # 删除旧消息失败（如已超出撤回时限）不影响发送新消息，也无需进入死信队列
+                        try:
+                            await self.main.sender.send(
+                                OutboundCall("qq", target_group_id, "call_api",
+                                             kwargs={"endpoint": "delete_msg", "message_id": qq_msg_id[0]}),
+                                "edit", dead_letter=False
+                            )
+                        except Exception as e:
+                            self.logger.warning(f"[Telegram→QQ] 删除旧消息 {qq_msg_id[0]} 失败: {e}")
+                    res = await self.main.sender.send(
+                        OutboundCall("qq", target_group_id, standard_format, (full_content,)), "edit",
+                        context={"from_platform": "telegram", "group_id": chat_id, "msg_ids": edited.all_ids}
+                    )
+                self.main.remember_delivered(edited, target_type, target_group_id, full_content)
+                metrics.inc("anymsgsync_edited_total", labels)
+                self.logger.info(f"[Telegram→QQ] 已发送新消息至群 {target_group_id} | 响应: {res}")
+
+                other_msg_id = self.main.parser.get_adapter_message_id(target_type, res)
+                if other_msg_id:
+                    with tracer.span("mapping", labels):
+                        for msg_id in edited.all_ids:
+                            self.main.sync_manager.add_message_id_mapping(
+                                msg_id=msg_id,
+                                target_msg_id=other_msg_id,
+                                from_platform="telegram",
+                                to_platform=target_type,
+                                group_id=chat_id,
+                                target_group_id=target_group_id,
+                                coalesced=edited is not message
+                            )
+        except Exception as e:
+            metrics.inc("anymsgsync_failed_total", labels + ("edit",))
+            self.logger.error(f"[Telegram→{target_type.capitalize()}] 处理失败: {e}", exc_info=True)
 
 class Main:
     def __init__(self, sdk):
         self.sdk = sdk
         self.logger = sdk.logger
-        # 初始化核心组件
-        self.parser = MessageParser(self)
-        self.sync_manager = MessageSyncManager(self)
 
         # 初始化配置
         self._init_config()
 
+        # 初始化核心组件
+        self.parser = MessageParser(self)
+        self.sync_manager = MessageSyncManager(self)
+        self.outbound = OutboundScheduler(self)
+        self.sender = ReliableSender(self)
+        self.outbox = Outbox(self)
+        self.loop_guard = LoopGuard(self)
+        self.http = HttpClient(self)
+        self.media = MediaRelay(self)
+        self.transcoder = Transcoder(self)
+        self.coalescer = BurstCoalescer(self)
+        self.tracer = Tracer(self)
+        self.metrics = Metrics(self)
+        if self.metrics.enabled:
+            self.tracer.add_hook(self.metrics)
+
         # 初始化消息构建器
         self._init_message_builders()
 
+        # 编译路由表
+        self.routing = RoutingTable(self, self.forward_config)
+        self.logger.info(f"已加载 {len(self.routing)} 条转发路由")
+        self.config_watcher = ConfigWatcher(self)
+
         # 初始化平台处理器
         self.platform_handlers = {}
         self._init_platform_handlers()
@@ -386,11 +561,19 @@ class Main:
     def _init_config(self):
         """初始化配置"""
         forward_map = self.sdk.env.get("AnyMsgSync", {})
-        self.forward_config = {
-            "qq": forward_map.get("qq", {}),
-            "yunhu": forward_map.get("yunhu", {}),
-            "telegram": forward_map.get("telegram", {})
-        }
+        self.config = forward_map
+        self.fanout_config = {**DEFAULT_FANOUT_CONFIG, **forward_map.get("fanout", {})}
+        self._fanout_semaphore = None
+        self.edit_config = {**DEFAULT_EDIT_CONFIG, **forward_map.get("edit", {})}
+        # 每条映射消息最近一次送达内容的摘要，用于跳过内容未变化的编辑
+        self.delivered_digests = TTLCache(self.edit_config["cache_size"], self.edit_config["cache_ttl"])
+        # 连发合并后送达的完整消息，编辑其中一条时据此重新渲染整批
+        self.coalesced_batches = TTLCache(self.edit_config["cache_size"], self.edit_config["cache_ttl"])
+        # 最近收到的入站事件，用于丢弃 webhook 重试、重连等造成的重复投递
+        self.dedupe_config = {**DEFAULT_DEDUPE_CONFIG, **forward_map.get("dedupe", {})}
+        self.inbound_seen = RotatingSeenSet(self.dedupe_config["capacity"], self.dedupe_config["window"])
+        self.duplicates_dropped: Dict[str, int] = {}
+        self.forward_config = self._extract_forward_config(forward_map)
 
         if not any(self.forward_config.values()):
             self.logger.info("""
@@ -419,6 +602,30 @@ sdk.env.set("AnyMsgSync", {
 })
 """)
 
+    @staticmethod
+    def _extract_forward_config(forward_map: Dict) -> Dict[str, Dict]:
+        return {platform: forward_map.get(platform, {}) for platform in SOURCE_PLATFORMS}
+
+    def reload_routes(self, forward_map: Optional[Dict] = None):
+        """重新编译群组映射并整体替换路由表，其余组件（存储、缓存、连接）保持不变"""
+        if forward_map is None:
+            forward_map = self.sdk.env.get("AnyMsgSync", {}) or {}
+        forward_config = self._extract_forward_config(forward_map)
+        routing = RoutingTable(self, forward_config)
+        added, removed, changed = self.routing.diff(routing)
+        if not (added or removed or changed):
+            self.logger.debug("[Reload] 路由未变化")
+            return
+        # 单次赋值完成切换：已在分发中的消息继续使用旧路由表
+        self.forward_config, self.routing = forward_config, routing
+        self.logger.info(
+            f"[Reload] 路由已重新加载：共 {len(routing)} 条，"
+            f"新增 {len(added)} 个来源群，移除 {len(removed)} 个，变更 {len(changed)} 个"
+        )
+        for label, sources in (("新增", added), ("移除", removed), ("变更", changed)):
+            for platform, group_id in sources:
+                self.logger.debug(f"[Reload] {label}路由来源 {platform}:{group_id}")
+
     def _init_message_builders(self):
         self.message_builders = {}
 
@@ -459,13 +666,78 @@ sdk.env.set("AnyMsgSync", {
             else:
                 self.logger.debug(f"适配器 {platform} 不存在，跳过处理器初始化")
 
+    @staticmethod
+    def _delivered_key(message: ParsedMessage, target_type: str, target_group_id: str) -> Tuple:
+        # 合并消息以整批源消息ID为键，只与同一批次重新渲染后的完整内容比较
+        return message.platform, tuple(message.all_ids), target_type.lower(), str(target_group_id)
+
+    def remember_coalesced(self, message: ParsedMessage, target_type: str, target_group_id: str):
+        for msg_id in message.all_ids:
+            self.coalesced_batches.set(
+                (message.platform, message.group_id, msg_id, target_type.lower(), str(target_group_id)), message
+            )
+
+    def coalesced_batch(self, message: ParsedMessage, target_type: str,
+                        target_group_id: str) -> Optional[ParsedMessage]:
+        """message 所在的、发往该目标的合并消息；未合并或记录已过期时返回 None"""
+        return self.coalesced_batches.get(
+            (message.platform, message.group_id, message.message_id, target_type.lower(), str(target_group_id))
+        )
+
+    def remember_delivered(self, message: ParsedMessage, target_type: str, target_group_id: str, content: str):
+        digest = hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+        self.delivered_digests.set(self._delivered_key(message, target_type, target_group_id), digest)
+
+    def is_unchanged(self, message: ParsedMessage, target_type: str, target_group_id: str, content: str) -> bool:
+        digest = hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+        return self.delivered_digests.get(self._delivered_key(message, target_type, target_group_id)) == digest
+
+    def is_duplicate(self, message: ParsedMessage) -> bool:
+        """按 (平台, 群, 消息ID) 判断入站消息是否为重复投递"""
+        if not self.dedupe_config["enabled"] or not message.message_id:
+            return False
+        if self.inbound_seen.add((message.platform, message.group_id, message.message_id)):
+            return False
+        self.duplicates_dropped[message.platform] = self.duplicates_dropped.get(message.platform, 0) + 1
+        self.logger.debug(f"[{message.platform.upper()}] 丢弃重复投递的消息 {message.message_id}（群 {message.group_id}）")
+        return True
+
+    def get_fanout_semaphore(self) -> asyncio.Semaphore:
+        """全局同时进行的适配器调用数上限"""
+        # 延迟到事件循环内创建，避免绑定到错误的事件循环
+        if self._fanout_semaphore is None:
+            self._fanout_semaphore = asyncio.Semaphore(self.fanout_config["global_limit"])
+        return self._fanout_semaphore
+
     async def start(self):
         self.logger.info("AnyMsgSync 模块启动中...")
         try:
+            await self.http.start()
+            await self.metrics.start()
             await self._setup_message_handlers()
+            self.outbox.start_replay()
+            self.config_watcher.start()
         except Exception as e:
             self.logger.error(f"AnyMsgSync 启动失败: {e}", exc_info=True)
 
+    async def shutdown(self):
+        """停止模块，释放发送队列等资源"""
+        await self.config_watcher.close()
+        for handler in self.platform_handlers.values():
+            await handler.close()
+        await self.coalescer.close()
+        await self.outbox.close()
+        await self.sync_manager.recall_batcher.close()
+        await self.outbound.close()
+        await self.http.close()
+        self.transcoder.close()
+        await self.metrics.close()
+        # 发送队列与撤回批次都已排空，不会再写入映射与死信
+        self.sender.dead_letters.close()
+        self.sync_manager.store.close()
+        self.tracer.dump_slowest()
+        self.logger.info("AnyMsgSync 模块已停止")
+
     async def _setup_message_handlers(self):
         # 动态注册平台处理器
         for platform, handler in self.platform_handlers.items():
@@ -0,0 +1,55 @@
+import aiohttp
+from typing import Optional
+
+DEFAULT_HTTP_CONFIG = {
+    "limit": 100,               # 连接池总连接数
+    "limit_per_host": 10,       # 单个主机的连接数
+    "dns_cache_ttl": 300,       # DNS 缓存时长（秒）
+    "keepalive_timeout": 30,    # 空闲连接保活时长（秒）
+    "timeout": 10,              # 单次请求总超时（秒）
+    "connect_timeout": 5,       # 建立连接超时（秒）
+}
+
+
+class HttpClient:
+    """模块共享的 HTTP 客户端
+
+    统一管理 aiohttp.ClientSession 与连接池，由 Main.start / Main.shutdown 负责启停，
+    各构建器通过 get_session() 复用已建立的连接。
+    """
+
+    def __init__(self, main):
+        self.main = main
+        self.logger = main.logger
+        self.config = {**DEFAULT_HTTP_CONFIG, **main.config.get("http", {})}
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        # 创建过程中没有 await，并发调用不会重复创建
+        if self.session is not None and not self.session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.config["limit"],
+            limit_per_host=self.config["limit_per_host"],
+            ttl_dns_cache=self.config["dns_cache_ttl"],
+            use_dns_cache=True,
+            keepalive_timeout=self.config["keepalive_timeout"],
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=self.config["timeout"],
+            connect=self.config["connect_timeout"],
+        )
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        self.logger.debug("[HTTP] 共享连接池已创建")
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        # 未经 Main.start 启动（或已关闭）时按需创建
+        if self.session is None or self.session.closed:
+            await self.start()
+        return self.session
+
+    async def close(self):
+        session, self.session = self.session, None
+        if session is not None and not session.closed:
+            await session.close()
+            self.logger.debug("[HTTP] 共享连接池已关闭")
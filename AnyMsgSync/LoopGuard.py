@@ -0,0 +1,101 @@
+from typing import Any, Dict
+
+from .Cache import RotatingSeenSet
+from .Message import ParsedMessage
+from .Retry import OutboundCall
+
+DEFAULT_LOOP_GUARD_CONFIG = {
+    "enabled": True,
+    "window": 600,          # 记录本模块发出内容与消息ID的时长（秒）
+    "capacity": 50000,      # 每个窗口最多记录的条数
+    "self_ids": {},         # 各平台机器人自身的用户ID，如 {"qq": ["123456"], "yunhu": ["bot_id"]}
+}
+
+
+# 会产生新消息内容的发送方法 -> 内容所在的参数位置
+CONTENT_ARGS = {"Text": 0, "Html": 0, "Markdown": 0, "Edit": 1}
+# 上传附件的发送方法，只记录返回的消息ID
+UPLOAD_METHODS = {"Image", "Voice", "Video", "File"}
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def echo_text(message: ParsedMessage) -> str:
+    """入站消息的文本内容，用于和本模块发出的内容比对"""
+    text = "".join(data.get("text", "") for seg_type, data in message.segments if seg_type == "text")
+    if not text and message.platform == "yunhu":
+        # 云湖 html / markdown 消息不会解析为文本消息段，直接取原始内容
+        text = message.raw.get("event", {}).get("message", {}).get("content", {}).get("text", "")
+    return _normalize(text)
+
+
+class LoopGuard:
+    """回环防护
+
+    多向桥接时，若适配器把机器人自己发出的消息也作为入站消息上报，同一条消息会在各群之间
+    来回转发并不断放大。这里记录本模块发出的每条消息：发送前记录（目标平台, 群, 内容）指纹，
+    发送成功后记录（目标平台, 群, 消息ID）；入站消息命中任一指纹，或发送者是机器人自身
+    （来源标记：配置的 self_ids、OneBot 的 message_sent / self_id），即视为回声并丢弃。
+    全部检查均为 O(1)，记录数受窗口与容量双重限制。
+    """
+
+    def __init__(self, main):
+        self.main = main
+        self.logger = main.logger
+        self.config = {**DEFAULT_LOOP_GUARD_CONFIG, **main.config.get("loop_guard", {})}
+        self.enabled = self.config["enabled"]
+        self.self_ids = {
+            platform.lower(): {str(user_id) for user_id in ids}
+            for platform, ids in self.config["self_ids"].items()
+        }
+        self._sent_ids = RotatingSeenSet(self.config["capacity"], self.config["window"])
+        self._sent_content = RotatingSeenSet(self.config["capacity"], self.config["window"])
+        self.dropped: Dict[str, int] = {}
+
+    def before_send(self, call: OutboundCall):
+        """发送前记录内容指纹：回声可能先于发送接口的响应到达"""
+        index = CONTENT_ARGS.get(call.method)
+        if not self.enabled or index is None or len(call.args) <= index:
+            return
+        content = call.args[index]
+        text = _normalize(content) if isinstance(content, str) else ""
+        if text:
+            self._sent_content.add((call.platform, str(call.group_id), text))
+
+    def after_send(self, call: OutboundCall, res: Any):
+        """发送成功后记录目标平台返回的消息ID"""
+        if not self.enabled or (call.method not in CONTENT_ARGS and call.method not in UPLOAD_METHODS):
+            return
+        msg_id = self.main.parser.get_adapter_message_id(call.platform, res)
+        if msg_id:
+            self._sent_ids.add((call.platform, str(call.group_id), str(msg_id)))
+
+    def _is_self(self, message: ParsedMessage) -> bool:
+        if str(message.sender_id) in self.self_ids.get(message.platform, ()):
+            return True
+        if message.platform == "qq":
+            raw = message.raw
+            if raw.get("post_type") == "message_sent":
+                return True
+            self_id = raw.get("self_id")
+            return self_id is not None and str(self_id) == str(message.sender_id)
+        return False
+
+    def is_echo(self, message: ParsedMessage) -> bool:
+        if not self.enabled:
+            return False
+        platform, group_id = message.platform, str(message.group_id)
+        if self._is_self(message):
+            reason = "发送者为机器人自身"
+        elif message.message_id and (platform, group_id, str(message.message_id)) in self._sent_ids:
+            reason = "消息ID为本模块发出"
+        else:
+            text = echo_text(message)
+            if not text or (platform, group_id, text) not in self._sent_content:
+                return False
+            reason = "内容与本模块刚发出的消息一致"
+        self.dropped[platform] = self.dropped.get(platform, 0) + 1
+        self.logger.debug(f"[{platform.upper()}] 丢弃回环消息 {message.message_id}（群 {group_id}）: {reason}")
+        return True
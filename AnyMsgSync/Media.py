@@ -0,0 +1,259 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from .Cache import AsyncLoaderCache
+from .Message import ParsedMessage
+from .Retry import OutboundCall
+
+DEFAULT_MEDIA_CONFIG = {
+    "enabled": False,
+    "path": "anymsgsync_media",                 # 媒体缓存目录
+    "max_bytes": 512 * 1024 * 1024,             # 缓存总大小上限，超出时按最近使用时间淘汰
+    "max_file_bytes": 50 * 1024 * 1024,         # 单个文件大小上限，超出时放弃中转、保留原链接
+    "timeout": 60,                              # 单个文件的下载超时（秒）
+    "url_cache_size": 4096,                     # 记录 链接 -> 文件 的条数
+    "url_cache_ttl": 24 * 3600,                 # 链接记录的保留时长（秒）
+    "platforms": ["qq", "yunhu", "telegram"],   # 以原生方式上传媒体的目标平台
+}
+
+# 目标平台 -> 消息段类型 -> 上传所用的发送方法
+UPLOAD_METHODS = {
+    "telegram": {"image": "Image", "sticker": "Image", "mface": "Image",
+                 "voice": "Voice", "record": "Voice", "video": "Video"},
+    "qq": {"image": "Image", "sticker": "Image", "mface": "Image",
+           "voice": "Voice", "record": "Voice", "video": "Video"},
+    "yunhu": {"image": "Image", "sticker": "Image", "mface": "Image", "video": "Video"},
+}
+
+# 中转成功的媒体在文字消息中的占位文本
+PLACEHOLDERS = {
+    "image": "[图片]",
+    "sticker": "[表情]",
+    "mface": "[表情]",
+    "voice": "[语音]",
+    "record": "[语音]",
+    "video": "[视频]",
+}
+
+CHUNK_SIZE = 64 * 1024
+TMP_SUFFIX = ".tmp"
+
+
+class MediaFile:
+    __slots__ = ("digest", "path", "size", "content_type")
+
+    def __init__(self, digest: str, path: str, size: int, content_type: str):
+        self.digest = digest
+        self.path = path
+        self.size = size
+        self.content_type = content_type
+
+    def __repr__(self):
+        return f"MediaFile({self.digest[:12]}, {self.size} bytes, {self.content_type})"
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class MediaStore:
+    """按内容哈希寻址的磁盘缓存
+
+    文件以 SHA-256 命名，相同内容只保存一份；总大小超过上限时按最近使用时间淘汰。
+    使用时间记录在文件的修改时间上，重启后据此恢复淘汰顺序。
+    """
+
+    def __init__(self, directory: str, max_bytes: int, logger):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.logger = logger
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self.total = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                if name.endswith(TMP_SUFFIX):
+                    # 上次退出时未完成的下载
+                    os.remove(path)
+                    continue
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name, stat.st_size))
+        for _, digest, size in sorted(files):
+            self._index[digest] = size
+            self.total += size
+        self._evict()
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, digest: str) -> Optional[str]:
+        if digest not in self._index:
+            return None
+        self._index.move_to_end(digest)
+        path = self.path(digest)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.total -= self._index.pop(digest)
+            return None
+        return path
+
+    def put(self, tmp_path: str, digest: str, size: int) -> str:
+        path = self.path(digest)
+        if digest in self._index:
+            os.remove(tmp_path)
+            self.get(digest)
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        self._index[digest] = size
+        self.total += size
+        self._evict(keep=digest)
+        return path
+
+    def _evict(self, keep: Optional[str] = None):
+        while self.total > self.max_bytes and self._index:
+            digest = next(iter(self._index))
+            if digest == keep:
+                break
+            self.total -= self._index.pop(digest)
+            try:
+                os.remove(self.path(digest))
+            except FileNotFoundError:
+                pass
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class MediaRelay:
+    """媒体中转
+
+    各平台的媒体链接往往有时效、需要鉴权，或在目标平台无法访问（Telegram 文件链接中含有机器人 token）。
+    开启后，消息中的图片、表情、语音、视频先以流式下载到按内容寻址的磁盘缓存（同一链接只下载一次，
+    并发请求合并为一次），再以各目标平台的原生方式上传；文字消息中对应位置改为占位文本。
+    同一条消息的所有转发目标共用一次下载，重复出现的表情包直接从缓存读取。下载失败时保留原链接。
+    """
+
+    def __init__(self, main):
+        self.main = main
+        self.logger = main.logger
+        self.config = {**DEFAULT_MEDIA_CONFIG, **main.config.get("media", {})}
+        self.enabled = self.config["enabled"]
+        self.platforms = {platform.lower() for platform in self.config["platforms"]}
+        self.store = MediaStore(self.config["path"], self.config["max_bytes"], self.logger) if self.enabled else None
+        # 链接 -> MediaFile；下载失败（None）按较短时间负缓存
+        self.urls = AsyncLoaderCache(
+            maxsize=self.config["url_cache_size"],
+            ttl=self.config["url_cache_ttl"],
+            negative_ttl=60,
+            is_success=lambda media: media is not None
+        )
+
+    def _relayable(self, message: ParsedMessage, target_type: str) -> Tuple[int, ...]:
+        if not self.enabled or target_type not in self.platforms:
+            return ()
+        methods = UPLOAD_METHODS.get(target_type, {})
+        return tuple(
+            index for index, (seg_type, data) in enumerate(message.segments)
+            if seg_type in methods and str(data.get("url", "")).startswith(("http://", "https://"))
+        )
+
+    async def prepare(self, message: ParsedMessage, route,
+                      shared: Dict) -> Tuple[ParsedMessage, List[Tuple[str, MediaFile]]]:
+        """返回 (用于渲染文字的消息, 需要上传的附件列表)
+
+        结果存放在单次分发共享的 shared 中，可中转的消息段相同的目标共用同一份结果。
+        """
+        indices = self._relayable(message, route.target_type)
+        if not indices:
+            return message, []
+        key = ("media", indices)
+        if key not in shared:
+            shared[key] = asyncio.ensure_future(self._prepare(message, indices))
+        with self.main.tracer.span("media", route.labels):
+            return await shared[key]
+
+    async def _prepare(self, message: ParsedMessage, indices: Tuple[int, ...]):
+        files = await asyncio.gather(*(self.fetch(message.segments[index][1]["url"]) for index in indices))
+        segments = list(message.segments)
+        attachments = []
+        for index, media in zip(indices, files):
+            if media is None:
+                continue
+            seg_type = segments[index][0]
+            segments[index] = ("text", {"text": PLACEHOLDERS[seg_type]})
+            attachments.append((seg_type, media))
+        if not attachments:
+            return message, []
+        relayed = ParsedMessage(
+            platform=message.platform,
+            message_id=message.message_id,
+            group_id=message.group_id,
+            sender_id=message.sender_id,
+            sender_name=message.sender_name,
+            segments=segments,
+            raw=message.raw,
+            source_ids=message.source_ids
+        )
+        return relayed, attachments
+
+    async def fetch(self, url: str) -> Optional[MediaFile]:
+        media = await self.urls.get(url, lambda: self._download(url))
+        if media is not None and self.store.get(media.digest) is None:
+            # 文件已被淘汰，重新下载
+            self.urls.invalidate(url)
+            media = await self.urls.get(url, lambda: self._download(url))
+        return media
+
+    async def _download(self, url: str) -> Optional[MediaFile]:
+        session = await self.main.http.get_session()
+        hasher = hashlib.sha256()
+        size = 0
+        content_type = ""
+        fd, tmp_path = tempfile.mkstemp(dir=self.store.directory, suffix=TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=self.config["timeout"])) as response:
+                    if response.status != 200:
+                        self.logger.warning(f"[Media] 下载失败 HTTP {response.status}: {url[:80]}")
+                        return None
+                    content_type = response.headers.get("Content-Type", "")
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > self.config["max_file_bytes"]:
+                            self.logger.warning(f"[Media] 文件超过 {self.config['max_file_bytes']} 字节，保留原链接: {url[:80]}")
+                            return None
+                        hasher.update(chunk)
+                        f.write(chunk)
+            media = MediaFile(hasher.hexdigest(), "", size, content_type)
+            media.path = self.store.put(tmp_path, media.digest, size)
+            return media
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.warning(f"[Media] 下载失败: {e} | {url[:80]}")
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    async def upload(self, target_type: str, target_group_id, seg_type: str, media: MediaFile):
+        """以目标平台的原生方式发送一个附件，返回适配器响应"""
+        seg_type, media = await self.main.transcoder.transcode(target_type, seg_type, media)
+        data = await asyncio.get_running_loop().run_in_executor(None, _read_file, media.path)
+        call = OutboundCall(target_type, target_group_id, UPLOAD_METHODS[target_type][seg_type], (data,))
+        # 文件内容不写入死信队列，失败时由调用方记录
+        return await self.main.sender.send(call, "media", dead_letter=False)
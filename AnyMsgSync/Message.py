@@ -0,0 +1,180 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 消息段：(类型, 数据)，类型沿用 OneBot 命名（text / image / voice / video / sticker / forward ...）
+Segment = Tuple[str, Dict[str, Any]]
+
+
+class ParsedMessage:
+    """各平台入站消息的统一模型
+
+    每个入站事件只由对应平台的解码器解析一次，之后的构建器、转发与ID映射
+    都直接读取这里的字段，不再反复遍历原始负载。
+    """
+
+    __slots__ = ("platform", "message_id", "group_id", "sender_id", "sender_name", "segments", "raw", "source_ids")
+
+    def __init__(self, platform: str, message_id: Optional[str], group_id: Optional[str],
+                 sender_id: Any, sender_name: str, segments: List[Segment], raw: Dict,
+                 source_ids: Optional[List[str]] = None):
+        self.platform = platform
+        self.message_id = message_id
+        self.group_id = group_id
+        self.sender_id = sender_id
+        self.sender_name = sender_name
+        self.segments = segments
+        self.raw = raw
+        # 合并消息包含的全部源消息ID；普通消息为 None
+        self.source_ids = source_ids
+
+    @property
+    def all_ids(self) -> List[str]:
+        if self.source_ids:
+            return self.source_ids
+        return [self.message_id] if self.message_id else []
+
+    def __repr__(self):
+        return (f"ParsedMessage({self.platform}, id={self.message_id}, group={self.group_id}, "
+                f"sender={self.sender_id}, segments={[t for t, _ in self.segments]})")
+
+
+def _str_or_none(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def decode_qq(raw: Dict) -> ParsedMessage:
+    sender = raw.get("sender", {})
+    segments = [(part.get("type"), part.get("data", {})) for part in raw.get("message", [])]
+    return ParsedMessage(
+        platform="qq",
+        message_id=_str_or_none(raw.get("message_id")),
+        group_id=_str_or_none(raw.get("group_id")),
+        sender_id=sender.get("user_id", "未知ID"),
+        sender_name=sender.get("nickname", "未知用户"),
+        segments=segments,
+        raw=raw
+    )
+
+
+def decode_yunhu(raw: Dict) -> ParsedMessage:
+    event = raw.get("event", {})
+    msg = event.get("message", {})
+    sender = event.get("sender", {})
+    sender_id = sender.get("senderId", "未知ID")
+
+    content = msg.get("content", {})
+    content_type = msg.get("contentType", "text")
+    segments = []
+    if content_type == "text":
+        segments.append(("text", {"text": content.get("text", "")}))
+    elif content_type == "image":
+        segments.append(("image", {"url": content.get("imageUrl", "")}))
+
+    return ParsedMessage(
+        platform="yunhu",
+        message_id=_str_or_none(msg.get("msgId")),
+        group_id=_str_or_none(msg.get("chatId")),
+        sender_id=sender_id,
+        sender_name=sender.get("senderNickname") or sender_id,
+        segments=segments,
+        raw=raw
+    )
+
+
+def _decode_telegram_body(msg: Dict, raw: Dict) -> ParsedMessage:
+    from_user = msg.get("from", {})
+    first_name = from_user.get("first_name", "未知用户")
+    last_name = from_user.get("last_name")
+
+    msg_type = msg.get("type", "text")
+    segments = []
+    if msg_type == "text":
+        segments.append(("text", {"text": msg.get("text", "")}))
+    elif msg_type == "photo":
+        segments.append(("image", {"url": msg.get("photo", [{}])[-1].get("file_url", "")}))
+    elif msg_type == "sticker":
+        segments.append(("sticker", {"url": msg.get("sticker", {}).get("file_url", "")}))
+    elif msg_type == "forward":
+        forwarded = msg.get("forwarded_message", {})
+        segments.append(("forward", {"message": _decode_telegram_body(forwarded, forwarded)}))
+    elif msg_type == "video":
+        segments.append(("video", {"url": msg.get("video", {}).get("file_url", "")}))
+    elif msg_type == "voice":
+        segments.append(("voice", {"url": msg.get("voice", {}).get("file_url", "")}))
+
+    return ParsedMessage(
+        platform="telegram",
+        message_id=_str_or_none(msg.get("message_id")),
+        group_id=_str_or_none(msg.get("chat", {}).get("id")),
+        sender_id=from_user.get("id"),
+        sender_name=f"{first_name} {last_name}" if last_name else first_name,
+        segments=segments,
+        raw=raw
+    )
+
+
+def decode_telegram(raw: Dict) -> ParsedMessage:
+    msg = raw.get("message") or raw.get("edited_message") or {}
+    return _decode_telegram_body(msg, raw)
+
+
+def merge_messages(messages: List[ParsedMessage]) -> ParsedMessage:
+    """将同一发送者的连续消息合并为一条，消息之间以 break 消息段分隔"""
+    if len(messages) == 1:
+        return messages[0]
+    first = messages[0]
+    segments = []
+    source_ids = []
+    for index, message in enumerate(messages):
+        # 按条分隔（即使某条没有可渲染的内容），保证第 n 段与 source_ids[n] 对应
+        if index:
+            segments.append(("break", {}))
+        segments.extend(message.segments)
+        source_ids.extend(message.all_ids)
+    return ParsedMessage(
+        platform=first.platform,
+        message_id=first.message_id,
+        group_id=first.group_id,
+        sender_id=first.sender_id,
+        sender_name=first.sender_name,
+        segments=segments,
+        raw=first.raw,
+        source_ids=source_ids
+    )
+
+
+def replace_merged_part(merged: ParsedMessage, edited: ParsedMessage) -> Optional[ParsedMessage]:
+    """把合并消息中与 edited 对应的那条源消息替换为编辑后的内容；无法对应时返回 None"""
+    if not merged.source_ids or edited.message_id not in merged.source_ids:
+        return None
+    parts: List[List[Segment]] = [[]]
+    for segment in merged.segments:
+        if segment[0] == "break":
+            parts.append([])
+        else:
+            parts[-1].append(segment)
+    if len(parts) != len(merged.source_ids):
+        return None
+    parts[merged.source_ids.index(edited.message_id)] = list(edited.segments)
+    segments = []
+    for index, part in enumerate(parts):
+        if index:
+            segments.append(("break", {}))
+        segments.extend(part)
+    return ParsedMessage(
+        platform=merged.platform,
+        message_id=merged.message_id,
+        group_id=merged.group_id,
+        sender_id=merged.sender_id,
+        sender_name=merged.sender_name,
+        segments=segments,
+        raw=merged.raw,
+        source_ids=merged.source_ids
+    )
+
+
+# 平台名 -> 解码器
+DECODERS: Dict[str, Callable[[Dict], ParsedMessage]] = {
+    "qq": decode_qq,
+    "yunhu": decode_yunhu,
+    "telegram": decode_telegram,
+}
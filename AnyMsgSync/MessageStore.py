@@ -0,0 +1,284 @@
+import os
+import sqlite3
+import time
+from typing import List, Optional, Tuple
+
+DEFAULT_DB_PATH = "anymsgsync_map.db"
+
+# 各平台用户可撤回/删除/编辑自己消息的时间窗口（秒）
+# QQ 普通成员撤回限制约 2 分钟，Telegram 机器人删除消息限制 48 小时
+DEFAULT_WINDOWS = {
+    "qq": 180,
+    "telegram": 48 * 3600,
+    "yunhu": 24 * 3600,
+}
+DEFAULT_MAX_ENTRIES = 200000
+COLUMNS = "from_platform, group_id, msg_id, to_platform, target_group_id, target_msg_id, created_at, last_access, coalesced"
+DEFAULT_PURGE_INTERVAL = 300
+
+# 各平台的消息ID只保证在单个群内唯一（如 Telegram），因此主键包含来源群
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        from_platform   TEXT NOT NULL,
+        group_id        TEXT NOT NULL,
+        msg_id          TEXT NOT NULL,
+        to_platform     TEXT NOT NULL,
+        target_group_id TEXT NOT NULL,
+        target_msg_id   TEXT NOT NULL,
+        created_at      REAL NOT NULL,
+        last_access     REAL NOT NULL,
+        coalesced       INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (from_platform, group_id, msg_id, to_platform, target_group_id, target_msg_id)
+    ) WITHOUT ROWID
+"""
+
+
+class RetentionPolicy:
+    """按平台对（来源 → 目标）计算映射的保留时长
+
+    映射 (from → to) 用于来源平台上的撤回/编辑同步到目标平台，只要来源一侧还能撤回或编辑，
+    映射就需要保留，因此默认取来源平台的窗口；目标平台已超出自身窗口时撤回会失败并记录日志，
+    不会因映射提前过期而在编辑时重复发送。也可以通过 pairs 为单个方向单独指定。
+    """
+
+    def __init__(self, config: dict):
+        self.windows = dict(DEFAULT_WINDOWS)
+        self.windows.update(config.get("windows", {}))
+        self.default_window = config.get("default_window", 24 * 3600)
+        self.pairs = {}
+        for key, seconds in config.get("pairs", {}).items():
+            from_platform, _, to_platform = key.partition("->")
+            self.pairs[(from_platform.strip(), to_platform.strip())] = seconds
+        self.max_entries = config.get("max_entries", DEFAULT_MAX_ENTRIES)
+        self.purge_interval = config.get("purge_interval", DEFAULT_PURGE_INTERVAL)
+
+    def window(self, from_platform: str, to_platform: str) -> float:
+        pair = self.pairs.get((from_platform, to_platform))
+        if pair is not None:
+            return pair
+        return self.windows.get(from_platform, self.default_window)
+
+    def cutoff(self, from_platform: str, to_platform: str, now: float) -> float:
+        return now - self.window(from_platform, to_platform)
+
+
+class MessageIdStore:
+    """消息ID映射存储
+
+    基于 SQLite 的索引存储，单条映射的写入与查询都只触及对应索引，
+    与历史映射总量无关，取代原先对 sdk.env 整表读写的方式。
+    """
+
+    def __init__(self, main, path: Optional[str] = None):
+        self.main = main
+        self.logger = main.logger
+        config = main.config.get("store", {})
+        self.path = path or config.get("path", DEFAULT_DB_PATH)
+        self.retention = RetentionPolicy(main.config.get("retention", {}))
+        self._last_purge = 0.0
+        self._approx_count = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+        self._approx_count = self.count()
+
+    def _init_schema(self):
+        self.conn.execute(SCHEMA.format(table="message_map"))
+        self._migrate_schema()
+        # 主键前缀 (from_platform, group_id, msg_id) 已覆盖查询，额外索引只服务于过期清理与 LRU 淘汰
+        self.conn.execute("DROP INDEX IF EXISTS idx_message_map_lookup")
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_message_map_expiry
+            ON message_map (from_platform, to_platform, created_at)
+        """)
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_message_map_access
+            ON message_map (last_access)
+        """)
+
+    def _migrate_schema(self):
+        """把旧版本创建的映射表重建为当前结构
+
+        旧表的主键不含来源群，无法通过 ALTER TABLE 修改，因此整表复制：来源群取自对应的反向映射
+        （其目标群即为正向映射的来源群），找不到反向映射时留空；缺少的列按创建时间与未合并补齐。
+        """
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(message_map)")}
+        if "group_id" in columns:
+            return
+        last_access = "m.last_access" if "last_access" in columns else "m.created_at"
+        coalesced = "m.coalesced" if "coalesced" in columns else "0"
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.execute(SCHEMA.format(table="message_map_new"))
+            self.conn.execute(f"""
+                INSERT OR IGNORE INTO message_map_new ({COLUMNS})
+                SELECT m.from_platform,
+                       COALESCE((SELECT r.target_group_id FROM message_map r
+                                 WHERE r.from_platform = m.to_platform AND r.msg_id = m.target_msg_id
+                                   AND r.to_platform = m.from_platform AND r.target_msg_id = m.msg_id
+                                 LIMIT 1), ''),
+                       m.msg_id, m.to_platform, m.target_group_id, m.target_msg_id,
+                       m.created_at, {last_access}, {coalesced}
+                FROM message_map m
+            """)
+            self.conn.execute("DROP TABLE message_map")
+            self.conn.execute("ALTER TABLE message_map_new RENAME TO message_map")
+        self.logger.info("[Mapping] 已将映射表升级为按来源群区分消息ID的结构")
+
+    def add_pair(self, *, msg_id: str, target_msg_id: str, from_platform: str, to_platform: str,
+                 group_id: str, target_group_id: str, coalesced: bool = False):
+        """在一个事务中写入正向与反向映射；coalesced 表示目标消息由多条源消息合并而成"""
+        now = time.time()
+        flag = int(coalesced)
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO message_map ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (from_platform, str(group_id), str(msg_id), to_platform, str(target_group_id),
+                     str(target_msg_id), now, now, flag),
+                    (to_platform, str(target_group_id), str(target_msg_id), from_platform, str(group_id),
+                     str(msg_id), now, now, flag),
+                ]
+            )
+        self._approx_count += 2
+        self._maybe_purge(now)
+
+    def get(self, from_platform: str, group_id: str, msg_id: str, to_platform: str,
+            target_group_id: Optional[str] = None) -> Optional[Tuple[str, str]]:
+        """查询单个目标映射，返回 (目标消息ID, 目标群ID)，存在多条时取最新一条；已过期的映射视为不存在"""
+        now = time.time()
+        sql = ("SELECT target_msg_id, target_group_id FROM message_map "
+               "WHERE from_platform = ? AND group_id = ? AND msg_id = ? AND to_platform = ? AND created_at >= ?")
+        params = [from_platform, str(group_id), str(msg_id), to_platform,
+                  self.retention.cutoff(from_platform, to_platform, now)]
+        if target_group_id is not None:
+            sql += " AND target_group_id = ?"
+            params.append(str(target_group_id))
+        sql += " ORDER BY created_at DESC LIMIT 1"
+        row = self.conn.execute(sql, params).fetchone()
+        if not row:
+            return None
+        self._touch(from_platform, group_id, msg_id, now)
+        return row[0], row[1]
+
+    def is_coalesced(self, from_platform: str, group_id: str, msg_id: str, to_platform: str,
+                     target_group_id: str) -> bool:
+        """源消息发往该目标群时是否与其他消息合并发送"""
+        row = self.conn.execute(
+            "SELECT MAX(coalesced) FROM message_map "
+            "WHERE from_platform = ? AND group_id = ? AND msg_id = ? AND to_platform = ? AND target_group_id = ?",
+            (from_platform, str(group_id), str(msg_id), to_platform, str(target_group_id))
+        ).fetchone()
+        return bool(row and row[0])
+
+    def get_all(self, from_platform: str, group_id: str, msg_id: str) -> List[Tuple[str, str, str]]:
+        """查询某条源消息的全部目标映射，返回 [(目标平台, 目标消息ID, 目标群ID), ...]"""
+        now = time.time()
+        rows = self.conn.execute(
+            "SELECT to_platform, target_msg_id, target_group_id, created_at FROM message_map "
+            "WHERE from_platform = ? AND group_id = ? AND msg_id = ?",
+            (from_platform, str(group_id), str(msg_id))
+        ).fetchall()
+        result = [
+            (to_platform, target_msg_id, target_group_id)
+            for to_platform, target_msg_id, target_group_id, created_at in rows
+            if created_at >= self.retention.cutoff(from_platform, to_platform, now)
+        ]
+        if result:
+            self._touch(from_platform, group_id, msg_id, now)
+        return result
+
+    def _touch(self, from_platform: str, group_id: str, msg_id: str, now: float):
+        self.conn.execute(
+            "UPDATE message_map SET last_access = ? WHERE from_platform = ? AND group_id = ? AND msg_id = ?",
+            (now, from_platform, str(group_id), str(msg_id))
+        )
+
+    def _maybe_purge(self, now: float):
+        # 按间隔定期清理；条数（近似值）超过上限时立即淘汰
+        if (now - self._last_purge >= self.retention.purge_interval
+                or self._approx_count > self.retention.max_entries):
+            self.purge(now)
+
+    def purge(self, now: Optional[float] = None) -> int:
+        """删除超出保留窗口的映射，并按最近访问时间淘汰超出条数上限的部分"""
+        now = now or time.time()
+        self._last_purge = now
+        removed = 0
+        with self.conn:
+            self.conn.execute("BEGIN")
+            pairs = self.conn.execute(
+                "SELECT DISTINCT from_platform, to_platform FROM message_map"
+            ).fetchall()
+            for from_platform, to_platform in pairs:
+                removed += self.conn.execute(
+                    "DELETE FROM message_map WHERE from_platform = ? AND to_platform = ? AND created_at < ?",
+                    (from_platform, to_platform, self.retention.cutoff(from_platform, to_platform, now))
+                ).rowcount
+
+            # 超限时淘汰到上限的 90%，避免之后每次写入都触发淘汰
+            if self.count() > self.retention.max_entries:
+                overflow = self.count() - int(self.retention.max_entries * 0.9)
+                removed += self.conn.execute("""
+                    DELETE FROM message_map
+                    WHERE (from_platform, group_id, msg_id, to_platform, target_group_id, target_msg_id) IN (
+                        SELECT from_platform, group_id, msg_id, to_platform, target_group_id, target_msg_id
+                        FROM message_map ORDER BY last_access LIMIT ?
+                    )
+                """, (overflow,)).rowcount
+        self._approx_count = self.count()
+        if removed:
+            self.logger.debug(f"[Mapping] 已清理 {removed} 条过期或超限映射")
+        return removed
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM message_map").fetchone()[0]
+
+    @property
+    def approx_count(self) -> int:
+        """近似条数，不查询数据库，供指标导出等频繁读取的场景使用"""
+        return self._approx_count
+
+    def import_legacy(self, mapping: dict) -> int:
+        """导入旧版 sdk.env 中的 message_id_map 嵌套字典
+
+        旧结构不记录来源群，从反向映射中取得（反向映射的目标群即来源群），找不到时留空。
+        """
+        rows = []
+        now = time.time()
+        for from_platform, targets in mapping.items():
+            for to_platform, entries in targets.items():
+                reverse = (mapping.get(to_platform) or {}).get(from_platform) or {}
+                for msg_id, value in entries.items():
+                    try:
+                        target_msg_id, target_group_id = value
+                    except (TypeError, ValueError):
+                        continue
+                    back = reverse.get(str(target_msg_id))
+                    group_id = back[1] if isinstance(back, (list, tuple)) and len(back) == 2 else ""
+                    rows.append((from_platform, str(group_id), str(msg_id), to_platform,
+                                 str(target_group_id), str(target_msg_id), now, now))
+        if rows:
+            with self.conn:
+                self.conn.execute("BEGIN")
+                self.conn.executemany(
+                    f"INSERT OR IGNORE INTO message_map ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)", rows
+                )
+            self._approx_count = self.count()
+        return len(rows)
+
+    def close(self):
+        """合并 WAL 日志并关闭连接"""
+        try:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.ProgrammingError:
+            # 已关闭
+            return
+        self.conn.close()
@@ -0,0 +1,228 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from .Tracing import Span, SpanHook, Trace
+
+# 延迟直方图的桶上界（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DEFAULT_METRICS_CONFIG = {
+    "enabled": True,
+    "host": "127.0.0.1",   # 导出端口监听地址
+    "port": None,          # 设置后在该端口提供 /metrics，未设置时仅可通过 render() 读取
+}
+
+ROUTE_LABELS = ("source_platform", "source_group", "target_platform", "target_group")
+
+COUNTERS = {
+    "anymsgsync_forwarded_total": "已成功转发的消息数",
+    "anymsgsync_recalled_total": "已同步撤回的消息数",
+    "anymsgsync_edited_total": "已同步编辑的消息数",
+    "anymsgsync_failed_total": "同步失败次数（按操作区分）",
+}
+HISTOGRAMS = {
+    "anymsgsync_stage_seconds": "各阶段耗时（media 媒体下载 / build 渲染 / send 发送 / upload 上传附件 / mapping 写入映射）",
+}
+
+
+def route_labels(source_platform, source_group, target_platform, target_group) -> Tuple[str, ...]:
+    return (str(source_platform).lower(), "" if source_group is None else str(source_group),
+            str(target_platform).lower(), str(target_group))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Metrics(SpanHook):
+    """指标统计
+
+    按路由（来源平台、来源群、目标平台、目标群）记录转发、撤回、编辑与失败次数；
+    作为追踪钩子，把带路由标签的阶段耗时记入延迟直方图；队列深度、映射表大小与缓存命中率在导出时实时读取。
+    可通过 render() 在进程内获取 Prometheus 文本格式，或配置 port 由内置 HTTP 端口导出。
+    """
+
+    def __init__(self, main):
+        self.main = main
+        self.logger = main.logger
+        self.config = {**DEFAULT_METRICS_CONFIG, **main.config.get("metrics", {})}
+        self.enabled = self.config["enabled"]
+        self.buckets = tuple(self.config.get("buckets", DEFAULT_BUCKETS))
+        self._counters: Dict[str, Dict[Tuple, float]] = {name: {} for name in COUNTERS}
+        self._histograms: Dict[Tuple[str, Tuple], _Histogram] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def inc(self, name: str, labels: Tuple[str, ...], value: float = 1):
+        if not self.enabled:
+            return
+        series = self._counters[name]
+        series[labels] = series.get(labels, 0) + value
+
+    def observe(self, stage: str, labels: Tuple[str, ...], seconds: float):
+        if not self.enabled:
+            return
+        key = (stage, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = _Histogram(len(self.buckets))
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                histogram.counts[index] += 1
+                break
+        histogram.sum += seconds
+        histogram.count += 1
+
+    def on_span_end(self, trace: Optional[Trace], span: Span):
+        if span.labels is not None:
+            self.observe(span.name, span.labels, span.duration)
+
+    def _gauges(self) -> List[Tuple[str, str, str, List[Tuple[Tuple, float]]]]:
+        """(指标名, 类型, 说明, [(标签, 值)])，导出时实时读取各组件状态"""
+        main = self.main
+        queue_depths = main.outbound.queue_depths()
+        caches = {"delivered_digests": main.delivered_digests, "coalesced_batches": main.coalesced_batches}
+        yunhu_builder = main.message_builders.get("Yunhu")
+        if yunhu_builder is not None:
+            caches["yunhu_profile"] = yunhu_builder.profile_cache.cache
+        if main.media.enabled:
+            caches["media_urls"] = main.media.urls.cache
+        if main.transcoder.enabled:
+            caches["transcode"] = main.transcoder.results.cache
+
+        return [
+            ("anymsgsync_outbound_queue_depth", "gauge", "出站队列中等待发送的调用数",
+             [((platform,), depth) for platform, depth in sorted(queue_depths.items())]),
+            ("anymsgsync_mapping_entries", "gauge", "消息ID映射表的条目数（近似值）",
+             [((), main.sync_manager.store.approx_count)]),
+            ("anymsgsync_cache_entries", "gauge", "缓存中的条目数",
+             [((cache,), len(obj)) for cache, obj in caches.items()]),
+            ("anymsgsync_cache_hits_total", "counter", "缓存命中次数",
+             [((cache,), obj.hits) for cache, obj in caches.items()]),
+            ("anymsgsync_cache_misses_total", "counter", "缓存未命中次数",
+             [((cache,), obj.misses) for cache, obj in caches.items()]),
+            ("anymsgsync_duplicates_dropped_total", "counter", "因重复投递被丢弃的入站消息数",
+             [((platform,), count) for platform, count in sorted(main.duplicates_dropped.items())]),
+            ("anymsgsync_echoes_dropped_total", "counter", "被回环防护丢弃的入站消息数",
+             [((platform,), count) for platform, count in sorted(main.loop_guard.dropped.items())]),
+            ("anymsgsync_media_cache_bytes", "gauge", "媒体缓存占用的磁盘空间（字节）",
+             [((), main.media.store.total)] if main.media.enabled else []),
+        ]
+
+    def render(self) -> str:
+        """以 Prometheus 文本格式（0.0.4）导出全部指标"""
+        lines = []
+        for name, help_text in COUNTERS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            names = ROUTE_LABELS + ("operation",) if name == "anymsgsync_failed_total" else ROUTE_LABELS
+            for labels, value in self._counters[name].items():
+                lines.append(f"{name}{_format_labels(names, labels)} {_format_value(value)}")
+
+        for name, help_text in HISTOGRAMS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            names = ("stage",) + ROUTE_LABELS
+            for (stage, labels), histogram in self._histograms.items():
+                values = (stage,) + labels
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(names, values, ('le', _format_value(bound)))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(names, values, ('le', '+Inf'))} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(names, values)} {_format_value(histogram.sum)}")
+                lines.append(f"{name}_count{_format_labels(names, values)} {histogram.count}")
+
+        label_names = {
+            "anymsgsync_outbound_queue_depth": ("platform",),
+            "anymsgsync_duplicates_dropped_total": ("platform",),
+            "anymsgsync_echoes_dropped_total": ("platform",),
+            "anymsgsync_mapping_entries": (),
+            "anymsgsync_media_cache_bytes": (),
+        }
+        for name, metric_type, help_text, samples in self._gauges():
+            names = label_names.get(name, ("cache",))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(names, labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict:
+        """进程内读取：计数与各阶段的平均耗时，便于直接打印或写日志"""
+        counters = {
+            name: {"/".join(labels): value for labels, value in series.items()}
+            for name, series in self._counters.items()
+        }
+        stages = {
+            f"{stage}:{'/'.join(labels)}": {
+                "count": histogram.count,
+                "avg": histogram.sum / histogram.count if histogram.count else 0.0,
+            }
+            for (stage, labels), histogram in self._histograms.items()
+        }
+        gauges = {
+            name: {"/".join(labels) or "value": value for labels, value in samples}
+            for name, _, _, samples in self._gauges()
+        }
+        return {"counters": counters, "stages": stages, "gauges": gauges}
+
+    async def start(self):
+        port = self.config["port"]
+        if not self.enabled or port is None or self._server is not None:
+            return
+        self._server = await asyncio.start_server(self._handle_http, self.config["host"], int(port))
+        self.logger.info(f"[Metrics] 指标导出已启动: http://{self.config['host']}:{port}/metrics")
+
+    async def _handle_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # 读完请求头，忽略其内容
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/", "/metrics"):
+                status, body = "200 OK", self.render().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                status, body, content_type = "404 Not Found", b"not found\n", "text/plain"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            self.logger.warning(f"[Metrics] 处理导出请求失败: {e}")
+        finally:
+            writer.close()
+
+    async def close(self):
+        server, self._server = self._server, None
+        if server is not None:
+            server.close()
+            await server.wait_closed()
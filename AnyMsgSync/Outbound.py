@@ -0,0 +1,149 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional
+
+# 各平台默认限速：rate/burst 为平台整体，group_rate/group_burst 为单个群
+# Telegram 官方建议全局不超过 30 条/秒，单群不超过 20 条/分钟
+DEFAULT_RATE_LIMITS = {
+    "telegram": {"rate": 25, "burst": 30, "group_rate": 20 / 60, "group_burst": 3, "workers": 4},
+    "qq": {"rate": 5, "burst": 5, "group_rate": 1, "group_burst": 3, "workers": 2},
+    "yunhu": {"rate": 10, "burst": 10, "group_rate": 2, "group_burst": 5, "workers": 4},
+}
+FALLBACK_RATE_LIMIT = {"rate": 10, "burst": 10, "group_rate": 2, "group_burst": 5, "workers": 2}
+
+
+class TokenBucket:
+    """令牌桶：按固定速率补充令牌，令牌不足时等待而不是失败"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # 立即预占一个令牌（余额可为负），再等到该令牌补充到位；等待者按先来后到错开，各自独立睡眠
+        self._refill()
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return
+        try:
+            await asyncio.sleep(-self.tokens / self.rate)
+        except asyncio.CancelledError:
+            # 放弃等待时归还预占的令牌
+            self.tokens += 1
+            raise
+
+
+class OutboundScheduler:
+    """出站调度器
+
+    每个目标平台一条发送队列和若干工作协程，平台令牌桶在工作协程中获取；
+    单群令牌桶在入队前获取，避免某个繁忙群占住整个平台的队列。
+    """
+
+    def __init__(self, main):
+        self.main = main
+        self.logger = main.logger
+        config = main.config.get("rate_limit", {})
+        self.enabled = config.get("enabled", True)
+        self.limits = {}
+        for platform in set(DEFAULT_RATE_LIMITS) | {k for k, v in config.items() if isinstance(v, dict)}:
+            self.limits[platform] = {
+                **DEFAULT_RATE_LIMITS.get(platform, FALLBACK_RATE_LIMIT),
+                **config.get(platform, {})
+            }
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: Dict[str, list] = {}
+        self._platform_buckets: Dict[str, TokenBucket] = {}
+        self._group_buckets: Dict[tuple, TokenBucket] = {}
+        self._closed = False
+
+    def _limit(self, platform: str) -> dict:
+        return self.limits.get(platform, FALLBACK_RATE_LIMIT)
+
+    def _group_bucket(self, platform: str, group_id: str) -> TokenBucket:
+        key = (platform, str(group_id))
+        bucket = self._group_buckets.get(key)
+        if bucket is None:
+            limit = self._limit(platform)
+            bucket = self._group_buckets[key] = TokenBucket(limit["group_rate"], limit["group_burst"])
+        return bucket
+
+    def _queue(self, platform: str) -> asyncio.Queue:
+        queue = self._queues.get(platform)
+        if queue is None:
+            limit = self._limit(platform)
+            queue = self._queues[platform] = asyncio.Queue()
+            self._platform_buckets[platform] = TokenBucket(limit["rate"], limit["burst"])
+            self._workers[platform] = [
+                asyncio.create_task(self._worker(platform, queue))
+                for _ in range(limit["workers"])
+            ]
+        return queue
+
+    async def _worker(self, platform: str, queue: asyncio.Queue):
+        bucket = self._platform_buckets[platform]
+        while True:
+            func, args, kwargs, future = await queue.get()
+            try:
+                if future.done():
+                    continue
+                await bucket.acquire()
+                result = await self._call(func, args, kwargs)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                # 工作协程被取消或调用抛出 CancelledError 时同样取消该项，避免提交方永远等待
+                if not future.done():
+                    future.cancel()
+                queue.task_done()
+
+    async def _call(self, func: Callable, args, kwargs) -> Any:
+        # 全局并发上限只约束正在进行的适配器调用，排队、限速与重试退避的等待不占用名额
+        async with self.main.get_fanout_semaphore():
+            return await func(*args, **kwargs)
+
+    async def submit(self, platform: str, group_id: Optional[str], func: Callable, *args, **kwargs) -> Any:
+        """提交一次出站调用，按平台与群限速后执行，返回调用结果"""
+        platform = platform.lower()
+        if not self.enabled:
+            return await self._call(func, args, kwargs)
+
+        if group_id is not None:
+            await self._group_bucket(platform, group_id).acquire()
+        if self._closed:
+            raise RuntimeError("出站调度器已关闭")
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue(platform).put_nowait((func, args, kwargs, future))
+        return await future
+
+    def queue_depths(self) -> Dict[str, int]:
+        """各平台发送队列中等待执行的调用数"""
+        return {platform: queue.qsize() for platform, queue in self._queues.items()}
+
+    async def close(self):
+        """停止工作协程；仍在排队的调用被取消，提交方随即收到 CancelledError"""
+        self._closed = True
+        for workers in self._workers.values():
+            for worker in workers:
+                worker.cancel()
+        for workers in self._workers.values():
+            await asyncio.gather(*workers, return_exceptions=True)
+        for queue in self._queues.values():
+            while not queue.empty():
+                *_, future = queue.get_nowait()
+                if not future.done():
+                    future.cancel()
+        self._queues.clear()
+        self._workers.clear()
+        self._platform_buckets.clear()
@@ -0,0 +1,237 @@
+import asyncio
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .Message import ParsedMessage
+
+DEFAULT_OUTBOX_CONFIG = {
+    "enabled": True,
+    "path": "anymsgsync_outbox",     # 发件箱目录
+    "segment_bytes": 1024 * 1024,    # 单个分段文件的大小上限，超出后切换到新分段
+    "max_segments": 4,               # 保留的历史分段数，超出时把仍未完成的记录搬到当前分段后删除最旧的分段
+    "fsync": False,                  # 每次写入后是否 fsync（更安全，但写入更慢）
+}
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".log"
+
+Target = Tuple[str, str]
+
+
+class _Entry:
+    __slots__ = ("key", "platform", "raw", "remaining", "segment")
+
+    def __init__(self, key: str, platform: str, raw: Dict, remaining: Set[Target], segment: int):
+        self.key = key
+        self.platform = platform
+        self.raw = raw
+        self.remaining = remaining
+        self.segment = segment
+
+
+class Outbox:
+    """转发发件箱（预写日志）
+
+    每条入站消息在开始分发前追加一条记录（原始事件 + 目标列表），每个目标发送完成后追加一条完成记录；
+    进程重启时回放日志，把尚未完成的目标重新发送一次（至少一次语义）。
+    日志按大小分段：只追加写入，分段内记录全部完成后整段删除；历史分段过多时，
+    把其中仍未完成的少量记录搬到当前分段再删除，使日志总大小保持在很小的范围内。
+    """
+
+    def __init__(self, main):
+        self.main = main
+        self.logger = main.logger
+        self.config = {**DEFAULT_OUTBOX_CONFIG, **main.config.get("outbox", {})}
+        self.enabled = self.config["enabled"]
+        self.directory = self.config["path"]
+        self._pending: Dict[str, _Entry] = {}
+        self._live: Dict[int, int] = {}
+        self._segments: List[int] = []
+        self._active: Optional[int] = None
+        self._file = None
+        self._size = 0
+        # 未完成的记录超出分段预算时临时放宽的上限，回落到预算以内后恢复配置值
+        self._max_segments = self.config["max_segments"]
+        self._replay_task: Optional[asyncio.Task] = None
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            self._load()
+            self._open_segment()
+            self._compact()
+
+    @staticmethod
+    def _key(platform: str, group_id: str, msg_id: str) -> str:
+        # Telegram 的 message_id 只在单个会话内唯一，键中须包含来源群
+        return f"{platform}:{group_id}:{msg_id}"
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{number:08d}{SEGMENT_SUFFIX}")
+
+    def _load(self):
+        numbers = sorted(
+            int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+        for number in numbers:
+            with open(self._segment_path(number), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 进程退出时写了一半的最后一行
+                        continue
+                    self._apply(record, number)
+        self._segments = numbers
+        for entry in self._pending.values():
+            self._live[entry.segment] = self._live.get(entry.segment, 0) + 1
+        if self._pending:
+            self.logger.info(f"[Outbox] 发现 {len(self._pending)} 条未完成的转发，将在启动后补发")
+
+    def _apply(self, record: Dict, segment: int):
+        if "e" in record:
+            self._pending[record["e"]] = _Entry(
+                record["e"], record["p"], record["r"], {tuple(t) for t in record["t"]}, segment
+            )
+        elif "d" in record:
+            entry = self._pending.get(record["d"])
+            if entry is not None:
+                entry.remaining.discard(tuple(record["t"]))
+                if not entry.remaining:
+                    del self._pending[record["d"]]
+
+    def _open_segment(self):
+        self._active = (self._segments[-1] + 1) if self._segments else 1
+        self._segments.append(self._active)
+        self._file = open(self._segment_path(self._active), "a", encoding="utf-8")
+        self._size = 0
+
+    def _write_line(self, record: Dict):
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+        self._file.write(line)
+        self._file.flush()
+        if self.config["fsync"]:
+            os.fsync(self._file.fileno())
+        self._size += len(line)
+
+    def _write(self, record: Dict):
+        self._write_line(record)
+        if self._size >= self.config["segment_bytes"]:
+            self._file.close()
+            self._open_segment()
+            self._compact()
+
+    @staticmethod
+    def _event_record(entry: _Entry) -> Dict:
+        return {"e": entry.key, "p": entry.platform, "r": entry.raw, "t": sorted(entry.remaining)}
+
+    def _compact(self):
+        # 较新分段中可能有较旧记录的完成标记，因此只从最旧的分段开始按顺序删除
+        self._drop_finished_prefix()
+        if len(self._segments) - 1 <= self.config["max_segments"]:
+            self._max_segments = self.config["max_segments"]
+        # 历史分段过多时，把最旧分段中仍未完成的记录（连同剩余目标）直接写入当前分段；
+        # 搬运不经过 _write，不会在搬运途中再切换分段
+        while len(self._segments) - 1 > self._max_segments:
+            oldest = self._segments[0]
+            for entry in [e for e in self._pending.values() if e.segment == oldest]:
+                entry.segment = self._active
+                self._live[self._active] = self._live.get(self._active, 0) + 1
+                self._write_line(self._event_record(entry))
+            self._remove_segment(oldest)
+            self._drop_finished_prefix()
+            if self._size >= self.config["segment_bytes"]:
+                # 搬来的记录已占满当前分段，说明未完成的记录超出了分段预算；
+                # 此时放宽上限，避免此后每次切换分段都把整段记录再搬一次
+                self._max_segments = len(self._segments)
+                self.logger.warning(
+                    f"[Outbox] 未完成的转发（{len(self._pending)} 条）超出 {self.config['max_segments']} 个分段的容量，"
+                    f"分段上限暂时放宽到 {self._max_segments}"
+                )
+                break
+
+    def _drop_finished_prefix(self):
+        while len(self._segments) > 1 and self._segments[0] != self._active and not self._live.get(self._segments[0]):
+            self._remove_segment(self._segments[0])
+
+    def _remove_segment(self, number: int):
+        try:
+            os.remove(self._segment_path(number))
+        except FileNotFoundError:
+            pass
+        self._segments.remove(number)
+        self._live.pop(number, None)
+
+    def append(self, message: ParsedMessage, targets: Iterable[Target]):
+        """记录一条即将分发的入站消息及其全部目标"""
+        targets = set(targets)
+        if not self.enabled or not targets or not message.message_id:
+            return
+        key = self._key(message.platform, message.group_id, message.message_id)
+        previous = self._pending.get(key)
+        if previous is not None:
+            self._release(previous)
+        entry = self._pending[key] = _Entry(key, message.platform, message.raw, targets, self._active)
+        self._live[self._active] = self._live.get(self._active, 0) + 1
+        self._write(self._event_record(entry))
+
+    def mark_done(self, message: ParsedMessage, target_type: str, target_group_id: str):
+        """标记某个目标已处理完毕；合并消息会同时标记其中每条源消息"""
+        if not self.enabled:
+            return
+        target = (target_type, str(target_group_id))
+        for msg_id in message.all_ids:
+            entry = self._pending.get(self._key(message.platform, message.group_id, msg_id))
+            if entry is not None and target in entry.remaining:
+                self._finish(entry, target)
+
+    def _finish(self, entry: _Entry, target: Target):
+        self._write({"d": entry.key, "t": target})
+        entry.remaining.discard(target)
+        if not entry.remaining:
+            del self._pending[entry.key]
+            self._release(entry)
+
+    def _release(self, entry: _Entry):
+        self._live[entry.segment] = self._live.get(entry.segment, 0) - 1
+        if self._segments and entry.segment == self._segments[0]:
+            self._drop_finished_prefix()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def start_replay(self):
+        """在后台补发上次退出时尚未完成的转发，不阻塞启动"""
+        if self._pending and self._replay_task is None:
+            self._replay_task = asyncio.ensure_future(self.replay())
+
+    async def replay(self):
+        handlers = {handler.platform_name.lower(): handler for handler in self.main.platform_handlers.values()}
+        entries = list(self._pending.values())
+        replayed = 0
+        for entry in entries:
+            handler = handlers.get(entry.platform)
+            if handler is None:
+                self.logger.warning(f"[Outbox] {entry.platform} 处理器未加载，无法补发 {entry.key}")
+                continue
+            message = self.main.parser.decode(entry.platform, entry.raw)
+            if message is None:
+                continue
+            with self.main.tracer.trace("replay", entry.platform):
+                await handler.forward_message(message, targets=set(entry.remaining))
+            # 发送任务都已结束；仍未完成的目标已不在当前转发配置中，不再保留
+            if self._pending.get(entry.key) is entry:
+                for target in list(entry.remaining):
+                    self._finish(entry, target)
+            replayed += 1
+        self.logger.info(f"[Outbox] 已补发 {replayed} 条未完成的转发")
+
+    async def close(self):
+        task, self._replay_task = self._replay_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
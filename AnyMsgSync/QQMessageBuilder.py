@@ -1,14 +1,198 @@
+import json
+from typing import List
+from .Message import ParsedMessage, Segment
+
+# 消息段渲染器注册表：格式 -> 消息段类型 -> renderer(builder, data)
+# 在模块加载时一次性构建，渲染时直接查表，不再为每个消息段创建处理器字典
+SEGMENT_RENDERERS = {"html": {}, "markdown": {}, "text": {}}
+
+
+def segment_renderer(msg_types, *formats):
+    """注册消息段渲染器，未指定 formats 时注册到全部格式"""
+    if isinstance(msg_types, str):
+        msg_types = (msg_types,)
+
+    def decorator(func):
+        for fmt in formats or SEGMENT_RENDERERS:
+            for msg_type in msg_types:
+                SEGMENT_RENDERERS[fmt][msg_type] = func
+        return func
+    return decorator
+
+
+def _face_url(data):
+    return f"https://koishi.js.org/QFace/assets/qq_emoji/thumbs/gif_{data['id']}.gif"
+
+
+@segment_renderer("text")
+def _render_text(builder, data):
+    return data["text"]
+
+
+@segment_renderer("image", "html")
+def _render_image_html(builder, data):
+    return f"<img src='{data['url']}' style='max-width: 100%;'>"
+
+
+@segment_renderer("image", "markdown")
+def _render_image_md(builder, data):
+    return f"![图片]({data['url']})"
+
+
+@segment_renderer("image", "text")
+def _render_image_text(builder, data):
+    return "[图片]"
+
+
+@segment_renderer("at", "html", "markdown")
+def _render_at(builder, data):
+    return f"@{data.get('qq', 'someone')} "
+
+
+@segment_renderer("at", "text")
+def _render_at_text(builder, data):
+    return ""
+
+
+@segment_renderer("face", "html")
+def _render_face_html(builder, data):
+    return f"<img src='{_face_url(data)}' style='width:24px;height:24px;vertical-align:middle;' />"
+
+
+@segment_renderer("face", "markdown")
+def _render_face_md(builder, data):
+    return f"![表情]({_face_url(data)})"
+
+
+@segment_renderer("face", "text")
+def _render_face_text(builder, data):
+    return "[表情]"
+
+
+@segment_renderer("mface", "html")
+def _render_mface_html(builder, data):
+    return f"<img src='{data['url']}' alt='{data.get('summary', '表情')}' style='width: 100px;'>"
+
+
+@segment_renderer("mface", "markdown")
+def _render_mface_md(builder, data):
+    return f"![{data.get('summary', '表情')}]({data['url']})"
+
+
+@segment_renderer("mface", "text")
+def _render_mface_text(builder, data):
+    return data.get("summary") or "[表情]"
+
+
+@segment_renderer(("voice", "record"), "html")
+def _render_voice_html(builder, data):
+    return f"<audio src='{data['url']}' controls></audio>"
+
+
+@segment_renderer(("voice", "record"), "markdown")
+def _render_voice_md(builder, data):
+    return f"[语音]({data['url']})"
+
+
+@segment_renderer(("voice", "record"), "text")
+def _render_voice_text(builder, data):
+    return "[语音]"
+
+
+@segment_renderer("video", "html")
+def _render_video_html(builder, data):
+    return f"<video src='{data['url']}' controls style='max-width: 100%;'></video>"
+
+
+@segment_renderer("video", "markdown")
+def _render_video_md(builder, data):
+    return f"[视频]({data['url']})"
+
+
+@segment_renderer("video", "text")
+def _render_video_text(builder, data):
+    return "[视频]"
+
+
+@segment_renderer("file", "html")
+def _render_file_html(builder, data):
+    name = data.get("name") or data.get("file", "文件")
+    url = data.get("url")
+    return f"<a href='{url}'>[文件] {name}</a>" if url else f"[文件] {name}"
+
+
+@segment_renderer("file", "markdown")
+def _render_file_md(builder, data):
+    name = data.get("name") or data.get("file", "文件")
+    url = data.get("url")
+    return f"[文件: {name}]({url})" if url else f"[文件: {name}]"
+
+
+@segment_renderer("file", "text")
+def _render_file_text(builder, data):
+    return f"[文件] {data.get('name') or data.get('file', '')}".rstrip()
+
+
+@segment_renderer("reply", "html")
+def _render_reply_html(builder, data):
+    return "<div style='border-left: 3px solid #ccc; padding-left: 6px; color: #888;'>回复消息</div>"
+
+
+@segment_renderer("reply", "markdown")
+def _render_reply_md(builder, data):
+    return "> 回复消息"
+
+
+@segment_renderer("reply", "text")
+def _render_reply_text(builder, data):
+    return "[回复]"
+
+
+@segment_renderer("json")
+def _render_json(builder, data):
+    # 卡片消息：取 prompt 作为摘要
+    try:
+        prompt = json.loads(data.get("data", "{}")).get("prompt")
+    except (TypeError, ValueError, AttributeError):
+        prompt = None
+    return f"[卡片] {prompt}" if prompt else "[卡片消息]"
+
+
+@segment_renderer("break", "html")
+def _render_break_html(builder, data):
+    return "<br>"
+
+
+@segment_renderer("break", "markdown")
+def _render_break_md(builder, data):
+    return ""
+
+
+@segment_renderer("break", "text")
+def _render_break_text(builder, data):
+    return "\n"
+
+
+@segment_renderer("forward", "html")
+def _render_forward_html(builder, data):
+    segments = [(msg.get("type"), msg.get("data", {})) for msg in data.get("messages", [])]
+    return "".join(builder._render_segments("html", segments))
+
+
+@segment_renderer("forward", "markdown", "text")
+def _render_forward_placeholder(builder, data):
+    return "[转发消息]"
+
+
 class QQMessageBuilder:
     def __init__(self, main):
         self.main = main
         self.sdk = main.sdk
         self.logger = self.sdk.logger
 
-    async def build_html(self, data):
-        sender = data.get("sender", {})
-        user_id = sender.get("user_id", "未知ID")
-        nickname = sender.get("nickname", "未知用户")
-        message_parts = data.get("message", [])
+    async def build_html(self, message: ParsedMessage):
+        user_id = message.sender_id
+        nickname = message.sender_name
 
         avatar_url = f"https://q1.qlogo.cn/g?b=qq&nk={user_id}&s=640"
         user_info = f"""
@@ -26,16 +210,7 @@ class QQMessageBuilder:
 </div>
 """
 
-        content = []
-        for part in message_parts:
-            msg_type = part.get("type")
-            handler = self._get_handler(msg_type)
-            if handler:
-                try:
-                    content.append(handler(part.get("data", {})))
-                except Exception as e:
-                    self.logger.error(f"处理消息类型 {msg_type} 出错: {e}")
-                    content.append(f"[处理失败: {msg_type}]")
+        content = self._render_segments("html", message.segments)
 
         message_content = f"""
 <div style="padding: 10px; background: #f1f1f1; color: #000000; border-radius: 6px; margin-top: 5px;">
@@ -45,75 +220,36 @@ class QQMessageBuilder:
 
         return user_info + message_content
 
-    async def build_markdown(self, data):
-        sender = data.get("sender", {})
-        user_id = sender.get("user_id", "未知ID")
-        nickname = sender.get("nickname", "未知用户")
-        message_parts = data.get("message", [])
+    async def build_markdown(self, message: ParsedMessage):
+        user_id = message.sender_id
+        nickname = message.sender_name
 
-        avatar_url = f"https://q1.qlogo.cn/g?b=qq&nk={user_id}&s=640"
         user_info = f"**{nickname}** (`{user_id}`)\n![](https://q1.qlogo.cn/g?b=qq&nk={user_id}&s=640) | 来自: QQ\n---\n"
 
-        content = []
-        for part in message_parts:
-            msg_type = part.get("type")
-            handler = self._get_handler(msg_type, is_md=True)
-            if handler:
-                try:
-                    content.append(handler(part.get("data", {})))
-                except Exception as e:
-                    self.logger.error(f"处理消息类型 {msg_type} 出错: {e}")
-                    content.append(f"[处理失败: {msg_type}]")
+        content = self._render_segments("markdown", message.segments)
 
         message_content = "\n".join(content)
 
         return f"{user_info}\n{message_content}"
 
-    async def build_text(self, data):
-        sender = data.get("sender", {})
-        nickname = sender.get("nickname", "未知用户")
-        message_parts = data.get("message", [])
+    async def build_text(self, message: ParsedMessage):
+        nickname = message.sender_name
 
-        content = []
-        for part in message_parts:
-            msg_type = part.get("type")
-            handler = self._get_handler(msg_type, is_text=True)
-            if handler:
-                try:
-                    content.append(handler(part.get("data", {})))
-                except Exception as e:
-                    self.logger.error(f"处理消息类型 {msg_type} 出错: {e}")
-                    content.append(f"[处理失败: {msg_type}]")
+        content = self._render_segments("text", message.segments)
 
         message_content = " ".join(content)
 
         return f"{nickname}: {message_content}"
 
-    def _get_handler(self, msg_type, is_md=False, is_text=False):
-        handlers = {
-            "text": lambda data: data["text"],
-            "image": lambda data: f"<img src='{data['url']}' style='max-width: 100%;'>",
-            "at": lambda data: f"@{data.get('qq', 'someone')} ",
-            "face": lambda data: f"<img src='https://koishi.js.org/QFace/assets/qq_emoji/thumbs/gif_{data['id']}.gif' style='width:24px;height:24px;vertical-align:middle;' />",
-            "voice": lambda data: f"<audio src='{data['url']}' controls></audio>",
-            "video": lambda data: f"<video src='{data['url']}' controls style='max-width: 100%;'></video>",
-            "forward": lambda data: "".join([self.build_html({"message": [msg]}) for msg in data.get("messages", [])]),
-        }
-
-        if is_md:
-            handlers["image"] = lambda data: f"![图片]({data['url']})"
-            handlers["at"] = lambda data: f"@{data.get('qq', 'someone')} "
-            handlers["face"] = lambda data: f"![表情](https://koishi.js.org/QFace/assets/qq_emoji/thumbs/gif_{data['id']}.gif)"
-            handlers["voice"] = lambda data: f"[语音]({data['url']})"
-            handlers["video"] = lambda data: f"[视频]({data['url']})"
-            handlers["forward"] = lambda data: "[转发消息]"
-
-        if is_text:
-            handlers["image"] = lambda data: "[图片]"
-            handlers["at"] = lambda data: ""
-            handlers["face"] = lambda data: "[表情]"
-            handlers["voice"] = lambda data: "[语音]"
-            handlers["video"] = lambda data: "[视频]"
-            handlers["forward"] = lambda data: "[转发消息]"
-
-        return handlers.get(msg_type)
\ No newline at end of file
+    def _render_segments(self, fmt, segments: List[Segment]):
+        renderers = SEGMENT_RENDERERS[fmt]
+        content = []
+        for msg_type, data in segments:
+            renderer = renderers.get(msg_type)
+            if renderer:
+                try:
+                    content.append(renderer(self, data))
+                except Exception as e:
+                    self.logger.error(f"处理消息类型 {msg_type} 出错: {e}")
+                    content.append(f"[处理失败: {msg_type}]")
+        return content
@@ -0,0 +1,135 @@
+import asyncio
+from typing import Callable, Dict, List, Set, Tuple
+
+from .Retry import OutboundCall
+
+# 各平台撤回消息所用的发送方法
+RECALL_ACTIONS = {
+    "yunhu": "Recall",
+    "qq": "Recall",
+    "telegram": "DeleteMessage",
+}
+
+
+def _telegram_delete_messages(group_id: str, msg_ids: List[str]) -> OutboundCall:
+    return OutboundCall("telegram", group_id, "call_api", kwargs={
+        "endpoint": "deleteMessages",
+        "chat_id": group_id,
+        "message_ids": [int(msg_id) if str(msg_id).lstrip("-").isdigit() else msg_id for msg_id in msg_ids]
+    })
+
+
+# 支持批量删除的平台：(单次最大条数, 构造批量删除调用的函数)；Telegram deleteMessages 一次最多 100 条
+# 不在表中的平台在批内逐条撤回
+BULK_DELETES: Dict[str, Tuple[int, Callable[[str, List[str]], OutboundCall]]] = {
+    "telegram": (100, _telegram_delete_messages),
+}
+
+DEFAULT_BATCH_WINDOW = 0.3
+DEFAULT_RECALL_TIMEOUT = 10
+
+
+class RecallBatcher:
+    """撤回合并器
+
+    在短时间窗口内把发往同一目标群的撤回请求合并成一批：支持批量删除的平台
+    一次调用删除整批，其余平台在同一批内并发提交到限速队列。超时按批次计算：
+    超时后尚未执行的撤回被取消，不会在调用方已收到超时之后再删除消息。
+    """
+
+    def __init__(self, main):
+        self.main = main
+        self.logger = main.logger
+        config = main.config.get("recall", {})
+        self.window = config.get("batch_window", DEFAULT_BATCH_WINDOW)
+        self.timeout = config.get("timeout", DEFAULT_RECALL_TIMEOUT)
+        self._pending: Dict[Tuple[str, str], List[Tuple[str, asyncio.Future]]] = {}
+        self._timers: Dict[Tuple[str, str], asyncio.TimerHandle] = {}
+        self._flushing: Set[asyncio.Task] = set()
+
+    async def recall(self, platform: str, group_id: str, msg_id: str):
+        """提交一条撤回，等待所在批次执行完毕后返回该条的响应；批次超时时抛出 asyncio.TimeoutError"""
+        if self.window <= 0:
+            return await asyncio.wait_for(self._recall_one(platform, group_id, msg_id), self.timeout)
+
+        loop = asyncio.get_running_loop()
+        key = (platform, str(group_id))
+        future = loop.create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((msg_id, future))
+
+        limit = BULK_DELETES[platform][0] if platform in BULK_DELETES else float("inf")
+        if len(batch) >= limit:
+            self._schedule_flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._schedule_flush, key)
+        return await future
+
+    def _schedule_flush(self, key: Tuple[str, str]):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if batch:
+            task = asyncio.ensure_future(self._flush(key, batch))
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+
+    async def _flush(self, key: Tuple[str, str], batch: List[Tuple[str, asyncio.Future]]):
+        platform, group_id = key
+        # 调用方已放弃等待（被取消）的撤回不再执行
+        batch = [(msg_id, future) for msg_id, future in batch if not future.done()]
+        if not batch:
+            return
+        try:
+            await asyncio.wait_for(self._execute(platform, group_id, batch), self.timeout)
+        except asyncio.TimeoutError:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(asyncio.TimeoutError())
+        finally:
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+
+    async def _execute(self, platform: str, group_id: str, batch: List[Tuple[str, asyncio.Future]]):
+        if platform in BULK_DELETES and len(batch) > 1:
+            self.logger.info(f"[{platform.upper()}] 批量撤回 {len(batch)} 条消息（群 {group_id}）")
+            call = BULK_DELETES[platform][1](group_id, [msg_id for msg_id, _ in batch])
+            try:
+                res = await self.main.sender.send(call, "recall")
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(res)
+            return
+
+        # 各条撤回同时提交，由出站调度器按平台与群限速
+        await asyncio.gather(*(self._resolve(future, self._recall_one(platform, group_id, msg_id))
+                               for msg_id, future in batch))
+
+    @staticmethod
+    async def _resolve(future: asyncio.Future, call):
+        try:
+            res = await call
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(res)
+
+    async def close(self):
+        """立即执行所有等待中的批次，并等待正在执行的撤回完成"""
+        for key in list(self._pending):
+            self._schedule_flush(key)
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+
+    async def _recall_one(self, platform: str, group_id: str, msg_id: str):
+        call = OutboundCall(platform, group_id, RECALL_ACTIONS[platform], (msg_id,))
+        return await self.main.sender.send(call, "recall")
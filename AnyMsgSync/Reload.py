@@ -0,0 +1,70 @@
+import asyncio
+import hashlib
+import json
+from typing import Dict, Optional, Tuple
+
+from .Routing import SOURCE_PLATFORMS
+
+DEFAULT_RELOAD_CONFIG = {
+    "enabled": True,
+    "interval": 10,     # 检查配置变更的间隔（秒）
+}
+
+
+def _digest(value) -> str:
+    data = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ConfigWatcher:
+    """转发配置热加载
+
+    定期读取 AnyMsgSync 配置并与上次的摘要比较：群组映射（qq / yunhu / telegram）变化时
+    重新编译路由表并整体替换，正在分发的消息继续使用旧路由，新消息立即使用新路由；
+    消息ID映射存储、缓存、出站队列与连接都保持不变。其他配置项的变更只提示需要重启。
+    """
+
+    def __init__(self, main):
+        self.main = main
+        self.logger = main.logger
+        self.config = {**DEFAULT_RELOAD_CONFIG, **main.config.get("reload", {})}
+        self.enabled = self.config["enabled"]
+        self._routing_digest, self._other_digest = self._digests(main.config)
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _digests(config: Dict) -> Tuple[str, str]:
+        routing = {platform: config.get(platform, {}) for platform in SOURCE_PLATFORMS}
+        other = {key: value for key, value in config.items() if key not in SOURCE_PLATFORMS}
+        return _digest(routing), _digest(other)
+
+    def start(self):
+        if self.enabled and self.config["interval"] > 0 and self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.config["interval"])
+            try:
+                self.check()
+            except Exception as e:
+                self.logger.warning(f"[Reload] 检查配置变更失败: {e}")
+
+    def check(self) -> bool:
+        """读取当前配置，群组映射有变化时热加载路由；返回是否进行了加载"""
+        config = self.main.sdk.env.get("AnyMsgSync", {}) or {}
+        routing_digest, other_digest = self._digests(config)
+        if other_digest != self._other_digest:
+            self._other_digest = other_digest
+            self.logger.warning("[Reload] 检测到群组映射以外的配置变更，需重启模块后生效")
+        if routing_digest == self._routing_digest:
+            return False
+        self._routing_digest = routing_digest
+        self.main.reload_routes(config)
+        return True
+
+    async def close(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
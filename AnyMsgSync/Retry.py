@@ -0,0 +1,302 @@
+import asyncio
+import concurrent.futures
+import json
+import os
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from .Tracing import current_correlation_id
+
+DEFAULT_RETRY_CONFIG = {
+    "attempts": 4,          # 单次调用的最多尝试次数（含第一次）
+    "base_delay": 1.0,      # 退避基准时长（秒），第 n 次重试最多等待 base_delay * 2^n
+    "max_delay": 30.0,      # 单次退避的上限（秒）
+    "dead_letter_path": "anymsgsync_dead_letter.jsonl",   # 死信队列文件
+    "dead_letter_max": 10000,                              # 死信队列最多保留条数，超出时丢弃最旧的 10%
+}
+
+# 视为可重试的 HTTP 状态码
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class SendError(Exception):
+    """出站调用失败；retryable 表示是否值得重试，retry_after 为平台要求的等待时长"""
+
+    def __init__(self, message: str, retryable: bool = False, retry_after: Optional[float] = None,
+                 response: Any = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+        self.response = response
+
+
+def check_response(platform: str, res: Any):
+    """检查适配器返回值；平台以返回值而不是异常表示失败时转换为 SendError"""
+    if not isinstance(res, dict):
+        return
+    if platform == "telegram" and res.get("ok") is False:
+        code = res.get("error_code")
+        retry_after = (res.get("parameters") or {}).get("retry_after")
+        raise SendError(
+            f"Telegram 返回错误 {code}: {res.get('description')}",
+            retryable=code in RETRYABLE_STATUS, retry_after=retry_after, response=res
+        )
+    if platform == "qq" and res.get("status") == "failed":
+        raise SendError(f"OneBot 返回错误 {res.get('retcode')}: {res.get('message') or res.get('wording')}",
+                        response=res)
+    if platform == "yunhu" and "code" in res and res.get("code") != 1:
+        raise SendError(f"云湖返回错误 {res.get('code')}: {res.get('msg')}", response=res)
+
+
+def classify(error: BaseException) -> Tuple[bool, Optional[float]]:
+    """判断异常是否可重试，并取出平台给出的 retry-after（秒）"""
+    if isinstance(error, SendError):
+        return error.retryable, error.retry_after
+    if isinstance(error, aiohttp.ClientResponseError):
+        retry_after = None
+        if error.headers and error.headers.get("Retry-After", "").isdigit():
+            retry_after = float(error.headers["Retry-After"])
+        return error.status in RETRYABLE_STATUS, retry_after
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ClientConnectionError, ConnectionError)):
+        return True, None
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS, None
+    return False, None
+
+
+class OutboundCall:
+    """可序列化的出站调用描述
+
+    method 为 Send.To("group", group_id) 上的发送方法名（Text / Html / Markdown / Recall /
+    DeleteMessage / Edit），或 "call_api" 表示直接调用适配器接口；写入死信队列后可原样重放。
+    """
+
+    __slots__ = ("platform", "group_id", "method", "args", "kwargs")
+
+    def __init__(self, platform: str, group_id: Any, method: str,
+                 args: Tuple = (), kwargs: Optional[Dict] = None):
+        self.platform = platform.lower()
+        # 保留原始类型（如 Telegram 的整数 chat_id），JSON 序列化后依然一致
+        self.group_id = group_id
+        self.method = method
+        self.args = tuple(args)
+        self.kwargs = kwargs or {}
+
+    def resolve(self, sdk):
+        adapter = getattr(sdk.adapter, self.platform.capitalize())
+        if self.method == "call_api":
+            return adapter.call_api
+        return getattr(adapter.Send.To("group", self.group_id), self.method)
+
+    def to_dict(self) -> Dict:
+        return {"platform": self.platform, "group_id": self.group_id, "method": self.method,
+                "args": list(self.args), "kwargs": self.kwargs}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "OutboundCall":
+        return cls(data["platform"], data.get("group_id"), data["method"],
+                   tuple(data.get("args", ())), data.get("kwargs") or {})
+
+    def __repr__(self):
+        return f"OutboundCall({self.platform}.{self.method}, group={self.group_id})"
+
+
+class RetryPolicy:
+    def __init__(self, config: Dict):
+        self.attempts = max(1, int(config["attempts"]))
+        self.base_delay = config["base_delay"]
+        self.max_delay = config["max_delay"]
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第 attempt 次失败后的等待时长：平台给出 retry-after 时以其为准，否则为全抖动指数退避"""
+        if retry_after is not None:
+            return float(retry_after) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class DeadLetterQueue:
+    """死信队列：重试后仍失败的调用按行追加到 JSONL 文件，可查看并重放
+
+    文件读写都在单线程的执行器中进行，不阻塞事件循环，且多次写入按提交顺序执行。
+    """
+
+    def __init__(self, main, path: str, max_entries: int):
+        self.main = main
+        self.logger = main.logger
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._count = len(self.entries())
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="AnyMsgSync-DeadLetter")
+        self._closed = False
+
+    async def _run(self, func, *args):
+        if self._closed:
+            # 关闭后仍有迟到的失败调用时直接写入
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def push(self, call: OutboundCall, operation: str, error: BaseException, attempts: int,
+                   context: Optional[Dict] = None) -> Dict:
+        entry = {
+            "id": uuid.uuid4().hex[:12],
+            "time": time.time(),
+            "operation": operation,
+            "call": call.to_dict(),
+            "context": context or {},
+            "error": f"{type(error).__name__}: {error}",
+            "attempts": attempts,
+            "correlation_id": current_correlation_id(),
+        }
+        await self._run(self._append, json.dumps(entry, ensure_ascii=False) + "\n")
+        return entry
+
+    def _append(self, line: str):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+        self._count += 1
+        if self._count > self.max_entries:
+            # 超出上限时一次裁剪到 90%，避免此后每次写入都重写整个文件
+            entries = self.entries()
+            keep = max(1, int(self.max_entries * 0.9))
+            self._rewrite(entries[-keep:])
+            self.logger.warning(f"[DeadLetter] 死信队列超过 {self.max_entries} 条，已丢弃最旧的 {len(entries) - keep} 条")
+
+    def entries(self) -> List[Dict]:
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    self.logger.warning(f"[DeadLetter] 跳过无法解析的记录: {line[:80]}")
+        return entries
+
+    async def load(self) -> List[Dict]:
+        """在执行器中读取全部条目"""
+        return await self._run(self.entries)
+
+    async def remove(self, ids) -> int:
+        return await self._run(self._remove, set(ids))
+
+    def _remove(self, ids) -> int:
+        entries = self.entries()
+        remaining = [entry for entry in entries if entry.get("id") not in ids]
+        self._rewrite(remaining)
+        return len(entries) - len(remaining)
+
+    def _rewrite(self, entries: List[Dict]):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+        self._count = len(entries)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self):
+        """等待已提交的写入完成后关闭执行器"""
+        self._closed = True
+        self._executor.shutdown(wait=True)
+
+
+class ReliableSender:
+    """带重试的出站发送
+
+    所有转发、撤回、编辑调用都经由这里提交到出站调度器：可重试的错误（超时、连接错误、
+    429、5xx）按指数退避加抖动重试，429 优先遵循平台给出的 retry-after；
+    最终失败的调用连同上下文写入死信队列，之后可通过 replay() 重放。
+    """
+
+    def __init__(self, main):
+        self.main = main
+        self.logger = main.logger
+        self.sdk = main.sdk
+        self.config = {**DEFAULT_RETRY_CONFIG, **main.config.get("retry", {})}
+        self.policy = RetryPolicy(self.config)
+        self.dead_letters = DeadLetterQueue(main, self.config["dead_letter_path"], self.config["dead_letter_max"])
+
+    async def send(self, call: OutboundCall, operation: str, context: Optional[Dict] = None,
+                   dead_letter: bool = True) -> Any:
+        """执行一次出站调用，成功时返回适配器响应，最终失败时抛出最后一次的异常"""
+        self.main.loop_guard.before_send(call)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                res = await self.main.outbound.submit(
+                    call.platform, call.group_id, call.resolve(self.sdk), *call.args, **call.kwargs
+                )
+                check_response(call.platform, res)
+                self.main.loop_guard.after_send(call, res)
+                return res
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                retryable, retry_after = classify(e)
+                if retryable and attempt < self.policy.attempts:
+                    delay = self.policy.delay(attempt - 1, retry_after)
+                    self.logger.warning(
+                        f"[{call.platform.upper()}] {operation} 第 {attempt} 次调用失败，{delay:.1f}s 后重试: {e}"
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+                if dead_letter:
+                    entry = await self.dead_letters.push(call, operation, e, attempt, context)
+                    self.logger.error(
+                        f"[{call.platform.upper()}] {operation} 调用最终失败（{attempt} 次），已写入死信队列 {entry['id']}: {e}"
+                    )
+                raise
+
+    async def replay(self, ids: Optional[List[str]] = None) -> Tuple[int, int]:
+        """重放死信队列中的调用（默认全部），成功的从队列移除；返回 (成功数, 失败数)"""
+        entries = [entry for entry in await self.dead_letters.load() if ids is None or entry.get("id") in ids]
+        succeeded = []
+        failed = 0
+        for entry in entries:
+            call = OutboundCall.from_dict(entry["call"])
+            try:
+                res = await self.send(call, entry["operation"], entry.get("context"), dead_letter=False)
+            except Exception as e:
+                failed += 1
+                self.logger.warning(f"[DeadLetter] 重放 {entry['id']} 失败: {e}")
+                continue
+            succeeded.append(entry["id"])
+            self._after_replay(call, entry.get("context") or {}, res)
+        if succeeded:
+            await self.dead_letters.remove(succeeded)
+        self.logger.info(f"[DeadLetter] 重放完成：成功 {len(succeeded)} 条，失败 {failed} 条")
+        return len(succeeded), failed
+
+    def _after_replay(self, call: OutboundCall, context: Dict, res: Any):
+        # 重放成功的发送同样需要补写消息ID映射
+        msg_ids = context.get("msg_ids")
+        if not msg_ids:
+            return
+        target_msg_id = self.main.parser.get_adapter_message_id(call.platform, res)
+        if not target_msg_id:
+            return
+        for msg_id in msg_ids:
+            self.main.sync_manager.add_message_id_mapping(
+                msg_id=msg_id,
+                target_msg_id=target_msg_id,
+                from_platform=context["from_platform"],
+                to_platform=call.platform,
+                group_id=context.get("group_id"),
+                target_group_id=call.group_id,
+                coalesced=len(msg_ids) > 1
+            )
@@ -0,0 +1,101 @@
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from .Metrics import route_labels
+
+# 格式映射表：将用户配置的 format 字段标准化为统一名称
+FORMAT_MAP = {
+    "text": "Text",
+    "txt": "Text",
+    "plain": "Text",
+    "markdown": "Markdown",
+    "md": "Markdown",
+    "html": "Html",
+}
+
+# 支持作为转发来源的平台（配置键 -> 构建器 / 处理器名称）
+SOURCE_PLATFORMS = {
+    "qq": "QQ",
+    "yunhu": "Yunhu",
+    "telegram": "Telegram",
+}
+
+
+class Route(NamedTuple):
+    """一条已校验的转发路由，所需的格式、构建函数与指标标签均已预先解析"""
+    target_type: str                  # 目标平台（小写）
+    target_group_id: Any              # 目标群ID，保留配置中的原始类型
+    format: str                       # 标准化后的格式名（Text / Markdown / Html）
+    build: Callable[..., Awaitable[Optional[str]]]   # 来源平台构建器上对应格式的构建方法
+    coalesce: Optional[float]         # 连发合并窗口（秒），未开启时为 None
+    labels: Tuple[str, ...]           # 指标路由标签
+
+    @property
+    def target(self) -> Tuple[str, str]:
+        return self.target_type, str(self.target_group_id)
+
+
+class RoutingTable:
+    """编译后的只读路由表
+
+    启动及热加载时把 forward_config 编译为 {(来源平台, 来源群): (Route, ...)}：格式别名、构建方法、
+    目标适配器是否存在都在编译时解析一次，无效的路由只在编译时警告一次并被剔除，
+    消息分发时只需一次字典查找。路由表创建后不再修改，配置变更时整体替换。
+    """
+
+    def __init__(self, main, forward_config: Dict[str, Dict]):
+        self.logger = main.logger
+        self._routes: Dict[Tuple[str, str], Tuple[Route, ...]] = {}
+        self.rejected = 0
+        for platform, groups in forward_config.items():
+            for group_id, mappings in (groups or {}).items():
+                routes = tuple(self._compile(main, platform, str(group_id), mappings or []))
+                if routes:
+                    self._routes[(platform, str(group_id))] = routes
+
+    def _compile(self, main, platform: str, group_id: str, mappings) -> Iterator[Route]:
+        source = f"{platform}:{group_id}"
+        builder = main.message_builders.get(SOURCE_PLATFORMS.get(platform, ""))
+        if builder is None:
+            self.rejected += len(mappings)
+            self.logger.warning(f"[Routing] {SOURCE_PLATFORMS.get(platform, platform)} 消息构建器未加载，忽略 {source} 的 {len(mappings)} 条转发配置")
+            return
+        for mapping in mappings:
+            target_type = str(mapping.get("type", "")).lower()
+            target_group_id = mapping.get("group_id")
+            msg_format = str(mapping.get("format", "text")).lower()
+            standard_format = FORMAT_MAP.get(msg_format)
+            build = getattr(builder, f"build_{standard_format.lower()}", None) if standard_format else None
+
+            if not target_type or target_group_id is None:
+                reason = "缺少 type 或 group_id"
+            elif not standard_format or build is None:
+                reason = f"不支持的消息格式 {msg_format}"
+            elif not hasattr(main.sdk.adapter, target_type.capitalize()):
+                reason = f"适配器 {target_type} 不存在"
+            else:
+                coalesce = mapping.get("coalesce")
+                yield Route(
+                    target_type, target_group_id, standard_format, build,
+                    float(coalesce) if coalesce else None,
+                    route_labels(platform, group_id, target_type, target_group_id),
+                )
+                continue
+            self.rejected += 1
+            self.logger.warning(f"[Routing] 忽略无效的转发路由 {source} → {mapping}: {reason}")
+
+    def diff(self, other: "RoutingTable") -> Tuple[List, List, List]:
+        """与另一张路由表比较，返回 (新增, 移除, 变更) 的来源群列表"""
+        old, new = self._routes, other._routes
+        added = [source for source in new if source not in old]
+        removed = [source for source in old if source not in new]
+        changed = [source for source in new if source in old and old[source] != new[source]]
+        return added, removed, changed
+
+    def get(self, platform: str, group_id: Any) -> Tuple[Route, ...]:
+        return self._routes.get((platform, str(group_id)), ())
+
+    def items(self):
+        return self._routes.items()
+
+    def __len__(self) -> int:
+        return sum(len(routes) for routes in self._routes.values())
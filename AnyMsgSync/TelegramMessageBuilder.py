@@ -1,19 +1,21 @@
+from .Message import ParsedMessage
+
+
 class TelegramMessageBuilder:
     def __init__(self, main):
         self.main = main
         self.sdk = main.sdk
         self.logger = self.sdk.logger
 
-    async def build_html(self, data):
-        msg = data.get("message", {})
-        from_user = msg.get("from", {})
-        user_id = from_user.get("id")
-        first_name = from_user.get("first_name", "未知用户")
-        last_name = from_user.get("last_name")
-        full_name = f"{first_name} {last_name}" if last_name else first_name
+    async def build_html(self, message: ParsedMessage):
+        return self._build_html(message)
+
+    def _build_html(self, message: ParsedMessage):
+        user_id = message.sender_id
+        full_name = message.sender_name
 
         try:
-            avatar_text = first_name[0].upper() if first_name and first_name[0].isalpha() else "#"
+            avatar_text = full_name[0].upper() if full_name and full_name[0].isalpha() else "#"
         except IndexError:
             avatar_text = "#"
 
@@ -51,25 +53,23 @@ class TelegramMessageBuilder:
 """
 
         content = []
-        msg_type = msg.get("type", "text")
-
-        if msg_type == "text":
-            content.append(msg.get("text", ""))
-        elif msg_type == "photo":
-            photo_url = msg.get("photo", [{}])[-1].get("file_url", "")
-            content.append(f'<img src="{photo_url}" alt="图片" style="max-width: 100%;">')
-        elif msg_type == "sticker":
-            sticker_url = msg.get("sticker", {}).get("file_url", "")
-            content.append(f'<img src="{sticker_url}" alt="表情包" style="width: 100px;">')
-        elif msg_type == "forward":
-            forwarded = await self.build_html({"message": msg.get("forwarded_message", {})})
-            content.append(f'<div class="forward">{forwarded}</div>')
-        elif msg_type == "video":
-            video_url = msg.get("video", {}).get("file_url", "")
-            content.append(f'<video src="{video_url}" controls style="max-width: 100%;"></video>')
-        elif msg_type == "voice":
-            voice_url = msg.get("voice", {}).get("file_url", "")
-            content.append(f'<audio src="{voice_url}" controls></audio>')
+        for msg_type, data in message.segments:
+            url = data.get("url", "")
+            if msg_type == "text":
+                content.append(data["text"])
+            elif msg_type == "image":
+                content.append(f'<img src="{url}" alt="图片" style="max-width: 100%;">')
+            elif msg_type == "sticker":
+                content.append(f'<img src="{url}" alt="表情包" style="width: 100px;">')
+            elif msg_type == "forward":
+                forwarded = self._build_html(data["message"])
+                content.append(f'<div class="forward">{forwarded}</div>')
+            elif msg_type == "video":
+                content.append(f'<video src="{url}" controls style="max-width: 100%;"></video>')
+            elif msg_type == "voice":
+                content.append(f'<audio src="{url}" controls></audio>')
+            elif msg_type == "break":
+                content.append("<br>")
 
         message_content = f"""
 <div style="padding: 10px; background: #f1f1f1; color: #000000; border-radius: 6px; margin-top: 5px;">
@@ -79,51 +79,50 @@ class TelegramMessageBuilder:
 
         return user_info + message_content
 
-    async def build_markdown(self, data):
-        msg = data.get("message", {})
-        from_user = msg.get("from", {})
-        user_id = from_user.get("id")
-        first_name = from_user.get("first_name", "未知用户")
-        last_name = from_user.get("last_name")
-        full_name = f"{first_name} {last_name}" if last_name else first_name
-
-        msg_type = msg.get("type", "text")
-        if msg_type == "text":
-            text = msg.get("text", "")
-            return f"**{full_name}** (`{user_id}`)\n{text}"
-        elif msg_type == "photo":
-            photo_url = msg.get("photo", [{}])[-1].get("file_url", "")
-            return f"**{full_name}** (`{user_id}`)\n![图片]({photo_url})"
-        elif msg_type == "sticker":
-            sticker_url = msg.get("sticker", {}).get("file_url", "")
-            return f"**{full_name}** (`{user_id}`)\n![表情包]({sticker_url})"
-        elif msg_type == "forward":
-            forwarded = await self.build_markdown({"message": msg.get("forwarded_message", {})})
-            return f"**{full_name}** (`{user_id}`)\n> 转发消息：\n{forwarded}"
-        elif msg_type == "video":
-            video_url = msg.get("video", {}).get("file_url", "")
-            return f"**{full_name}** (`{user_id}`)\n[视频]({video_url})"
-        elif msg_type == "voice":
-            voice_url = msg.get("voice", {}).get("file_url", "")
-            return f"**{full_name}** (`{user_id}`)\n[语音]({voice_url})"
-        return ""
-
-    async def build_text(self, data):
-        msg = data.get("message", {})
-        from_user = msg.get("from", {})
-        first_name = from_user.get("first_name", "未知用户")
-        last_name = from_user.get("last_name")
-        full_name = f"{first_name} {last_name}" if last_name else first_name
-
-        msg_type = msg.get("type", "text")
-        if msg_type == "text":
-            return f"{full_name}: {msg.get('text', '')}"
-        elif msg_type in ["photo", "sticker"]:
-            return f"{full_name}: [图片]"
-        elif msg_type == "forward":
-            return f"{full_name}: [转发消息]"
-        elif msg_type == "video":
-            return f"{full_name}: [视频]"
-        elif msg_type == "voice":
-            return f"{full_name}: [语音]"
-        return ""
\ No newline at end of file
+    async def build_markdown(self, message: ParsedMessage):
+        return self._build_markdown(message)
+
+    def _build_markdown(self, message: ParsedMessage):
+        header = f"**{message.sender_name}** (`{message.sender_id}`)"
+
+        content = []
+        for msg_type, data in message.segments:
+            if msg_type == "text":
+                content.append(data["text"])
+            elif msg_type == "image":
+                content.append(f"![图片]({data['url']})")
+            elif msg_type == "sticker":
+                content.append(f"![表情包]({data['url']})")
+            elif msg_type == "forward":
+                forwarded = self._build_markdown(data["message"])
+                content.append(f"> 转发消息：\n{forwarded}")
+            elif msg_type == "video":
+                content.append(f"[视频]({data['url']})")
+            elif msg_type == "voice":
+                content.append(f"[语音]({data['url']})")
+            elif msg_type == "break":
+                content.append("")
+
+        if not content:
+            return ""
+        return header + "\n" + "\n".join(content)
+
+    async def build_text(self, message: ParsedMessage):
+        content = []
+        for msg_type, data in message.segments:
+            if msg_type == "text":
+                content.append(data["text"])
+            elif msg_type in ["image", "sticker"]:
+                content.append("[图片]")
+            elif msg_type == "forward":
+                content.append("[转发消息]")
+            elif msg_type == "video":
+                content.append("[视频]")
+            elif msg_type == "voice":
+                content.append("[语音]")
+            elif msg_type == "break":
+                content.append("\n")
+
+        if not content:
+            return ""
+        return f"{message.sender_name}: {' '.join(content)}"
@@ -0,0 +1,208 @@
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import random
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_TRACING_CONFIG = {
+    "profile": False,       # 是否开启采样分析，记录最慢的若干次分发
+    "sample_rate": 1.0,     # 参与采样分析的比例
+    "slowest": 20,          # 保留最慢的分发数
+    "path": None,           # 停止时将最慢分发写入该 JSON 文件；未设置时仅输出到日志
+}
+
+# 当前入站事件的追踪上下文，随 asyncio 任务自动传递给并发的子任务
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("anymsgsync_trace", default=None)
+
+
+def current_correlation_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.correlation_id if trace is not None else None
+
+
+class Span:
+    __slots__ = ("name", "labels", "start", "duration")
+
+    def __init__(self, name: str, labels: Optional[Tuple[str, ...]]):
+        self.name = name
+        self.labels = labels
+        self.start = 0.0
+        self.duration = 0.0
+
+
+class Trace:
+    """一次入站事件（转发 / 撤回 / 编辑）的追踪记录"""
+
+    __slots__ = ("kind", "platform", "correlation_id", "start", "duration", "spans")
+
+    def __init__(self, kind: str, platform: str, correlation_id: Optional[str] = None):
+        self.kind = kind
+        self.platform = platform
+        self.correlation_id = correlation_id or uuid.uuid4().hex[:12]
+        self.start = 0.0
+        self.duration = 0.0
+        self.spans: List[Span] = []
+
+    def breakdown(self) -> Dict:
+        stages: Dict[str, float] = {}
+        for span in self.spans:
+            stages[span.name] = stages.get(span.name, 0.0) + span.duration
+        return {
+            "correlation_id": self.correlation_id,
+            "kind": self.kind,
+            "platform": self.platform,
+            "duration_ms": round(self.duration * 1000, 3),
+            "stages_ms": {name: round(total * 1000, 3) for name, total in stages.items()},
+            "spans": [
+                {
+                    "name": span.name,
+                    "route": "/".join(span.labels) if span.labels else None,
+                    "offset_ms": round((span.start - self.start) * 1000, 3),
+                    "duration_ms": round(span.duration * 1000, 3),
+                }
+                for span in self.spans
+            ],
+        }
+
+
+class SpanHook:
+    """追踪钩子基类，按需覆盖；钩子在事件循环内同步调用，应保持轻量"""
+
+    def on_span_end(self, trace: Optional[Trace], span: Span):
+        pass
+
+    def on_trace_end(self, trace: Trace):
+        pass
+
+
+class _SpanContext:
+    __slots__ = ("tracer", "span", "trace")
+
+    def __init__(self, tracer, name, labels):
+        self.tracer = tracer
+        self.span = Span(name, labels)
+
+    def __enter__(self):
+        self.trace = _current_trace.get()
+        self.span.start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        span.duration = time.perf_counter() - span.start
+        if self.trace is not None:
+            self.trace.spans.append(span)
+        self.tracer._emit("on_span_end", self.trace, span)
+        return False
+
+
+class _TraceContext:
+    __slots__ = ("tracer", "trace", "token")
+
+    def __init__(self, tracer, trace):
+        self.tracer = tracer
+        self.trace = trace
+
+    def __enter__(self):
+        self.token = _current_trace.set(self.trace)
+        self.trace.start = time.perf_counter()
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        trace = self.trace
+        trace.duration = time.perf_counter() - trace.start
+        _current_trace.reset(self.token)
+        self.tracer._emit("on_trace_end", trace)
+        return False
+
+
+class SlowestProfiler(SpanHook):
+    """采样分析：按比例采样已结束的追踪，只保留耗时最长的 N 个"""
+
+    def __init__(self, slowest: int, sample_rate: float):
+        self.slowest = slowest
+        self.sample_rate = sample_rate
+        self._heap: List[Tuple[float, int, Trace]] = []
+        self._seq = itertools.count()
+
+    def on_trace_end(self, trace: Trace):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        entry = (trace.duration, next(self._seq), trace)
+        if len(self._heap) < self.slowest:
+            heapq.heappush(self._heap, entry)
+        elif trace.duration > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def report(self) -> List[Dict]:
+        return [trace.breakdown() for _, _, trace in sorted(self._heap, reverse=True)]
+
+    def clear(self):
+        self._heap.clear()
+
+
+class Tracer:
+    """转发流程的分阶段追踪
+
+    每个入站事件开启一个 Trace 并分配关联ID，各阶段以 span 记录耗时，
+    结束时依次通知已注册的钩子（指标统计、采样分析或外部追踪系统）。
+    """
+
+    def __init__(self, main):
+        self.main = main
+        self.logger = main.logger
+        self.config = {**DEFAULT_TRACING_CONFIG, **main.config.get("tracing", {})}
+        self.hooks: List[SpanHook] = []
+        self.profiler: Optional[SlowestProfiler] = None
+        if self.config["profile"]:
+            self.profiler = SlowestProfiler(self.config["slowest"], self.config["sample_rate"])
+            self.add_hook(self.profiler)
+
+    def add_hook(self, hook: SpanHook):
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook: SpanHook):
+        if hook in self.hooks:
+            self.hooks.remove(hook)
+
+    def trace(self, kind: str, platform: str, correlation_id: Optional[str] = None) -> _TraceContext:
+        """开启一次追踪；未指定关联ID时沿用当前上下文中的关联ID，没有则新建"""
+        return _TraceContext(self, Trace(kind, platform, correlation_id or current_correlation_id()))
+
+    def span(self, name: str, labels: Optional[Tuple[str, ...]] = None) -> _SpanContext:
+        """记录一个阶段；labels 为路由标签（见 Metrics.route_labels），与路由无关的阶段为 None"""
+        return _SpanContext(self, name, labels)
+
+    def _emit(self, method: str, *args):
+        for hook in self.hooks:
+            try:
+                getattr(hook, method)(*args)
+            except Exception as e:
+                self.logger.warning(f"[Tracing] 钩子 {type(hook).__name__}.{method} 执行失败: {e}")
+
+    def slowest(self) -> List[Dict]:
+        """最慢的若干次分发及其分阶段耗时；未开启 profile 时为空"""
+        return self.profiler.report() if self.profiler else []
+
+    def dump_slowest(self):
+        report = self.slowest()
+        if not report:
+            return
+        path = self.config["path"]
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.logger.info(f"[Tracing] 已将最慢的 {len(report)} 次分发写入 {path}")
+            return
+        for entry in report:
+            self.logger.info(
+                f"[Tracing] {entry['kind']}@{entry['platform']} {entry['correlation_id']} "
+                f"耗时 {entry['duration_ms']}ms | 各阶段: {entry['stages_ms']}"
+            )
@@ -0,0 +1,223 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Dict, Optional, Tuple
+
+from .Cache import AsyncLoaderCache
+from .Media import TMP_SUFFIX, MediaFile
+
+MB = 1024 * 1024
+
+DEFAULT_TRANSCODE_CONFIG = {
+    "enabled": False,
+    "workers": 2,           # 转码进程数
+    "ffmpeg": "ffmpeg",     # ffmpeg 可执行文件
+    "timeout": 120,         # 单次转码超时（秒）
+    "cache_size": 4096,     # 记录转码结果的条数
+    "profiles": {},         # 按目标平台覆盖默认转码配置，结构同 DEFAULT_PROFILES
+}
+
+# 目标平台 -> 媒体类别 -> 转码配置
+# image: 超过 max_side（像素）或 max_bytes 时缩小并重新编码为 JPEG（动图不处理）
+# voice: 来源格式不在 keep_types 中时用 ffmpeg 转为 format
+# video: 超过 max_bytes 时改为发送 thumbnail 像素宽的封面截图
+DEFAULT_PROFILES = {
+    "telegram": {
+        "image": {"max_side": 2560, "max_bytes": 10 * MB, "quality": 85},
+        "voice": {"format": "ogg", "keep_types": ["audio/ogg"],
+                  "args": ["-c:a", "libopus", "-b:a", "32k"]},
+        "video": {"max_bytes": 50 * MB, "thumbnail": 320},
+    },
+    "qq": {
+        "image": {"max_side": 2048, "max_bytes": 10 * MB, "quality": 85},
+        "voice": {"format": "amr", "keep_types": ["audio/amr"],
+                  "args": ["-ar", "8000", "-ac", "1", "-c:a", "libopencore_amrnb", "-b:a", "12.2k"]},
+        "video": {"max_bytes": 100 * MB, "thumbnail": 320},
+    },
+    "yunhu": {
+        "image": {"max_side": 1920, "max_bytes": 5 * MB, "quality": 85},
+        "video": {"max_bytes": 50 * MB, "thumbnail": 320},
+    },
+}
+
+# 消息段类型 -> 媒体类别
+MEDIA_KINDS = {
+    "image": "image",
+    "sticker": "image",
+    "mface": "image",
+    "voice": "voice",
+    "record": "voice",
+    "video": "video",
+}
+
+
+# 以下函数在转码进程中执行，需保持为模块级函数以便序列化；参数均为 (源文件, 输出文件, 转码参数...)
+
+def transcode_image(src: str, dst: str, max_side: int, max_bytes: int, quality: int) -> bool:
+    """按需缩小图片，返回是否生成了新文件"""
+    from PIL import Image
+
+    with Image.open(src) as img:
+        if getattr(img, "is_animated", False):
+            return False
+        if max(img.size) <= max_side and os.path.getsize(src) <= max_bytes:
+            return False
+        img.thumbnail((max_side, max_side))
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        # 仍超出大小上限时逐步降低质量
+        while True:
+            img.save(dst, "JPEG", quality=quality, optimize=True)
+            if os.path.getsize(dst) <= max_bytes or quality <= 40:
+                return True
+            quality -= 15
+
+
+def transcode_audio(src: str, dst: str, ffmpeg: str, fmt: str, args, timeout: float) -> bool:
+    subprocess.run(
+        [ffmpeg, "-y", "-v", "error", "-i", src, *args, "-f", fmt, dst],
+        check=True, timeout=timeout, stdin=subprocess.DEVNULL, capture_output=True
+    )
+    return True
+
+
+def video_thumbnail(src: str, dst: str, ffmpeg: str, width: int, timeout: float) -> bool:
+    subprocess.run(
+        [ffmpeg, "-y", "-v", "error", "-ss", "1", "-i", src, "-frames:v", "1",
+         "-vf", f"scale={width}:-2", "-f", "image2", "-c:v", "mjpeg", dst],
+        check=True, timeout=timeout, stdin=subprocess.DEVNULL, capture_output=True
+    )
+    return True
+
+
+class Transcoder:
+    """媒体转码
+
+    在媒体中转上传之前，按目标平台的转码配置处理附件：缩小过大的图片、把语音转为目标平台支持的格式、
+    为超出大小限制的视频生成封面截图代替发送。转码在独立的进程池中执行，不阻塞事件循环；
+    结果以（源文件哈希, 转码配置）为键存入媒体缓存，同一附件对同一配置只转码一次，
+    由所有转发目标共用，重启后仍可直接命中。图片处理需要 Pillow，语音与视频需要 ffmpeg，缺少时跳过对应步骤。
+    """
+
+    def __init__(self, main):
+        self.main = main
+        self.logger = main.logger
+        self.config = {**DEFAULT_TRANSCODE_CONFIG, **main.config.get("transcode", {})}
+        self.enabled = self.config["enabled"] and main.media.enabled
+        if self.config["enabled"] and not main.media.enabled:
+            self.logger.warning("[Transcode] 转码依赖媒体中转，请同时开启 media.enabled")
+        self.profiles = {}
+        for platform in set(DEFAULT_PROFILES) | set(self.config["profiles"]):
+            overrides = self.config["profiles"].get(platform, {})
+            defaults = DEFAULT_PROFILES.get(platform, {})
+            self.profiles[platform] = {
+                kind: {**defaults.get(kind, {}), **overrides.get(kind, {})}
+                for kind in set(defaults) | set(overrides)
+            }
+        self.has_pillow = importlib.util.find_spec("PIL") is not None
+        self.ffmpeg = shutil.which(self.config["ffmpeg"])
+        if self.enabled:
+            if not self.has_pillow:
+                self.logger.info("[Transcode] 未安装 Pillow，跳过图片转码")
+            if not self.ffmpeg:
+                self.logger.info("[Transcode] 未找到 ffmpeg，跳过语音与视频转码")
+        # (源文件哈希, 转码配置键) -> (消息段类型, MediaFile)
+        self.results = AsyncLoaderCache(maxsize=self.config["cache_size"], ttl=7 * 24 * 3600)
+        self._pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.config["workers"])
+        return self._pool
+
+    @staticmethod
+    def _profile_key(target_type: str, kind: str, profile: Dict) -> str:
+        return f"{target_type}:{kind}:" + json.dumps(profile, sort_keys=True)
+
+    async def transcode(self, target_type: str, seg_type: str, media: MediaFile) -> Tuple[str, MediaFile]:
+        """返回实际要上传的 (消息段类型, 文件)；无需转码或转码失败时原样返回"""
+        kind = MEDIA_KINDS.get(seg_type)
+        profile = self.profiles.get(target_type, {}).get(kind)
+        if not self.enabled or not profile:
+            return seg_type, media
+        profile_key = self._profile_key(target_type, kind, profile)
+        key = (media.digest, profile_key)
+        loader = lambda: self._transcode(kind, profile, profile_key, seg_type, media)
+        output_type, output = await self.results.get(key, loader)
+        if output is not media and self.main.media.store.get(output.digest) is None:
+            # 转码结果已被淘汰，重新转码
+            self.results.invalidate(key)
+            output_type, output = await self.results.get(key, loader)
+        return output_type, output
+
+    async def _transcode(self, kind: str, profile: Dict, profile_key: str,
+                         seg_type: str, media: MediaFile) -> Tuple[str, MediaFile]:
+        store = self.main.media.store
+        key = hashlib.sha256(f"{media.digest}|{profile_key}".encode("utf-8")).hexdigest()
+        output_type = "image" if kind == "video" else seg_type
+        # 之前（包括重启前）已生成过的结果
+        path = store.get(key)
+        if path is not None:
+            return output_type, MediaFile(key, path, os.path.getsize(path), "")
+
+        job = self._job(kind, profile, media)
+        if job is None:
+            return seg_type, media
+        func, args, content_type = job
+
+        fd, tmp_path = tempfile.mkstemp(dir=store.directory, suffix=TMP_SUFFIX)
+        os.close(fd)
+        try:
+            loop = asyncio.get_running_loop()
+            changed = await asyncio.wait_for(
+                loop.run_in_executor(self._get_pool(), func, media.path, tmp_path, *args),
+                timeout=self.config["timeout"]
+            )
+            if not changed:
+                return seg_type, media
+            size = os.path.getsize(tmp_path)
+            path = store.put(tmp_path, key, size)
+            self.logger.debug(f"[Transcode] {media} -> {kind} {size} bytes")
+            return output_type, MediaFile(key, path, size, content_type)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.warning(f"[Transcode] 转码失败，发送原文件: {e}")
+            return seg_type, media
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _job(self, kind: str, profile: Dict, media: MediaFile):
+        """(函数, 转码参数, 输出文件类型)；确定不需要转码时返回 None"""
+        timeout = self.config["timeout"]
+        if kind == "image":
+            # 是否超出尺寸需读取图片才能判断，由转码进程决定
+            if not self.has_pillow:
+                return None
+            return (transcode_image, (profile["max_side"], profile["max_bytes"], profile.get("quality", 85)),
+                    "image/jpeg")
+        if not self.ffmpeg:
+            return None
+        if kind == "voice":
+            content_type = media.content_type.split(";")[0].strip().lower()
+            if content_type in profile.get("keep_types", ()):
+                return None
+            return (transcode_audio, (self.ffmpeg, profile["format"], profile.get("args", []), timeout),
+                    f"audio/{profile['format']}")
+        if kind == "video":
+            if media.size <= profile["max_bytes"] or not profile.get("thumbnail"):
+                return None
+            return video_thumbnail, (self.ffmpeg, profile["thumbnail"], timeout), "image/jpeg"
+        return None
+
+    def close(self):
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
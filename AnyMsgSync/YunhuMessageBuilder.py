@@ -1,10 +1,119 @@
 import aiohttp
+import codecs
 import re
-import asyncio
+from .Cache import AsyncLoaderCache
+from .Message import ParsedMessage
+
+_UNICODE_ESCAPE = re.compile(r'\\u([0-9a-fA-F]{4})')
 
 
 def decode_utf8(text):
-    return re.sub(r'\\u([09a-fA-F]{4})', lambda x: chr(int(x.group(1), 16)), text)
+    return _UNICODE_ESCAPE.sub(lambda x: chr(int(x.group(1), 16)), text)
+
+
+class HomepageExtractor:
+    """主页字段提取器
+
+    将“对象不存在”标记与所有字段的正则合并为一个预编译的多分支正则，
+    对响应内容只扫描一遍；支持边读边扫，所需字段全部取得后即可停止读取。
+    字段正则需使用与字段同名的命名分组。
+    """
+
+    # 跨分块匹配时保留的尾部长度，需大于单个字段匹配的最大长度
+    OVERLAP = 4096
+
+    def __init__(self, check_string, patterns, multi_keys=()):
+        self.keys = tuple(patterns)
+        self.multi_keys = frozenset(multi_keys)
+        self.regex = re.compile("|".join(
+            [f"(?P<_missing>{re.escape(check_string)})", *patterns.values()]
+        ))
+
+    def scanner(self):
+        return _HomepageScanner(self)
+
+
+class _HomepageScanner:
+    __slots__ = ("extractor", "buffer", "pos", "data", "missing")
+
+    def __init__(self, extractor):
+        self.extractor = extractor
+        self.buffer = ""
+        self.pos = 0
+        self.data = {}
+        self.missing = False
+
+    @property
+    def done(self):
+        if self.missing:
+            return True
+        if self.extractor.multi_keys:
+            return False
+        return len(self.data) == len(self.extractor.keys)
+
+    def feed(self, text, final=False):
+        """追加一段文本并继续扫描，返回是否已无需继续读取"""
+        self.buffer += text
+        end = len(self.buffer)
+        for match in self.extractor.regex.finditer(self.buffer, self.pos):
+            # 触及缓冲区末尾的匹配可能被截断，留待下一块数据到达后重新匹配
+            if match.end() >= end and not final:
+                break
+            self.pos = match.end()
+            key = match.lastgroup
+            if key == "_missing":
+                self.missing = True
+                return True
+            value = match.group(key)
+            if not value:
+                continue
+            if key in self.extractor.multi_keys:
+                self.data.setdefault(key, []).append(decode_utf8(value))
+            elif key not in self.data:
+                self.data[key] = self._convert(key, value)
+            if self.done:
+                return True
+
+        # 丢弃已扫描且不可能再参与匹配的前缀，保持缓冲区大小恒定
+        keep_from = max(self.pos, end - self.extractor.OVERLAP)
+        self.buffer = self.buffer[keep_from:]
+        self.pos = max(self.pos - keep_from, 0)
+        return self.done
+
+    @staticmethod
+    def _convert(key, value):
+        if key.endswith('Id') or key == 'headcount':
+            return int(value)
+        elif key == 'private':
+            return value == "1"
+        elif key == 'isVip':
+            return value != "0"
+        return decode_utf8(value)
+
+    def result(self):
+        if self.missing:
+            return {"code": 2, "msg": "对象不存在，请检查输入的 ID 是否正确"}
+        if all(key in self.data for key in self.extractor.keys):
+            return {"code": 1, "msg": "ok", "data": self.data}
+        return {"code": -3, "msg": "解析数据失败"}
+
+
+USER_EXTRACTOR = HomepageExtractor('data-v-34a9b5c4>ID </span>', {
+    "userId": r'userId:"(?P<userId>.*?)"',
+    "nickname": r'nickname:"(?P<nickname>.*?)"',
+    "avatarUrl": r'avatarUrl:"(?P<avatarUrl>.*?)"',
+})
+GROUP_EXTRACTOR = HomepageExtractor('data-v-6eef215f>ID </span>', {
+    "groupId": r'ID\s+(?P<groupId>\w+)',
+    "name": r'name:"(?P<name>.*?)"',
+})
+BOT_EXTRACTOR = HomepageExtractor('data-v-4f86f6dc>ID </span>', {
+    "botId": r'ID\s+(?P<botId>\w+)',
+    "nickname": r'nickname:"(?P<nickname>.*?)"',
+    "avatarUrl": r'avatarUrl:"(?P<avatarUrl>.*?)"',
+})
+
+FETCH_CHUNK_SIZE = 8192
 
 
 class YunhuMessageBuilder:
@@ -12,76 +121,50 @@ class YunhuMessageBuilder:
         self.main = main
         self.sdk = main.sdk
         self.logger = self.sdk.logger
-        self.session = None
-
-    async def _get_session(self):
-        if self.session is None:
-            self.session = aiohttp.ClientSession()
-        return self.session
-
-    async def _fetch_data(self, url, check_string, patterns):
-        session = await self._get_session()
+        cache_config = main.config.get("profile_cache", {})
+        # 用户/群/机器人主页信息缓存，失败结果（code != 1）按 negative_ttl 负缓存
+        self.profile_cache = AsyncLoaderCache(
+            maxsize=cache_config.get("maxsize", 2048),
+            ttl=cache_config.get("ttl", 600),
+            negative_ttl=cache_config.get("negative_ttl", 60),
+            is_success=lambda result: result.get("code") == 1
+        )
+
+    async def _fetch_data(self, url, extractor):
+        session = await self.main.http.get_session()
+        scanner = extractor.scanner()
         try:
-            async with session.get(url, timeout=5) as response:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
                 if response.status != 200:
                     return {"code": -1, "msg": f"请求失败: HTTP {response.status}"}
-                text = await response.text()
+                decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(errors="replace")
+                async for chunk in response.content.iter_chunked(FETCH_CHUNK_SIZE):
+                    if scanner.feed(decoder.decode(chunk)):
+                        break
+                else:
+                    scanner.feed(decoder.decode(b"", final=True), final=True)
         except Exception as e:
             return {"code": -1, "msg": f"请求失败: {str(e)}"}
 
-        if check_string in text:
-            return {"code": 2, "msg": "对象不存在，请检查输入的 ID 是否正确"}
-
-        data = {}
-        for key, pattern in patterns.items():
-            match = re.search(pattern, text)
-            if match:
-                value = match.group(1)
-                if key.endswith('Id') or key == 'headcount':
-                    value = int(value)
-                elif key == 'private':
-                    value = value == "1"
-                elif key == 'isVip':
-                    value = value != "0"
-                elif key == 'medal':
-                    value = [decode_utf8(m) for m in re.findall(pattern, text)]
-                else:
-                    value = decode_utf8(value)
-                data[key] = value
-
-        if all(key in data for key in patterns):
-            return {"code": 1, "msg": "ok", "data": data}
-        else:
-            return {"code": -3, "msg": "解析数据失败"}
+        return scanner.result()
 
     async def get_user_info(self, user_id):
         url = f"https://www.yhchat.com/user/homepage/{user_id}"
-        check_string = 'data-v-34a9b5c4>ID </span>'
-        patterns = {
-            "userId": r'userId:"(.*?)"',
-            "nickname": r'nickname:"(.*?)"',
-            "avatarUrl": r'avatarUrl:"(.*?)"',
-        }
-        return await self._fetch_data(url, check_string, patterns)
+        return await self.profile_cache.get(
+            ("user", str(user_id)), lambda: self._fetch_data(url, USER_EXTRACTOR)
+        )
 
     async def get_group_info(self, group_id):
         url = f"https://www.yhchat.com/group/homepage/{group_id}"
-        check_string = 'data-v-6eef215f>ID </span>'
-        patterns = {
-            "groupId": r'ID\s+(\w+)',
-            "name": r'name:"(.*?)"',
-        }
-        return await self._fetch_data(url, check_string, patterns)
+        return await self.profile_cache.get(
+            ("group", str(group_id)), lambda: self._fetch_data(url, GROUP_EXTRACTOR)
+        )
 
     async def get_bot_info(self, bot_id):
         url = f"https://www.yhchat.com/bot/homepage/{bot_id}"
-        check_string = 'data-v-4f86f6dc>ID </span>'
-        patterns = {
-            "botId": r'ID\s+(\w+)',
-            "nickname": r'nickname:"(.*?)"',
-            "avatarUrl": r'avatarUrl:"(.*?)"',
-        }
-        return await self._fetch_data(url, check_string, patterns)
+        return await self.profile_cache.get(
+            ("bot", str(bot_id)), lambda: self._fetch_data(url, BOT_EXTRACTOR)
+        )
 
     async def _get_sender_info(self, sender_id):
         result = await self.get_user_info(sender_id)
@@ -94,12 +177,8 @@ class YunhuMessageBuilder:
             avatar_url = "https://yunhu.io/static/images/default_avatar.png"
         return nickname, avatar_url
 
-    async def build_html(self, data):
-        yunhu_event = data.get("event", {})
-        yunhu_msg = yunhu_event.get("message", {})
-        yunhu_user = yunhu_event.get("sender", {})
-
-        sender_id = yunhu_user.get("senderId", "未知ID")
+    async def build_html(self, message: ParsedMessage):
+        sender_id = message.sender_id
         sender_nickname, avatar_url = await self._get_sender_info(sender_id)
 
         user_info = f"""
@@ -118,13 +197,13 @@ class YunhuMessageBuilder:
 """
 
         content = []
-        msg_type = yunhu_msg.get("contentType", "text")
-
-        if msg_type == "text":
-            content.append(yunhu_msg.get("content", {}).get("text", ""))
-        elif msg_type == "image":
-            image_url = yunhu_msg.get("content", {}).get("imageUrl", "")
-            content.append(f'<img src="{image_url}" alt="图片" style="max-width: 100%;">')
+        for msg_type, data in message.segments:
+            if msg_type == "text":
+                content.append(data["text"])
+            elif msg_type == "image":
+                content.append(f'<img src="{data.get("url", "")}" alt="图片" style="max-width: 100%;">')
+            elif msg_type == "break":
+                content.append("<br>")
 
         message_content = f"""
 <div style="padding: 10px; background: #f1f1f1; color: #000000; border-radius: 6px; margin-top: 5px;">
@@ -134,34 +213,36 @@ class YunhuMessageBuilder:
 
         return user_info + message_content
 
-    async def build_markdown(self, data):
-        yunhu_event = data.get("event", {})
-        yunhu_msg = yunhu_event.get("message", {})
-        yunhu_user = yunhu_event.get("sender", {})
-
-        sender_id = yunhu_user.get("senderId", "未知ID")
+    async def build_markdown(self, message: ParsedMessage):
+        sender_id = message.sender_id
         sender_nickname, _ = await self._get_sender_info(sender_id)
 
-        msg_type = yunhu_msg.get("contentType", "text")
-        if msg_type == "text":
-            text = yunhu_msg.get("content", {}).get("text", "")
-            return f"**{sender_nickname}** (`{sender_id}`)\n{text}"
-        elif msg_type == "image":
-            image_url = yunhu_msg.get("content", {}).get("imageUrl", "")
-            return f"**{sender_nickname}** (`{sender_id}`)\n![图片]({image_url})"
-        return ""
-
-    async def build_text(self, data):
-        yunhu_event = data.get("event", {})
-        yunhu_msg = yunhu_event.get("message", {})
-        yunhu_user = yunhu_event.get("sender", {})
-
-        sender_id = yunhu_user.get("senderId", "未知ID")
+        content = []
+        for msg_type, data in message.segments:
+            if msg_type == "text":
+                content.append(data["text"])
+            elif msg_type == "image":
+                content.append(f"![图片]({data.get('url', '')})")
+            elif msg_type == "break":
+                content.append("")
+
+        if not content:
+            return ""
+        return f"**{sender_nickname}** (`{sender_id}`)\n" + "\n".join(content)
+
+    async def build_text(self, message: ParsedMessage):
+        sender_id = message.sender_id
         sender_nickname, _ = await self._get_sender_info(sender_id)
 
-        msg_type = yunhu_msg.get("contentType", "text")
-        if msg_type == "text":
-            return f"{sender_nickname}({sender_id}): {yunhu_msg.get('content', {}).get('text', '')}"
-        elif msg_type == "image":
-            return f"{sender_nickname}({sender_id}): [图片]"
-        return ""
\ No newline at end of file
+        content = []
+        for msg_type, data in message.segments:
+            if msg_type == "text":
+                content.append(data["text"])
+            elif msg_type == "image":
+                content.append("[图片]")
+            elif msg_type == "break":
+                content.append("\n")
+
+        if not content:
+            return ""
+        return f"{sender_nickname}({sender_id}): {' '.join(content)}"
@@ -0,0 +1,294 @@
+"""AnyMsgSync 离线基准测试
+
+在内存版 ErisPulse SDK（见 fake_sdk.py）上驱动完整的转发、撤回与编辑流程，
+统计吞吐量与 p50/p99 延迟，不会连接任何真实平台。
+
+用法示例：
+    python benchmarks/bench.py --scenario forward --topology fanout --targets 6 --messages 2000
+    python benchmarks/bench.py --scenario recall --map-size 200000 --latency 0.08
+    python benchmarks/bench.py --scenario all --topology mesh --error-rate 0.01 --json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fake_sdk  # noqa: E402
+
+PLATFORMS = ("qq", "yunhu", "telegram")
+FORMATS = {"qq": "text", "yunhu": "html", "telegram": "md"}
+
+
+def group_id(platform, index):
+    if platform == "telegram":
+        return str(-1001000000000 - index)
+    return f"{platform}{index}"
+
+
+def build_topology(name, groups, targets):
+    """生成转发配置
+
+    pair   每个来源群只转发到另一平台的一个群
+    fanout 每个来源群转发到 targets 个目标群（轮流分布在三个平台）
+    mesh   三个平台的同序号群两两互通，每个来源群对应 2 个目标
+    """
+    config = {platform: {} for platform in PLATFORMS}
+    for index in range(groups):
+        for platform in PLATFORMS:
+            others = [p for p in PLATFORMS if p != platform]
+            if name == "pair":
+                routes = [(others[index % len(others)], index)]
+            elif name == "fanout":
+                routes = [(PLATFORMS[n % len(PLATFORMS)], groups + index * targets + n) for n in range(targets)]
+            else:
+                routes = [(other, index) for other in others]
+            config[platform][group_id(platform, index)] = [
+                {"type": target, "group_id": group_id(target, target_index), "format": FORMATS[target]}
+                for target, target_index in routes
+            ]
+    return config
+
+
+def make_event(platform, gid, msg_id, sender, text):
+    if platform == "qq":
+        return {
+            "message_id": msg_id, "group_id": gid,
+            "sender": {"user_id": sender, "nickname": f"user{sender}"},
+            "message": [{"type": "text", "data": {"text": text}},
+                        {"type": "image", "data": {"url": f"https://example.com/{msg_id}.png"}}]
+        }
+    if platform == "yunhu":
+        return {"event": {
+            "sender": {"senderId": str(sender), "senderNickname": f"user{sender}"},
+            "message": {"msgId": str(msg_id), "chatId": gid, "contentType": "text", "content": {"text": text}}
+        }}
+    return {"message": {
+        "message_id": msg_id, "chat": {"id": int(gid)},
+        "from": {"id": sender, "first_name": "user", "last_name": str(sender)},
+        "type": "text", "text": text
+    }}
+
+
+def prepopulate(store, size, seed):
+    """直接批量写入 size 条历史映射，模拟长期运行后的映射表规模"""
+    if size <= 0:
+        return
+    from AnyMsgSync.MessageStore import COLUMNS
+    rng = random.Random(seed)
+    now = time.time()
+    rows = []
+    for n in range(size // 2):
+        a, b = rng.sample(PLATFORMS, 2)
+        created = now - rng.uniform(0, 120)  # 落在最短的 QQ 保留窗口内，避免被立即清理
+        rows.append((a, group_id(a, 0), f"h{n}", b, group_id(b, 0), f"t{n}", created, created))
+        rows.append((b, group_id(b, 0), f"t{n}", a, group_id(a, 0), f"h{n}", created, created))
+    with store.conn:
+        store.conn.execute("BEGIN")
+        store.conn.executemany(
+            f"INSERT OR REPLACE INTO message_map ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)", rows
+        )
+    store._approx_count = store.count()
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Bench:
+    def __init__(self, args, workdir):
+        self.args = args
+        config = build_topology(args.topology, args.groups, args.targets)
+        config.update({
+            "store": {"path": os.path.join(workdir, "map.db")},
+            "outbox": {"path": os.path.join(workdir, "outbox")},
+            "rate_limit": {"enabled": args.rate_limit},
+            "recall": {"batch_window": args.recall_window, "timeout": 30},
+            "fanout": {"concurrent": not args.sequential},
+            "tracing": {"profile": args.profile > 0, "slowest": max(args.profile, 1)},
+            "retry": {
+                "attempts": args.retry_attempts,
+                "base_delay": args.retry_delay,
+                "dead_letter_path": os.path.join(workdir, "dead_letter.jsonl"),
+            },
+        })
+        self.sdk = fake_sdk.install(fake_sdk.FakeSDK(
+            config, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+            log_level=args.log_level, seed=args.seed
+        ))
+        from AnyMsgSync.Core import Main
+        self.main = Main(self.sdk)
+        prepopulate(self.main.sync_manager.store, args.map_size, args.seed)
+        self._stub_profile_fetch()
+
+        self.sources = [(platform, gid) for platform in PLATFORMS for gid in config[platform]]
+        self._ids = itertools.count(1)
+
+    def _stub_profile_fetch(self):
+        # 云湖构建器会抓取用户主页，这里以同样的模拟延迟代替真实请求
+        builder = self.main.message_builders.get("Yunhu")
+        if builder is None:
+            return
+        latency = self.args.latency
+
+        async def fetch(url, extractor):
+            await asyncio.sleep(latency)
+            return {"code": 1, "data": {"nickname": url.rsplit("/", 1)[-1], "avatarUrl": "https://example.com/a.png"}}
+
+        builder._fetch_data = fetch
+
+    def events(self, count, platforms=PLATFORMS):
+        sources = [source for source in self.sources if source[0] in platforms]
+        for n in range(count):
+            platform, gid = sources[n % len(sources)]
+            msg_id = next(self._ids)
+            yield platform, gid, msg_id, make_event(platform, gid, msg_id, n % 7, f"benchmark message {n}")
+
+    def handler(self, platform):
+        return self.main.platform_handlers[{"qq": "QQ", "yunhu": "Yunhu", "telegram": "Telegram"}[platform]]
+
+    async def run_timed(self, name, coros):
+        """以 concurrency 路并发执行，记录每个操作的耗时"""
+        limit = asyncio.Semaphore(self.args.concurrency)
+        latencies = []
+        calls_before = sum(a.calls for a in self.adapters())
+        errors_before = sum(a.errors for a in self.adapters())
+
+        async def timed(coro):
+            async with limit:
+                start = time.perf_counter()
+                await coro
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(timed(coro) for coro in coros))
+        elapsed = time.perf_counter() - start
+        return {
+            "scenario": name,
+            "operations": len(latencies),
+            "elapsed_s": round(elapsed, 4),
+            "throughput_ops": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(max(latencies, default=0) * 1000, 2),
+            "adapter_calls": sum(a.calls for a in self.adapters()) - calls_before,
+            "adapter_errors": sum(a.errors for a in self.adapters()) - errors_before,
+            "mapping_rows": self.main.sync_manager.store.count(),
+            "dead_letters": len(self.main.sender.dead_letters),
+        }
+
+    def adapters(self):
+        return [getattr(self.sdk.adapter, platform) for platform in PLATFORMS]
+
+    def forward(self, platforms=PLATFORMS):
+        sent = []
+        coros = []
+        for platform, gid, msg_id, event in self.events(self.args.messages, platforms):
+            sent.append((platform, gid, msg_id, event))
+            coros.append(self.handler(platform).handle_message(event))
+        return sent, coros
+
+    async def scenario_forward(self):
+        _, coros = self.forward()
+        return await self.run_timed("forward", coros)
+
+    async def scenario_recall(self):
+        sent, coros = self.forward()
+        await asyncio.gather(*coros)
+        return await self.run_timed("recall", [
+            self.main.sync_manager.handle_message_recall(platform, str(msg_id), gid)
+            for platform, gid, msg_id, _ in sent
+        ])
+
+    async def scenario_edit(self):
+        # 编辑仅支持 Telegram 来源；直接调用防抖之后的传播步骤，排除防抖窗口本身的等待
+        sent, coros = self.forward(("telegram",))
+        await asyncio.gather(*coros)
+        handler = self.handler("telegram")
+
+        async def propagate(event):
+            body = dict(event["message"], text=event["message"]["text"] + " (edited)")
+            with self.main.tracer.trace("edit", "telegram"):
+                await handler._propagate_edit(self.main.parser.decode("telegram", {"edited_message": body}))
+
+        return await self.run_timed("edit", [propagate(event) for _, _, _, event in sent])
+
+    async def run(self):
+        scenarios = ["forward", "recall", "edit"] if self.args.scenario == "all" else [self.args.scenario]
+        results = []
+        try:
+            for scenario in scenarios:
+                results.append(await getattr(self, f"scenario_{scenario}")())
+        finally:
+            self.slowest = self.main.tracer.slowest()
+            await self.main.shutdown()
+        return results
+
+
+def print_table(args, results):
+    print(f"topology={args.topology} groups={args.groups} targets={args.targets} "
+          f"map_size={args.map_size} latency={args.latency}s±{args.jitter}s "
+          f"error_rate={args.error_rate} concurrency={args.concurrency} "
+          f"rate_limit={'on' if args.rate_limit else 'off'}")
+    columns = ["scenario", "operations", "elapsed_s", "throughput_ops", "p50_ms", "p99_ms",
+               "max_ms", "adapter_calls", "adapter_errors", "mapping_rows", "dead_letters"]
+    widths = [max(len(col), *(len(str(r[col])) for r in results)) for col in columns]
+    print("  ".join(col.ljust(w) for col, w in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result[col]).ljust(w) for col, w in zip(columns, widths)))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="AnyMsgSync 离线基准测试")
+    parser.add_argument("--scenario", choices=["forward", "recall", "edit", "all"], default="all")
+    parser.add_argument("--topology", choices=["pair", "fanout", "mesh"], default="mesh")
+    parser.add_argument("--groups", type=int, default=4, help="每个平台的来源群数量")
+    parser.add_argument("--targets", type=int, default=4, help="fanout 拓扑下每个来源群的目标数")
+    parser.add_argument("--messages", type=int, default=500, help="每个场景的入站消息数")
+    parser.add_argument("--concurrency", type=int, default=50, help="同时处理的入站事件数")
+    parser.add_argument("--map-size", type=int, default=10000, help="预先写入的历史映射条数")
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟平台接口延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.02, help="延迟抖动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟接口失败概率")
+    parser.add_argument("--retry-attempts", type=int, default=4, help="单次调用最多尝试次数")
+    parser.add_argument("--retry-delay", type=float, default=1.0, help="重试退避基准时长（秒）")
+    parser.add_argument("--recall-window", type=float, default=0.3, help="撤回合并窗口（秒），0 为不合并")
+    parser.add_argument("--rate-limit", action="store_true", help="启用平台限速（默认关闭以测量模块自身开销）")
+    parser.add_argument("--sequential", action="store_true", help="关闭并发转发")
+    parser.add_argument("--seed", type=int, default=2059)
+    parser.add_argument("--log-level", choices=list(fake_sdk.FakeLogger.LEVELS), default="none")
+    parser.add_argument("--profile", type=int, default=0, metavar="N", help="输出最慢的 N 次分发及其分阶段耗时")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="anymsgsync-bench-") as workdir:
+        bench = Bench(args, workdir)
+        results = asyncio.run(bench.run())
+    if args.json:
+        output = {"args": vars(args), "results": results}
+        if args.profile:
+            output["slowest"] = bench.slowest
+        print(json.dumps(output, ensure_ascii=False, indent=2))
+        return
+    print_table(args, results)
+    for entry in bench.slowest:
+        print(f"{entry['kind']:<10} {entry['correlation_id']}  {entry['duration_ms']:>9.2f}ms  {entry['stages_ms']}")
+
+
+if __name__ == "__main__":
+    main()
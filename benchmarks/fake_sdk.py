@@ -0,0 +1,157 @@
+"""离线基准测试用的 ErisPulse SDK 替身
+
+提供内存版的 sdk.env、sdk.logger 与 sdk.adapter.{QQ,Yunhu,Telegram}，
+适配器可配置模拟延迟与失败率，响应格式与真实适配器一致，便于在不接触
+真实平台的情况下驱动 AnyMsgSync 的完整转发、撤回与编辑流程。
+"""
+import asyncio
+import itertools
+import random
+import sys
+import types
+
+
+class FakeEnv:
+    def __init__(self, data=None):
+        self._data = dict(data or {})
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def set(self, key, value):
+        self._data[key] = value
+        return True
+
+    def delete(self, key):
+        self._data.pop(key, None)
+        return True
+
+
+class FakeLogger:
+    LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40, "none": 100}
+
+    def __init__(self, level="warning"):
+        self.level = self.LEVELS[level]
+        self.counts = {name: 0 for name in ("debug", "info", "warning", "error")}
+
+    def _log(self, name, msg, *args, **kwargs):
+        self.counts[name] += 1
+        if self.LEVELS[name] >= self.level:
+            print(f"[{name.upper()}] {msg}", file=sys.stderr)
+
+    def debug(self, msg, *args, **kwargs):
+        self._log("debug", msg)
+
+    def info(self, msg, *args, **kwargs):
+        self._log("info", msg)
+
+    def warning(self, msg, *args, **kwargs):
+        self._log("warning", msg)
+
+    def error(self, msg, *args, **kwargs):
+        self._log("error", msg)
+
+
+class SimulatedError(ConnectionError):
+    """模拟的瞬时故障，按连接错误处理（可重试）"""
+
+
+class _FakeTarget:
+    def __init__(self, adapter, target_type, target_id):
+        self._adapter = adapter
+        self._target_id = target_id
+
+    def __getattr__(self, method):
+        async def call(*args, **kwargs):
+            return await self._adapter._request(method, self._target_id, args, kwargs)
+        return call
+
+
+class _FakeSend:
+    def __init__(self, adapter):
+        self._adapter = adapter
+
+    def To(self, target_type, target_id):
+        return _FakeTarget(self._adapter, target_type, target_id)
+
+
+class FakeAdapter:
+    """模拟平台适配器：每次调用按 latency ± jitter 延迟，按 error_rate 概率抛出异常"""
+
+    def __init__(self, platform, latency=0.05, jitter=0.02, error_rate=0.0, seed=None):
+        self.platform = platform
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.Send = _FakeSend(self)
+        self.handlers = {}
+        self.calls = 0
+        self.errors = 0
+        # 与基准脚本生成的入站消息ID错开，避免正反向映射互相混淆
+        self._ids = itertools.count(10_000_001)
+        self._random = random.Random(seed)
+
+    def on(self, event_type):
+        def decorator(func):
+            self.handlers.setdefault(event_type, []).append(func)
+            return func
+        return decorator
+
+    async def emit(self, event_type, data):
+        for handler in self.handlers.get(event_type, []):
+            await handler(data)
+
+    async def call_api(self, endpoint, **params):
+        return await self._request(endpoint, params.get("chat_id") or params.get("group_id"), (), params)
+
+    async def _request(self, method, target_id, args, kwargs):
+        self.calls += 1
+        delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        await asyncio.sleep(delay)
+        if self._random.random() < self.error_rate:
+            self.errors += 1
+            raise SimulatedError(f"{self.platform}.{method} 模拟失败")
+        return self._response(next(self._ids))
+
+    def _response(self, msg_id):
+        if self.platform == "telegram":
+            return {"ok": True, "result": {"message_id": msg_id}}
+        if self.platform == "yunhu":
+            return {"code": 1, "msg": "success", "data": {"messageInfo": {"msgId": f"yh{msg_id}"}}}
+        return {"status": "ok", "retcode": 0, "data": {"message_id": msg_id}, "message_id": msg_id}
+
+
+class FakeAdapterManager:
+    """与 ErisPulse 一致，平台名大小写不敏感"""
+
+    def __init__(self, adapters):
+        self._adapters = {name.lower(): adapter for name, adapter in adapters.items()}
+
+    def __getattr__(self, platform):
+        try:
+            return self.__dict__["_adapters"][platform.lower()]
+        except KeyError:
+            raise AttributeError(f"平台 {platform} 的适配器未注册")
+
+    @property
+    def platforms(self):
+        return list(self._adapters)
+
+
+class FakeSDK:
+    def __init__(self, config=None, latency=0.05, jitter=0.02, error_rate=0.0,
+                 platforms=("QQ", "Yunhu", "Telegram"), log_level="warning", seed=None):
+        self.env = FakeEnv({"AnyMsgSync": config or {}})
+        self.logger = FakeLogger(log_level)
+        self.adapter = FakeAdapterManager({
+            name: FakeAdapter(name.lower(), latency, jitter, error_rate, seed)
+            for name in platforms
+        })
+
+
+def install(sdk):
+    """以替身注册 ErisPulse 模块，须在导入 AnyMsgSync 之前调用"""
+    module = types.ModuleType("ErisPulse")
+    module.sdk = sdk
+    sys.modules["ErisPulse"] = module
+    return sdk
@@ -0,0 +1,60 @@
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, ROOT)
+
+import fake_sdk  # noqa: E402
+
+
+class Recorder:
+    """记录替身适配器收到的每次调用：(平台, 方法, 目标, 位置参数, 关键字参数)"""
+
+    def __init__(self, sdk):
+        self.calls = []
+        for platform in sdk.adapter.platforms:
+            adapter = getattr(sdk.adapter, platform)
+            adapter._request = self._wrap(adapter, adapter._request)
+
+    def _wrap(self, adapter, request):
+        async def wrapped(method, target_id, args, kwargs):
+            self.calls.append((adapter.platform, method, target_id, args, kwargs))
+            return await request(method, target_id, args, kwargs)
+        return wrapped
+
+    def of(self, platform):
+        return [call for call in self.calls if call[0] == platform]
+
+
+@pytest.fixture
+def stub_main():
+    """只带 logger 与 config 的最小 main，用于单独测试各组件；其余属性按需传入"""
+
+    def factory(config=None, **attrs):
+        return types.SimpleNamespace(logger=fake_sdk.FakeLogger("none"), config=config or {}, **attrs)
+
+    return factory
+
+
+@pytest.fixture
+def make_main(tmp_path):
+    """以内存版 SDK 创建 Main，返回 (main, recorder)"""
+
+    def factory(config):
+        config = {
+            "store": {"path": str(tmp_path / "map.db")},
+            "outbox": {"path": str(tmp_path / "outbox")},
+            "retry": {"dead_letter_path": str(tmp_path / "dead_letter.jsonl")},
+            "rate_limit": {"enabled": False},
+            "reload": {"enabled": False},
+            **config,
+        }
+        sdk = fake_sdk.install(fake_sdk.FakeSDK(config, latency=0, jitter=0, log_level="none"))
+        from AnyMsgSync.Core import Main
+        return Main(sdk), Recorder(sdk)
+
+    return factory
@@ -0,0 +1,19 @@
+"""测试共用的平台入站事件构造函数"""
+
+CHAT_A = -1001000000001
+CHAT_B = -1001000000002
+
+
+def telegram_event(chat_id, msg_id, text, key="message"):
+    """Telegram 文本消息；key 为 "edited_message" 时为编辑事件"""
+    return {key: {
+        "message_id": msg_id, "chat": {"id": chat_id},
+        "from": {"id": 42, "first_name": "alice"},
+        "type": "text", "text": text,
+    }}
+
+
+def qq_event(group_id, msg_id, text):
+    """OneBot 群文本消息"""
+    return {"message_type": "group", "group_id": group_id, "message_id": msg_id, "user_id": 42,
+            "sender": {"nickname": "alice"}, "message": [{"type": "text", "data": {"text": text}}]}
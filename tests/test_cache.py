@@ -0,0 +1,47 @@
+import types
+
+import pytest
+
+from AnyMsgSync import Cache
+from AnyMsgSync.Cache import RotatingSeenSet
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(Cache, "time", types.SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def test_duplicates_within_window_are_rejected(clock):
+    seen = RotatingSeenSet(capacity=100, window=10)
+    assert seen.add(("qq", "g", "1"))
+    assert not seen.add(("qq", "g", "1"))
+    assert ("qq", "g", "1") in seen and ("qq", "g", "2") not in seen
+
+
+def test_keys_survive_one_rotation_and_expire_after_two(clock):
+    seen = RotatingSeenSet(capacity=100, window=10)
+    seen.add("a")
+    clock.value += 10
+    assert seen.add("b")
+    assert "a" in seen
+    clock.value += 10
+    seen.add("c")
+    assert "a" not in seen and "b" in seen
+
+
+def test_idle_longer_than_two_windows_forgets_everything(clock):
+    seen = RotatingSeenSet(capacity=100, window=10)
+    seen.add("a")
+    clock.value += 25
+    assert seen.add("b")
+    assert "a" not in seen and len(seen) == 1
+
+
+def test_capacity_bounds_memory(clock):
+    seen = RotatingSeenSet(capacity=3, window=600)
+    for n in range(10):
+        assert seen.add(n)
+    assert len(seen) <= 6
+    assert 9 in seen and 0 not in seen
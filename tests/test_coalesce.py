@@ -0,0 +1,76 @@
+import asyncio
+
+from AnyMsgSync.Coalesce import BurstCoalescer
+from AnyMsgSync.Message import ParsedMessage, merge_messages, replace_merged_part
+
+
+def message(msg_id, sender_id="alice", text=None):
+    return ParsedMessage("qq", str(msg_id), "g", sender_id, sender_id,
+                         [("text", {"text": text or f"m{msg_id}"})], {})
+
+
+def collect(stub_main, **config):
+    sent = []
+
+    async def callback(merged):
+        sent.append(merged.all_ids)
+
+    return BurstCoalescer(stub_main({"coalesce": config})), sent, callback
+
+
+def test_consecutive_messages_from_one_sender_are_merged(stub_main):
+    async def scenario():
+        coalescer, sent, callback = collect(stub_main)
+        for n in range(3):
+            coalescer.add("route", message(n), 0.05, callback)
+            await asyncio.sleep(0.01)
+        assert sent == []
+        await asyncio.sleep(0.1)
+        assert sent == [["0", "1", "2"]]
+
+    asyncio.run(scenario())
+
+
+def test_other_sender_flushes_the_current_batch_in_order(stub_main):
+    async def scenario():
+        coalescer, sent, callback = collect(stub_main)
+        coalescer.add("route", message(1), 0.05, callback)
+        coalescer.add("route", message(2, sender_id="bob"), 0.05, callback)
+        await asyncio.sleep(0)
+        assert sent == [["1"]]
+        await coalescer.close()
+        assert sent == [["1"], ["2"]]
+
+    asyncio.run(scenario())
+
+
+def test_batch_size_and_total_delay_are_bounded(stub_main):
+    async def scenario():
+        coalescer, sent, callback = collect(stub_main, max_messages=3)
+        for n in range(3):
+            coalescer.add("route", message(n), 10, callback)
+        await asyncio.sleep(0)
+        assert sent == [["0", "1", "2"]]
+
+        # 持续连发时，自第一条起最多等待 3 倍窗口
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        coalescer.add("other", message(10), 0.05, callback)
+        n = 11
+        while len(sent) < 2:
+            await asyncio.sleep(0.02)
+            coalescer.add("other", message(n), 0.05, callback)
+            n += 1
+        assert loop.time() - start < 0.25
+        await coalescer.close()
+
+    asyncio.run(scenario())
+
+
+def test_replace_merged_part_swaps_only_the_edited_message():
+    merged = merge_messages([message(1), message(2), message(3)])
+    edited = replace_merged_part(merged, message(2, text="edited"))
+    assert edited.source_ids == ["1", "2", "3"]
+    texts = [data.get("text") for seg_type, data in edited.segments if seg_type == "text"]
+    assert texts == ["m1", "edited", "m3"]
+    assert replace_merged_part(merged, message(4)) is None
@@ -0,0 +1,82 @@
+import asyncio
+
+from events import CHAT_A as CHAT, telegram_event
+
+CONFIG = {
+    "telegram": {str(CHAT): [
+        {"type": "qq", "group_id": "qq1", "format": "text", "coalesce": 0.05},
+        {"type": "yunhu", "group_id": "yh1", "format": "text", "coalesce": 0.05},
+    ]},
+    "edit": {"debounce": 0},
+}
+
+
+async def send_burst(main):
+    handler = main.platform_handlers["Telegram"]
+    for msg_id, text in ((1, "first"), (2, "second"), (3, "third")):
+        await handler.handle_message(telegram_event(CHAT, msg_id, text))
+    await main.coalescer.close()
+    return handler
+
+
+async def edit(main, handler, msg_id, text):
+    message = main.parser.decode("telegram", telegram_event(CHAT, msg_id, text, "edited_message"))
+    await handler._propagate_edit(message)
+
+
+def test_edit_inside_burst_rerenders_whole_batch(make_main):
+    async def scenario():
+        main, recorder = make_main(CONFIG)
+        handler = await send_burst(main)
+        assert [call[1] for call in recorder.calls] == ["Text", "Text"]
+        qq_id = main.sync_manager.get_mapped_message_id("telegram", str(CHAT), "2", "qq", "qq1")[0]
+        yunhu_id = main.sync_manager.get_mapped_message_id("telegram", str(CHAT), "2", "yunhu", "yh1")[0]
+        recorder.calls.clear()
+
+        await edit(main, handler, 2, "second (edited)")
+
+        qq = recorder.of("qq")
+        assert qq[0][1] == "delete_msg" and str(qq[0][4]["message_id"]) == qq_id
+        assert qq[1][1] == "Text"
+        resent = qq[1][3][0]
+        assert "first" in resent and "second (edited)" in resent and "third" in resent
+
+        (yunhu_edit,) = recorder.of("yunhu")
+        assert yunhu_edit[1] == "Edit" and yunhu_edit[3][0] == yunhu_id
+        assert "first" in yunhu_edit[3][1] and "second (edited)" in yunhu_edit[3][1] and "third" in yunhu_edit[3][1]
+
+        # 重发后的 QQ 消息仍映射到整批源消息
+        new_qq_id = main.sync_manager.get_mapped_message_id("telegram", str(CHAT), "1", "qq", "qq1")[0]
+        assert new_qq_id != qq_id
+        assert main.sync_manager.get_mapped_message_id("telegram", str(CHAT), "3", "qq", "qq1")[0] == new_qq_id
+
+        # 再次编辑同批的另一条时保留之前的编辑
+        recorder.calls.clear()
+        await edit(main, handler, 3, "third (edited)")
+        resent = recorder.of("qq")[-1][3][0]
+        assert "second (edited)" in resent and "third (edited)" in resent and "first" in resent
+
+        # 内容未变化的编辑不再发送
+        recorder.calls.clear()
+        await edit(main, handler, 3, "third (edited)")
+        assert recorder.calls == []
+        await main.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_edit_inside_burst_skipped_without_batch_record(make_main):
+    async def scenario():
+        main, recorder = make_main(CONFIG)
+        handler = await send_burst(main)
+        # 模拟重启后内存中的合并记录丢失，只剩映射表中的合并标记
+        main.coalesced_batches.clear()
+        recorder.calls.clear()
+
+        await edit(main, handler, 2, "second (edited)")
+
+        assert recorder.calls == []
+        assert main.sync_manager.is_coalesced("telegram", str(CHAT), "2", "qq", "qq1")
+        await main.shutdown()
+
+    asyncio.run(scenario())
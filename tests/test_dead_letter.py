@@ -0,0 +1,44 @@
+import asyncio
+
+from AnyMsgSync.Retry import DeadLetterQueue, OutboundCall
+
+
+def push_many(queue, count):
+    async def scenario():
+        for n in range(count):
+            await queue.push(OutboundCall("qq", "qq1", "Text", (str(n),)), "forward", RuntimeError("boom"), 4)
+
+    asyncio.run(scenario())
+
+
+def test_trims_oldest_in_bulk_when_cap_is_crossed(stub_main, tmp_path, monkeypatch):
+    queue = DeadLetterQueue(stub_main(), str(tmp_path / "dead.jsonl"), max_entries=10)
+    rewrites = []
+    rewrite = queue._rewrite
+    monkeypatch.setattr(queue, "_rewrite", lambda entries: (rewrites.append(len(entries)), rewrite(entries)))
+
+    push_many(queue, 10)
+    assert len(queue) == 10 and rewrites == []
+
+    push_many(queue, 1)
+    assert rewrites == [9]
+    assert [entry["call"]["args"] for entry in queue.entries()] == [[str(n)] for n in range(2, 10)] + [["0"]]
+
+    # 裁剪之后的写入只追加，直到再次越过上限
+    push_many(queue, 1)
+    assert rewrites == [9] and len(queue) == 10
+    queue.close()
+
+
+def test_remove_and_reload(stub_main, tmp_path):
+    path = str(tmp_path / "dead.jsonl")
+    queue = DeadLetterQueue(stub_main(), path, max_entries=100)
+    push_many(queue, 3)
+    first = queue.entries()[0]["id"]
+    assert asyncio.run(queue.remove([first])) == 1
+    queue.close()
+
+    reopened = DeadLetterQueue(stub_main(), path, max_entries=100)
+    assert len(reopened) == 2
+    assert first not in {entry["id"] for entry in asyncio.run(reopened.load())}
+    reopened.close()
@@ -0,0 +1,33 @@
+import asyncio
+
+from events import CHAT_A, CHAT_B, telegram_event
+
+CONFIG = {
+    "telegram": {
+        str(CHAT_A): [{"type": "qq", "group_id": "qq1", "format": "text"}],
+        str(CHAT_B): [{"type": "qq", "group_id": "qq1", "format": "text"}],
+    },
+}
+
+
+def test_edit_targets_copy_from_same_chat(make_main):
+    async def scenario():
+        main, recorder = make_main(CONFIG)
+        handler = main.platform_handlers["Telegram"]
+        await handler.handle_message(telegram_event(CHAT_A, 7, "from a"))
+        await handler.handle_message(telegram_event(CHAT_B, 7, "from b"))
+        copy_a = main.sync_manager.get_mapped_message_id("telegram", str(CHAT_A), "7", "qq")[0]
+        copy_b = main.sync_manager.get_mapped_message_id("telegram", str(CHAT_B), "7", "qq")[0]
+        assert copy_a != copy_b
+        recorder.calls.clear()
+
+        edited = main.parser.decode("telegram", telegram_event(CHAT_A, 7, "from a (edited)", "edited_message"))
+        await handler._propagate_edit(edited)
+
+        delete, resend = recorder.calls
+        assert delete[1] == "delete_msg" and str(delete[4]["message_id"]) == copy_a
+        assert "from a (edited)" in resend[3][0]
+        assert main.sync_manager.get_mapped_message_id("telegram", str(CHAT_B), "7", "qq")[0] == copy_b
+        await main.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,41 @@
+from AnyMsgSync.YunhuMessageBuilder import GROUP_EXTRACTOR, USER_EXTRACTOR
+
+USER_PAGE = (
+    '<html>' + 'x' * 5000
+    + 'window.__NUXT__={userId:"123456",nickname:"\\u5f20\\u4e09",avatarUrl:"https://img/a.png"}'
+    + 'y' * 5000 + '</html>'
+)
+
+
+def scan(extractor, page, chunk):
+    scanner = extractor.scanner()
+    for start in range(0, len(page), chunk):
+        if scanner.feed(page[start:start + chunk]):
+            break
+    else:
+        scanner.feed("", final=True)
+    return scanner
+
+
+def test_single_pass_extracts_and_converts_fields():
+    result = scan(USER_EXTRACTOR, USER_PAGE, len(USER_PAGE)).result()
+    assert result == {"code": 1, "msg": "ok", "data": {
+        "userId": 123456, "nickname": "张三", "avatarUrl": "https://img/a.png"}}
+
+
+def test_chunk_boundaries_do_not_change_the_result():
+    expected = scan(USER_EXTRACTOR, USER_PAGE, len(USER_PAGE)).result()
+    for chunk in (1, 7, 64, 1000):
+        assert scan(USER_EXTRACTOR, USER_PAGE, chunk).result() == expected
+
+
+def test_stops_reading_once_all_fields_are_found():
+    scanner = USER_EXTRACTOR.scanner()
+    assert scanner.feed(USER_PAGE[:USER_PAGE.index("}") + 10])
+    assert scanner.done
+
+
+def test_missing_object_and_incomplete_page():
+    missing = scan(GROUP_EXTRACTOR, '<span data-v-6eef215f>ID </span> name:"g"', 10).result()
+    assert missing["code"] == 2
+    assert scan(GROUP_EXTRACTOR, 'name:"only a name"', 10).result()["code"] == -3
@@ -0,0 +1,45 @@
+import types
+
+from AnyMsgSync.LoopGuard import LoopGuard
+from AnyMsgSync.Message import ParsedMessage
+from AnyMsgSync.Retry import OutboundCall
+
+
+def make_guard(stub_main, **config):
+    parser = types.SimpleNamespace(get_adapter_message_id=lambda platform, res: (res or {}).get("message_id"))
+    return LoopGuard(stub_main({"loop_guard": config}, parser=parser))
+
+
+def message(platform, group_id, msg_id, text, sender_id="42", raw=None):
+    return ParsedMessage(platform, msg_id, group_id, sender_id, "alice", [("text", {"text": text})], raw or {})
+
+
+def test_content_fingerprint_recorded_before_send(stub_main):
+    guard = make_guard(stub_main)
+    guard.before_send(OutboundCall("qq", "g1", "Text", ("[TG] alice:  hello\n",)))
+    assert guard.is_echo(message("qq", "g1", "9", "[TG] alice: hello"))
+    # 同样的内容出现在其他群不算回声
+    assert not guard.is_echo(message("qq", "g2", "9", "[TG] alice: hello"))
+    assert guard.dropped == {"qq": 1}
+
+
+def test_sent_message_id_recorded_after_send(stub_main):
+    guard = make_guard(stub_main)
+    call = OutboundCall("telegram", -100, "Image", (b"...",))
+    guard.after_send(call, {"message_id": 77})
+    assert guard.is_echo(message("telegram", "-100", "77", ""))
+    assert not guard.is_echo(message("telegram", "-100", "78", ""))
+
+
+def test_self_sender_is_dropped(stub_main):
+    guard = make_guard(stub_main, self_ids={"yunhu": ["bot"]})
+    assert guard.is_echo(message("yunhu", "g", "1", "hi", sender_id="bot"))
+    assert guard.is_echo(message("qq", "g", "2", "hi", raw={"post_type": "message_sent"}))
+    assert guard.is_echo(message("qq", "g", "3", "hi", sender_id="10001", raw={"self_id": 10001}))
+    assert not guard.is_echo(message("qq", "g", "4", "hi", raw={"self_id": 10001}))
+
+
+def test_disabled_guard_records_nothing(stub_main):
+    guard = make_guard(stub_main, enabled=False)
+    guard.before_send(OutboundCall("qq", "g1", "Text", ("hello",)))
+    assert not guard.is_echo(message("qq", "g1", "1", "hello", raw={"post_type": "message_sent"}))
@@ -0,0 +1,71 @@
+import sqlite3
+import time
+
+from AnyMsgSync.MessageStore import MessageIdStore, RetentionPolicy
+
+
+def test_same_message_id_in_two_groups(stub_main, tmp_path):
+    store = MessageIdStore(stub_main(), str(tmp_path / "map.db"))
+    for chat, qq_id in (("-1001", "q1"), ("-1002", "q2")):
+        store.add_pair(msg_id="7", target_msg_id=qq_id, from_platform="telegram", to_platform="qq",
+                       group_id=chat, target_group_id="qq1")
+
+    assert store.get("telegram", "-1001", "7", "qq", "qq1") == ("q1", "qq1")
+    assert store.get("telegram", "-1002", "7", "qq", "qq1") == ("q2", "qq1")
+    assert store.get_all("telegram", "-1001", "7") == [("qq", "q1", "qq1")]
+    # 反向映射指回各自的来源群
+    assert store.get_all("qq", "qq1", "q2") == [("telegram", "7", "-1002")]
+    store.close()
+
+
+def test_retention_uses_source_window():
+    policy = RetentionPolicy({"pairs": {"qq->yunhu": 60}})
+    assert policy.window("telegram", "qq") == 48 * 3600
+    assert policy.window("qq", "telegram") == 180
+    assert policy.window("qq", "yunhu") == 60
+
+
+def test_purge_evicts_least_recently_used(stub_main, tmp_path):
+    store = MessageIdStore(stub_main({"retention": {"max_entries": 10}}), str(tmp_path / "map.db"))
+    for n in range(5):
+        store.add_pair(msg_id=str(n), target_msg_id=f"t{n}", from_platform="telegram", to_platform="qq",
+                       group_id="-1001", target_group_id="qq1")
+    store.get_all("telegram", "-1001", "0")
+    store.add_pair(msg_id="5", target_msg_id="t5", from_platform="telegram", to_platform="qq",
+                   group_id="-1001", target_group_id="qq1")
+    assert store.count() <= 9
+    assert store.get_all("telegram", "-1001", "0")
+    store.close()
+
+
+def test_migrates_table_without_source_group(stub_main, tmp_path):
+    path = str(tmp_path / "map.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE message_map (
+        from_platform TEXT NOT NULL, msg_id TEXT NOT NULL, to_platform TEXT NOT NULL,
+        target_group_id TEXT NOT NULL, target_msg_id TEXT NOT NULL, created_at REAL NOT NULL,
+        PRIMARY KEY (from_platform, msg_id, to_platform, target_group_id, target_msg_id)) WITHOUT ROWID""")
+    now = time.time()
+    conn.executemany("INSERT INTO message_map VALUES (?, ?, ?, ?, ?, ?)", [
+        ("telegram", "7", "qq", "qq1", "q1", now),
+        ("qq", "q1", "telegram", "-1001", "7", now),
+    ])
+    conn.commit()
+    conn.close()
+
+    store = MessageIdStore(stub_main(), path)
+    assert store.get("telegram", "-1001", "7", "qq") == ("q1", "qq1")
+    assert store.get_all("qq", "qq1", "q1") == [("telegram", "7", "-1001")]
+    assert not store.is_coalesced("telegram", "-1001", "7", "qq", "qq1")
+    store.close()
+
+
+def test_import_legacy_recovers_source_group(stub_main, tmp_path):
+    store = MessageIdStore(stub_main(), str(tmp_path / "map.db"))
+    count = store.import_legacy({
+        "telegram": {"qq": {"7": ["q1", "qq1"]}},
+        "qq": {"telegram": {"q1": ["7", "-1001"]}},
+    })
+    assert count == 2
+    assert store.get("telegram", "-1001", "7", "qq") == ("q1", "qq1")
+    store.close()
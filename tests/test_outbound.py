@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from AnyMsgSync.Outbound import OutboundScheduler, TokenBucket
+
+
+def make_scheduler(stub_main, limits, global_limit=100):
+    semaphore = asyncio.Semaphore(global_limit)
+    return OutboundScheduler(stub_main({"rate_limit": limits}, get_fanout_semaphore=lambda: semaphore))
+
+
+def test_token_bucket_paces_after_burst():
+    async def scenario():
+        bucket = TokenBucket(rate=20, capacity=2)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(bucket.acquire() for _ in range(4)))
+        # 前 2 个令牌立即可用，后 2 个按 20/s 补充
+        assert 0.09 <= loop.time() - start < 0.3
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_refunds_cancelled_reservation():
+    async def scenario():
+        bucket = TokenBucket(rate=1, capacity=1)
+        await bucket.acquire()
+        waiter = asyncio.ensure_future(bucket.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert bucket.tokens > -0.5
+
+    asyncio.run(scenario())
+
+
+def test_scheduler_returns_results_and_errors(stub_main):
+    async def ok(value):
+        return value
+
+    async def boom():
+        raise ValueError("boom")
+
+    async def scenario():
+        scheduler = make_scheduler(stub_main, {"qq": {"rate": 1000, "burst": 1000, "group_rate": 1000,
+                                                      "group_burst": 1000, "workers": 2}})
+        assert await asyncio.gather(*(scheduler.submit("QQ", "g1", ok, n) for n in range(5))) == list(range(5))
+        with pytest.raises(ValueError):
+            await scheduler.submit("qq", "g1", boom)
+        await scheduler.close()
+
+    asyncio.run(scenario())
+
+
+def test_group_limit_does_not_block_other_groups(stub_main):
+    async def ok():
+        return True
+
+    async def scenario():
+        scheduler = make_scheduler(stub_main, {"qq": {"rate": 1000, "burst": 1000, "group_rate": 1,
+                                                      "group_burst": 1, "workers": 2}})
+        loop = asyncio.get_running_loop()
+        await scheduler.submit("qq", "busy", ok)
+        busy = asyncio.ensure_future(scheduler.submit("qq", "busy", ok))
+        start = loop.time()
+        await scheduler.submit("qq", "quiet", ok)
+        assert loop.time() - start < 0.1
+        assert not busy.done()
+        busy.cancel()
+        await scheduler.close()
+
+    asyncio.run(scenario())
+
+
+def test_global_limit_only_counts_running_calls(stub_main):
+    running = []
+    peak = []
+
+    async def call():
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+
+    async def scenario():
+        scheduler = make_scheduler(stub_main, {"qq": {"rate": 1000, "burst": 1000, "group_rate": 1000,
+                                                      "group_burst": 1000, "workers": 4}}, global_limit=2)
+        await asyncio.gather(*(scheduler.submit("qq", "g", call) for _ in range(8)))
+        assert max(peak) == 2
+        await scheduler.close()
+
+    asyncio.run(scenario())
+
+
+def test_close_cancels_queued_calls_and_rejects_new_ones(stub_main):
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def slow():
+            await gate.wait()
+
+        scheduler = make_scheduler(stub_main, {"qq": {"rate": 1000, "burst": 1000, "group_rate": 1000,
+                                                      "group_burst": 1000, "workers": 1}})
+        calls = [asyncio.ensure_future(scheduler.submit("qq", "g", slow)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        await scheduler.close()
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+        with pytest.raises(RuntimeError):
+            await scheduler.submit("qq", "g", slow)
+
+    asyncio.run(scenario())
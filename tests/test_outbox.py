@@ -0,0 +1,87 @@
+import asyncio
+
+from events import CHAT_A, CHAT_B, telegram_event
+
+CONFIG = {
+    "telegram": {
+        str(CHAT_A): [{"type": "qq", "group_id": "qq_a", "format": "text"}],
+        str(CHAT_B): [{"type": "qq", "group_id": "qq_b", "format": "text"}],
+    },
+}
+
+
+def test_same_message_id_in_two_chats_tracked_separately(make_main):
+    async def scenario():
+        main, _ = make_main(CONFIG)
+        message_a = main.parser.decode("telegram", telegram_event(CHAT_A, 7, "from a"))
+        message_b = main.parser.decode("telegram", telegram_event(CHAT_B, 7, "from b"))
+        main.outbox.append(message_a, [("qq", "qq_a")])
+        main.outbox.append(message_b, [("qq", "qq_b")])
+        assert len(main.outbox) == 2
+
+        # 完成 A 不影响 B
+        main.outbox.mark_done(message_a, "qq", "qq_a")
+        assert len(main.outbox) == 1
+        await main.shutdown()
+
+        # 重启后只补发 B，且发往 B 对应的目标
+        main, recorder = make_main(CONFIG)
+        assert len(main.outbox) == 1
+        await main.outbox.replay()
+        assert [(call[1], call[2]) for call in recorder.calls] == [("Text", "qq_b")]
+        assert "from b" in recorder.calls[0][3][0]
+        assert len(main.outbox) == 0
+        await main.shutdown()
+
+    asyncio.run(scenario())
+
+
+def make_outbox(stub_main, tmp_path, **config):
+    from AnyMsgSync.Outbox import Outbox
+    return Outbox(stub_main({"outbox": {"path": str(tmp_path / "outbox"), **config}}))
+
+
+def qq_message(msg_id, size=100):
+    from AnyMsgSync.Message import ParsedMessage
+    raw = {"message_id": msg_id, "group_id": "qq1", "raw_message": "x" * size}
+    return ParsedMessage("qq", str(msg_id), "qq1", 42, "alice", [("text", {"text": "x"})], raw)
+
+
+def test_compaction_keeps_pending_entries_past_the_segment_budget(stub_main, tmp_path):
+    outbox = make_outbox(stub_main, tmp_path, segment_bytes=2000, max_segments=2)
+    pending = [qq_message(n, size=400) for n in range(5)]
+    for message in pending:
+        outbox.append(message, [("telegram", "-1")])
+    # 大量已完成的转发推动分段切换，最旧分段中的未完成记录被反复搬运
+    for n in range(100, 400):
+        message = qq_message(n)
+        outbox.append(message, [("telegram", "-1")])
+        outbox.mark_done(message, "telegram", "-1")
+    assert len(outbox) == 5
+    assert len(outbox._segments) - 1 <= outbox._max_segments <= 3
+    asyncio.run(outbox.close())
+
+    reopened = make_outbox(stub_main, tmp_path, segment_bytes=2000, max_segments=2)
+    assert sorted(reopened._pending) == sorted(f"qq:qq1:{n}" for n in range(5))
+    asyncio.run(reopened.close())
+
+
+def test_live_data_larger_than_budget_grows_segment_limit(stub_main, tmp_path):
+    outbox = make_outbox(stub_main, tmp_path)
+    pending = [qq_message(n, size=1000) for n in range(5500)]
+    for message in pending:
+        outbox.append(message, [("telegram", "-1")])
+    assert len(outbox) == 5500
+    assert outbox._max_segments > outbox.config["max_segments"]
+
+    # 未完成的记录清空后，分段数回落到配置的预算以内
+    for message in pending:
+        outbox.mark_done(message, "telegram", "-1")
+    for n in range(10000, 12000):
+        message = qq_message(n, size=1000)
+        outbox.append(message, [("telegram", "-1")])
+        outbox.mark_done(message, "telegram", "-1")
+    assert len(outbox) == 0
+    assert len(outbox._segments) - 1 <= outbox.config["max_segments"]
+    assert outbox._max_segments == outbox.config["max_segments"]
+    asyncio.run(outbox.close())
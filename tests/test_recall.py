@@ -0,0 +1,42 @@
+import asyncio
+
+from events import CHAT_A, CHAT_B, telegram_event
+
+CONFIG = {
+    "telegram": {
+        str(CHAT_A): [{"type": "qq", "group_id": "qq1", "format": "text"}],
+        str(CHAT_B): [{"type": "qq", "group_id": "qq1", "format": "text"}],
+    },
+    "recall": {"batch_window": 0},
+}
+
+
+def test_recall_only_touches_source_chat(make_main):
+    async def scenario():
+        main, recorder = make_main(CONFIG)
+        handler = main.platform_handlers["Telegram"]
+        await handler.handle_message(telegram_event(CHAT_A, 7, "from a"))
+        await handler.handle_message(telegram_event(CHAT_B, 7, "from b"))
+        copy_a = main.sync_manager.get_mapped_message_id("telegram", str(CHAT_A), "7", "qq")[0]
+        recorder.calls.clear()
+
+        await main.sync_manager.handle_message_recall("telegram", "7", str(CHAT_A))
+
+        assert [(call[1], call[3]) for call in recorder.calls] == [("Recall", (copy_a,))]
+        await main.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_recall_without_group_is_ignored(make_main):
+    async def scenario():
+        main, recorder = make_main(CONFIG)
+        await main.platform_handlers["Telegram"].handle_message(telegram_event(CHAT_A, 7, "from a"))
+        recorder.calls.clear()
+
+        await main.sync_manager.handle_message_recall("telegram", "7", None)
+
+        assert recorder.calls == []
+        await main.shutdown()
+
+    asyncio.run(scenario())
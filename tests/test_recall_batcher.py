@@ -0,0 +1,77 @@
+import asyncio
+
+from AnyMsgSync.Recall import RecallBatcher
+
+
+class FakeSender:
+    """记录撤回调用；delay 模拟每次调用耗时，并发上限为 limit"""
+
+    def __init__(self, delay=0.0, limit=100):
+        self.calls = []
+        self.delay = delay
+        self._limit = asyncio.Semaphore(limit)
+
+    async def send(self, call, operation):
+        async with self._limit:
+            await asyncio.sleep(self.delay)
+            self.calls.append((call.platform, call.method, call.args, call.kwargs))
+            return {"ok": True}
+
+
+def make_batcher(stub_main, sender, **config):
+    return RecallBatcher(stub_main({"recall": {"batch_window": 0.01, **config}}, sender=sender))
+
+
+def test_telegram_batch_uses_bulk_delete(stub_main):
+    async def scenario():
+        sender = FakeSender()
+        batcher = make_batcher(stub_main, sender)
+        await asyncio.gather(*(batcher.recall("telegram", "-100", str(n)) for n in range(3)))
+        ((platform, method, _, kwargs),) = sender.calls
+        assert (platform, method, kwargs["endpoint"]) == ("telegram", "call_api", "deleteMessages")
+        assert kwargs["message_ids"] == [0, 1, 2]
+
+    asyncio.run(scenario())
+
+
+def test_other_platforms_recall_each_message(stub_main):
+    async def scenario():
+        sender = FakeSender(delay=0.05)
+        batcher = make_batcher(stub_main, sender)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(batcher.recall("qq", "qq1", str(n)) for n in range(5)))
+        assert sorted(call[2] for call in sender.calls) == [(str(n),) for n in range(5)]
+        assert {call[1] for call in sender.calls} == {"Recall"}
+        # 同一批内并发提交，而不是逐条等待
+        assert loop.time() - start < 0.2
+
+    asyncio.run(scenario())
+
+
+def test_batch_timeout_cancels_unsent_recalls(stub_main):
+    async def scenario():
+        sender = FakeSender(delay=0.1, limit=1)
+        batcher = make_batcher(stub_main, sender, timeout=0.25)
+        results = await asyncio.gather(*(batcher.recall("qq", "qq1", str(n)) for n in range(5)),
+                                       return_exceptions=True)
+        timed_out = [r for r in results if isinstance(r, asyncio.TimeoutError)]
+        assert 0 < len(timed_out) < 5
+        sent = len(sender.calls)
+        await asyncio.sleep(0.5)
+        # 超时之后不会再有撤回被执行
+        assert len(sender.calls) == sent == 5 - len(timed_out)
+
+    asyncio.run(scenario())
+
+
+def test_close_flushes_pending_batches(stub_main):
+    async def scenario():
+        sender = FakeSender()
+        batcher = RecallBatcher(stub_main({"recall": {"batch_window": 60}}, sender=sender))
+        task = asyncio.ensure_future(batcher.recall("qq", "qq1", "1"))
+        await asyncio.sleep(0)
+        await batcher.close()
+        assert await task == {"ok": True}
+
+    asyncio.run(scenario())
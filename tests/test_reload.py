@@ -0,0 +1,56 @@
+import asyncio
+import types
+
+import fake_sdk
+from events import qq_event
+
+from AnyMsgSync.Reload import ConfigWatcher
+
+ROUTES = {"qq": {"1": [{"type": "telegram", "group_id": -100}]}}
+
+
+def make_watcher(stub_main, config):
+    env = fake_sdk.FakeEnv({"AnyMsgSync": config})
+    reloads = []
+    main = stub_main(config, sdk=types.SimpleNamespace(env=env), reload_routes=reloads.append)
+    return ConfigWatcher(main), env, reloads
+
+
+def test_unchanged_config_does_not_reload(stub_main):
+    watcher, _, reloads = make_watcher(stub_main, ROUTES)
+    assert not watcher.check()
+    assert reloads == []
+
+
+def test_routing_change_reloads_once(stub_main):
+    watcher, env, reloads = make_watcher(stub_main, ROUTES)
+    config = {"qq": {"1": [{"type": "telegram", "group_id": -200}]}}
+    env.set("AnyMsgSync", config)
+    assert watcher.check()
+    assert not watcher.check()
+    assert reloads == [config]
+
+
+def test_other_changes_only_warn(stub_main):
+    watcher, env, reloads = make_watcher(stub_main, ROUTES)
+    warnings = []
+    watcher.logger = types.SimpleNamespace(warning=warnings.append)
+    env.set("AnyMsgSync", {**ROUTES, "retry": {"attempts": 2}})
+    assert not watcher.check()
+    assert reloads == [] and len(warnings) == 1
+
+
+def test_reload_switches_routes_of_running_main(make_main):
+    async def scenario():
+        main, recorder = make_main({"qq": {"1": [{"type": "telegram", "group_id": -100, "format": "text"}]}})
+        handler = main.platform_handlers["QQ"]
+        store = main.sync_manager.store
+        main.sdk.env.set("AnyMsgSync", {"qq": {"1": [{"type": "telegram", "group_id": -200, "format": "text"}]}})
+        assert main.config_watcher.check()
+        await handler.handle_message(qq_event("1", 5, "hello"))
+        assert [call[2] for call in recorder.of("telegram")] == [-200]
+        # 存储等组件未被重建
+        assert main.sync_manager.store is store
+        await main.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,53 @@
+import types
+
+from AnyMsgSync.Routing import RoutingTable
+
+
+async def build(message):
+    return "text"
+
+
+def make_table(stub_main, forward_config, builders=("QQ", "Telegram")):
+    builder = types.SimpleNamespace(build_text=build, build_markdown=build, build_html=build)
+    sdk = types.SimpleNamespace(adapter=types.SimpleNamespace(Qq=object(), Telegram=object()))
+    main = stub_main(message_builders={name: builder for name in builders}, sdk=sdk)
+    return RoutingTable(main, forward_config)
+
+
+def test_valid_routes_are_resolved_once(stub_main):
+    table = make_table(stub_main, {"qq": {123: [
+        {"type": "Telegram", "group_id": -100, "format": "md", "coalesce": 2},
+        {"type": "qq", "group_id": "456"},
+    ]}})
+    first, second = table.get("qq", "123")
+    assert (first.target_type, first.target_group_id, first.format, first.coalesce) == ("telegram", -100, "Markdown", 2.0)
+    assert first.target == ("telegram", "-100")
+    assert (second.format, second.coalesce) == ("Text", None)
+    assert table.get("qq", 999) == ()
+    assert len(table) == 2 and table.rejected == 0
+
+
+def test_invalid_routes_are_rejected_at_compile_time(stub_main):
+    table = make_table(stub_main, {
+        "qq": {"1": [
+            {"type": "telegram"},
+            {"type": "telegram", "group_id": 1, "format": "pdf"},
+            {"type": "discord", "group_id": 1},
+            {"type": "telegram", "group_id": 1},
+        ]},
+        "yunhu": {"2": [{"type": "qq", "group_id": 3}]},
+    })
+    assert len(table) == 1
+    assert table.rejected == 4
+    assert table.get("yunhu", "2") == ()
+
+
+def test_diff_reports_added_removed_and_changed_sources(stub_main):
+    old = make_table(stub_main, {"qq": {"1": [{"type": "telegram", "group_id": 1}],
+                                        "2": [{"type": "telegram", "group_id": 2}]}})
+    new = make_table(stub_main, {"qq": {"1": [{"type": "telegram", "group_id": 1, "format": "html"}],
+                                        "3": [{"type": "telegram", "group_id": 3}]}})
+    assert old.diff(new) == ([("qq", "3")], [("qq", "2")], [("qq", "1")])
+    same = make_table(stub_main, {"qq": {"1": [{"type": "telegram", "group_id": 1}],
+                                         "2": [{"type": "telegram", "group_id": 2}]}})
+    assert old.diff(same) == ([], [], [])
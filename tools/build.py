@@ -15,6 +15,22 @@ config = {
     "files_to_include": [                              # 需要包含的文件列表
         "AnyMsgSync/__init__.py",
         "AnyMsgSync/Core.py",
+        "AnyMsgSync/Media.py",
+        "AnyMsgSync/Message.py",
+        "AnyMsgSync/Cache.py",
+        "AnyMsgSync/Coalesce.py",
+        "AnyMsgSync/HttpClient.py",
+        "AnyMsgSync/LoopGuard.py",
+        "AnyMsgSync/MessageStore.py",
+        "AnyMsgSync/Metrics.py",
+        "AnyMsgSync/Tracing.py",
+        "AnyMsgSync/Transcode.py",
+        "AnyMsgSync/Outbound.py",
+        "AnyMsgSync/Outbox.py",
+        "AnyMsgSync/Recall.py",
+        "AnyMsgSync/Reload.py",
+        "AnyMsgSync/Retry.py",
+        "AnyMsgSync/Routing.py",
         "AnyMsgSync/QQMessageBuilder.py",
         "AnyMsgSync/YunhuMessageBuilder.py",
         "AnyMsgSync/TelegramMessageBuilder.py",